@@ -0,0 +1,94 @@
+"""
+SSE parsing throughput: the old per-chunk split/json.loads parser versus
+the incremental decoder behind StreamingProviderMixin.
+
+    python benchmarks/sse_throughput.py [--events 20000] [--chunk 1024]
+
+Both parsers get the same OpenAI-style stream cut into fixed-size network
+chunks. The old parser drops every frame that straddles a chunk boundary, so
+its token count is reported next to its speed.
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("DB_URL", "sqlite:///:memory:")
+
+from neuralizard.providers.base_streaming import _ChunkParser  # noqa: E402
+from neuralizard.providers.sse import loads  # noqa: E402
+
+
+def make_body(events: int) -> bytes:
+    frames = []
+    for i in range(events):
+        obj = {"id": "chatcmpl-1", "object": "chat.completion.chunk",
+               "choices": [{"index": 0, "delta": {"content": f"token {i} "}, "finish_reason": None}]}
+        frames.append(f"data: {json.dumps(obj)}\n\n")
+    frames.append("data: [DONE]\n\n")
+    return "".join(frames).encode()
+
+
+def legacy_parse(chunk) -> list[str]:
+    """The pre-decoder parser: decode, split on 'data: ', json.loads each piece."""
+    text = chunk.decode("utf-8", errors="ignore")
+    if "data: " not in text:
+        return [text]
+    tokens = []
+    for part in text.split("data: "):
+        part = part.strip()
+        if not part or part == "[DONE]":
+            continue
+        try:
+            obj = json.loads(part)
+        except json.JSONDecodeError:
+            continue
+        token = (obj.get("choices") or [{}])[0].get("delta", {}).get("content") or ""
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def run_legacy(chunks: list[bytes]) -> int:
+    return sum(len(legacy_parse(c)) for c in chunks)
+
+
+def run_decoder(chunks: list[bytes]) -> int:
+    parser = _ChunkParser()
+    count = 0
+    for c in chunks:
+        tokens, done = parser.feed(c)
+        count += len(tokens)
+        if done:
+            break
+    return count
+
+
+def bench(fn, chunks: list[bytes], size: int, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    tokens = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        tokens = fn(chunks)
+        best = min(best, time.perf_counter() - t0)
+    return size / best, tokens
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--events", type=int, default=20000)
+    ap.add_argument("--chunk", type=int, default=1024, help="network chunk size in bytes")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    body = make_body(args.events)
+    chunks = [body[i:i + args.chunk] for i in range(0, len(body), args.chunk)]
+    print(f"{len(body) / 1e6:.1f} MB, {args.events} events, {len(chunks)} chunks of {args.chunk} B, "
+          f"json backend: {loads.__module__}")
+    for name, fn in (("legacy split", run_legacy), ("SSEDecoder", run_decoder)):
+        rate, tokens = bench(fn, chunks, len(body), args.repeat)
+        print(f"  {name:<13} {rate / 1e6:8.1f} MB/s  {tokens:>7} / {args.events} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ import {
   initWebSocket,
   requestHistory,
   requestConversation,
+  requestOlderMessages,
   clearAll,
   requestDeleteConversation,
   setCurrentConversationId,
@@ -30,8 +31,11 @@ export default function App() {
   const d = useAppDispatch()
   const {
     prompt, messages, streaming, wsConnected, wsConnecting, error, history, historyLoaded, currentConversationId,
+    olderCursor, loadingOlder,
   } = useAppSelector(s => s.chat)
   const listRef = useRef<HTMLDivElement | null>(null)
+  // scrollHeight before an older page is prepended, so the viewport can stay put
+  const prependAnchor = useRef<number | null>(null)
 
   const conversations = useMemo<StoredConversation[]>(() => {
     return (history || []).map(h => ({
@@ -66,7 +70,24 @@ export default function App() {
     if (wsConnected) d(requestHistory({ limit: 50, offset: 0 }))
   }, [wsConnected, d])
 
-  useEffect(() => { listRef.current?.scrollTo(0, listRef.current.scrollHeight) }, [messages, streaming])
+  useEffect(() => {
+    const el = listRef.current
+    if (!el) return
+    if (prependAnchor.current !== null) {
+      // Older messages were prepended: keep the same message under the viewport
+      el.scrollTop += el.scrollHeight - prependAnchor.current
+      prependAnchor.current = null
+      return
+    }
+    el.scrollTo(0, el.scrollHeight)
+  }, [messages, streaming])
+
+  const onListScroll = useCallback(() => {
+    const el = listRef.current
+    if (!el || el.scrollTop > 64 || !olderCursor || loadingOlder || !wsConnected) return
+    prependAnchor.current = el.scrollHeight
+    d(requestOlderMessages())
+  }, [olderCursor, loadingOlder, wsConnected, d])
 
   const submit = useCallback(() => { d(runChat()) }, [d])
 
@@ -101,6 +122,7 @@ export default function App() {
 
         <div
           ref={listRef}
+          onScroll={onListScroll}
           className="flex-1 overflow-y-auto p-4 pb-28 space-y-4 bg-neutral-50"
         >
           <ChatMessages
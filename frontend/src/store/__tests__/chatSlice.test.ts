@@ -14,6 +14,7 @@ import reducer, {
   requestRenameConversation,
   requestHistory,
   requestConversation,
+  requestOlderMessages,
   setProviderAndFetch,
   disconnectWSAction,
 } from "../chatSlice"
@@ -228,3 +229,41 @@ describe("websocket thunks and reducers", () => {
     expect(payloads.some((p: any) => p?.type === "conversation" && p.id === "deadbeef")).toBe(true)
   })
 })
+
+describe("keyset pagination", () => {
+  it("loads older message pages with the cursor and prepends them", () => {
+    const store = createTestStore()
+    connectFresh(store)
+    store.dispatch(setCurrentConversationId("c1"))
+
+    const page = (ids: number[]) => ids.map(id => ({ id, role: "user", content: `m${id}` }))
+    wsInstance?.onmessage && wsInstance.onmessage({
+      data: JSON.stringify({ type: "conversation", id: "c1", messages: page([3, 4]), next_cursor: "cur1" }),
+    })
+    expect(store.getState().chat.olderCursor).toBe("cur1")
+
+    store.dispatch(requestOlderMessages() as any)
+    const sent = (wsInstance?.send.mock.calls || []).map((c: any[]) => JSON.parse(c[0]))
+    expect([...sent].reverse().find((p: any) => p?.type === "conversation")).toMatchObject({ id: "c1", before: "cur1" })
+    expect(store.getState().chat.loadingOlder).toBe(true)
+
+    wsInstance?.onmessage && wsInstance.onmessage({
+      data: JSON.stringify({ type: "conversation", id: "c1", messages: page([1, 2]), before: "cur1", next_cursor: null }),
+    })
+    const state = store.getState().chat
+    expect(state.messages.map(m => m.content)).toEqual(["m1", "m2", "m3", "m4"])
+    expect(state.olderCursor).toBeNull()
+    expect(state.loadingOlder).toBe(false)
+  })
+
+  it("appends history pages fetched with a cursor", () => {
+    const store = createTestStore()
+    connectFresh(store)
+
+    const item = (id: string) => ({ id, title: id, started_at: "", updated_at: "", default_provider: "openai", default_model: null, message_count: 0, last_message_preview: null })
+    wsInstance?.onmessage && wsInstance.onmessage({ data: JSON.stringify({ type: "history", items: [item("a")], next_cursor: "h1" }) })
+    wsInstance?.onmessage && wsInstance.onmessage({ data: JSON.stringify({ type: "history", items: [item("b")], before: "h1", next_cursor: null }) })
+    expect(store.getState().chat.history.map(h => h.id)).toEqual(["a", "b"])
+    expect(store.getState().chat.historyCursor).toBeNull()
+  })
+})
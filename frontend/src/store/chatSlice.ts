@@ -34,6 +34,10 @@ type ChatState = {
   models: string[]
   history: HistoryItem[]
   historyLoaded: boolean
+  // keyset cursors for the next (older) page; null when there is none
+  historyCursor: string | null
+  olderCursor: string | null
+  loadingOlder: boolean
   // NEW: track selected conversation
   currentConversationId: string | null
   // NEW: queue a prompt while creating a conversation
@@ -54,6 +58,9 @@ const initialState: ChatState = {
   models: [],
   history: [],
   historyLoaded: false,
+  historyCursor: null,
+  olderCursor: null,
+  loadingOlder: false,
   // NEW
   currentConversationId: null,
   // NEW
@@ -74,6 +81,8 @@ const slice = createSlice({
     clearAll(s) {
       s.prompt = ""
       s.messages = []
+      s.olderCursor = null
+      s.loadingOlder = false
       s.error = null
       s.currentAssistantId = null
       s.streaming = false
@@ -115,6 +124,13 @@ const slice = createSlice({
       state.history = action.payload
       state.historyLoaded = true
     },
+    historyPageReceived(state, action: PayloadAction<HistoryItem[]>) {
+      const seen = new Set(state.history.map(h => h.id))
+      state.history.push(...action.payload.filter(h => !seen.has(h.id)))
+    },
+    setHistoryCursor(state, action: PayloadAction<string | null>) {
+      state.historyCursor = action.payload
+    },
     // NEW: select conversation id
     setCurrentConversationId(state, action: PayloadAction<string | null>) {
       state.currentConversationId = action.payload
@@ -135,6 +151,28 @@ const slice = createSlice({
         model: m.model,
       }))
     },
+    prependMessages(state, action: PayloadAction<Array<{ id: number | string; role: ChatMessage["role"]; content: string; provider?: string; model?: string }>>) {
+      const seen = new Set(state.messages.map(m => m.id))
+      const older = action.payload
+        .filter(m => !seen.has(String(m.id)))
+        .map(m => ({
+          id: String(m.id),
+          role: m.role,
+          content: m.content,
+          serverId: Number(m.id),
+          provider: m.provider,
+          model: m.model,
+        }))
+      state.messages = [...older, ...state.messages]
+      state.loadingOlder = false
+    },
+    setOlderCursor(state, action: PayloadAction<string | null>) {
+      state.olderCursor = action.payload
+      state.loadingOlder = false
+    },
+    setLoadingOlder(state, action: PayloadAction<boolean>) {
+      state.loadingOlder = action.payload
+    },
     removeConversationFromHistory(state, action: PayloadAction<string>) {
       state.history = state.history.filter(h => h.id !== action.payload)
     },
@@ -287,11 +325,25 @@ export const connectWS = () => (dispatch: any, getState: () => { chat: ChatState
           break
         case "history":
           if (Array.isArray(msg.items)) {
-            dispatch(slice.actions.historyReceived(msg.items))
+            // A `before` cursor means this is a later page to append, not a fresh list
+            if (msg.before) dispatch(slice.actions.historyPageReceived(msg.items))
+            else dispatch(slice.actions.historyReceived(msg.items))
+            dispatch(slice.actions.setHistoryCursor(msg.next_cursor ?? null))
           }
           break
         case "conversation": {
-          if (Array.isArray(msg.messages)) {
+          if (Array.isArray(msg.messages) && msg.before) {
+            // Older page fetched on scroll: prepend, keep the current provider/model
+            if (msg.id !== getState().chat.currentConversationId) break
+            dispatch(slice.actions.prependMessages(msg.messages.map((m: any) => ({
+              id: m.id,
+              role: m.role as ChatMessage["role"],
+              content: m.content,
+              provider: m.provider,
+              model: m.model,
+            }))))
+            dispatch(slice.actions.setOlderCursor(msg.next_cursor ?? null))
+          } else if (Array.isArray(msg.messages)) {
             // Take provider/model from the last message that has them
             const lastWithProv = [...msg.messages].reverse().find((m: any) => m?.provider || m?.model)
             if (lastWithProv?.provider) {
@@ -310,6 +362,7 @@ export const connectWS = () => (dispatch: any, getState: () => { chat: ChatState
               model: m.model,
             }))
             dispatch(slice.actions.replaceMessages(mapped))
+            dispatch(slice.actions.setOlderCursor(msg.next_cursor ?? null))
           }
           break
         }
@@ -501,8 +554,11 @@ export const {
   setProviders,
   setModels,
   historyReceived,
+  historyPageReceived,
   setAssistantServerId,
   replaceMessages,
+  prependMessages,
+  setOlderCursor,
   removeConversationFromHistory,
   updateConversationTitle,
   setCurrentConversationId,
@@ -512,13 +568,23 @@ export const {
 export default slice.reducer
 
 // Thunk: request history over WS (uses module-level socket)
-export const requestHistory = ({ limit = 50, offset = 0 }: { limit?: number; offset?: number } = {}) =>
+export const requestHistory = (
+  { limit = 50, offset = 0, before }: { limit?: number; offset?: number; before?: string | null } = {}
+) =>
   (_dispatch: any) => {
     if (activeWS && activeWS.readyState === WebSocket.OPEN) {
-      try { activeWS.send(JSON.stringify({ type: "history", limit, offset })) } catch {}
+      const payload = before ? { type: "history", limit, before } : { type: "history", limit, offset }
+      try { activeWS.send(JSON.stringify(payload)) } catch {}
     }
   }
 
+// Thunk: next history page, keyed off the cursor from the previous one
+export const requestMoreHistory = (limit = 50) =>
+  (dispatch: any, getState: () => { chat: ChatState }) => {
+    const cursor = getState().chat.historyCursor
+    if (cursor) dispatch(requestHistory({ limit, before: cursor }))
+  }
+
 // Send simple vote over WS: vote ∈ {-1,0,1}. Optional: add score/label/comment later.
 export const sendMessageFeedback = (payload: {
   id: string | number
@@ -551,6 +617,21 @@ export const requestConversation = (id: string) =>
     }
   }
 
+// Thunk: fetch the page of messages older than what is loaded (scroll-back)
+export const requestOlderMessages = () =>
+  (dispatch: any, getState: () => { chat: ChatState }) => {
+    const { currentConversationId, olderCursor, loadingOlder } = getState().chat
+    if (!currentConversationId || !olderCursor || loadingOlder) return
+    if (activeWS && activeWS.readyState === WebSocket.OPEN) {
+      dispatch(slice.actions.setLoadingOlder(true))
+      try {
+        activeWS.send(JSON.stringify({ type: "conversation", id: currentConversationId, before: olderCursor }))
+      } catch {
+        dispatch(slice.actions.setLoadingOlder(false))
+      }
+    }
+  }
+
 // Thunk: delete a conversation via WS
 export const requestDeleteConversation = (id: string) => (_dispatch: any) => {
   if (activeWS && activeWS.readyState === WebSocket.OPEN) {
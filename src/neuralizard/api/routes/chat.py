@@ -1,28 +1,229 @@
-import asyncio, logging, re, time, uuid
-from typing import Iterable, Optional
+import asyncio, json, logging, re, time, uuid
+from typing import AsyncIterator, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from neuralizard.providers import get_provider, get_available_providers, get_provider_models
+from neuralizard.providers import (
+    get_provider,
+    get_available_providers,
+    get_model_catalog,
+    get_provider_pool_stats,
+    get_http_stats,
+    get_offloader,
+    get_response_cache_stats,
+    get_semantic_cache_stats,
+    get_first_token_tracker,
+    get_hedge_stats,
+    get_router,
+    get_rate_limit_stats,
+    get_retry_stats,
+    RateLimitExceeded,
+    astream,
+    astream_route,
+    acomplete_cached,
+)
+from neuralizard.providers.base import Usage
+from neuralizard.api.streaming import STREAM_END, FlushPolicy, coalesce, fan_in
+from neuralizard.config import settings
+from neuralizard.context import ConversationContext
 from neuralizard.db import (
-    create_conversation,
-    add_message,
-    update_message_content,
-    session,
-    Conversation,
-    Message,
-    add_message_rating,
+    acreate_conversation,
+    aadd_message_rating,
+    alist_conversation_history,
+    alist_conversation_messages,
+    adelete_conversation,
+    arename_conversation,
+    aconversation_needs_title,
+    aset_title_if_missing,
+    get_message_writer,
+    history_cursor,
+    messages_cursor,
 )
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# chat_ws inbox markers: the socket closed / a frame was not valid JSON
+_CLOSED = object()
+_INVALID_FRAME = object()
+
+
+class ChatTurn(BaseModel):
+    role: str
+    content: str
+
 
 class ChatRequest(BaseModel):
-    prompt: str
+    prompt: str = ""
+    # Optional multi-turn input (oldest first); when given it is sent instead of `prompt`
+    messages: list[ChatTurn] | None = None
+    system: str | None = None
     provider: str = "openai"
     model: str | None = None
     temperature: float | None = 0.7
+    # Response cache: None = only deterministic requests (temperature <= 0); true/false forces it.
+    # false also skips the semantic cache.
+    cache: bool | None = None
+    # Route to the healthiest of these "provider[:model]" entries (in priority order) instead of `provider`;
+    # a router alias as `provider` does the same (see settings.router_aliases)
+    candidates: list[str] | None = None
+
+    def provider_input(self) -> tuple[str | list[dict], dict]:
+        """(prompt or messages, extra kwargs) for acomplete/astream."""
+        prompt = [m.model_dump() for m in self.messages] if self.messages else self.prompt
+        return prompt, ({"system": self.system} if self.system else {})
+
+
+class CompareTarget(BaseModel):
+    provider: str
+    model: str | None = None
+
+
+class CompareRequest(ChatRequest):
+    """One prompt answered by every target side by side (`provider`/`model` are ignored)."""
+    targets: list[CompareTarget]
+    # When set, the prompt and each answer are stored in this conversation
+    conversation_id: uuid.UUID | None = None
+
+
+async def stream_provider(gen: AsyncIterator[str], q: asyncio.Queue, usage: list[Usage]):
+    """Pump a provider stream into `q` (None terminates); Usage items are collected separately."""
+    try:
+        async for raw in gen:
+            if isinstance(raw, str) and raw:
+                await q.put(raw)
+            elif isinstance(raw, Usage):
+                usage.append(raw)
+    finally:
+        try:
+            # closes the SDK stream / httpx response right away when cancelled
+            await gen.aclose()
+        finally:
+            await q.put(None)
+
+
+def route_target(provider: str | None, candidates) -> str | list[str] | None:
+    """What the router should resolve for a request, or None to use `provider` as is."""
+    if candidates:
+        return candidates
+    return provider if get_router().is_alias(provider) else None
+
+
+def page_limit(raw, default: int) -> int:
+    """A client-requested page size clamped to 1..settings.max_page_size; ValueError when it is not a number."""
+    try:
+        limit = int(raw or default)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid limit: {raw!r}") from None
+    return min(max(limit, 1), settings.max_page_size)
+
+
+def page_offset(raw) -> int:
+    """A client-requested offset, at least 0; ValueError when it is not a number."""
+    try:
+        return max(int(raw or 0), 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid offset: {raw!r}") from None
+
+
+def usage_fields(usage: list[Usage], prompt_tokens: int) -> dict:
+    """Message columns from provider-reported usage (empty when the stream carried none)."""
+    if not usage:
+        return {}
+    u = usage[-1]
+    return {
+        "prompt_tokens": u.prompt_tokens or prompt_tokens,
+        "response_tokens": u.response_tokens,
+        "cached_tokens": u.cached_tokens,
+        "cache_write_tokens": u.cache_write_tokens,
+    }
+
+
+def load_compare_targets(targets: list[CompareTarget]) -> list:
+    """Providers for a compare request; raises ValueError for a bad target list."""
+    if not targets:
+        raise ValueError("No compare targets")
+    if len(targets) > settings.compare_max_targets:
+        raise ValueError(f"Too many compare targets (limit {settings.compare_max_targets})")
+    return [get_provider(t.provider.lower()) for t in targets]
+
+
+async def compare_events(provs: list, targets: list[CompareTarget], prompt, *, temperature, extra: dict,
+                         policy: FlushPolicy, cid: uuid.UUID | None = None, prompt_tokens: int = 0,
+                         upstreams: list | None = None, cancelled=lambda: False) -> AsyncIterator[dict]:
+    """
+    Stream `prompt` from every target at once and yield their delta/done
+    events as they arrive, tagged with index/provider/model. Wall time is the
+    slowest stream, not the sum. With `cid` each answer is persisted as its own
+    assistant message (done events then carry its message_id); answers cut
+    short by cancellation are saved with status "cancelled", a target whose
+    stream failed with status "error" (its done event carries the error).
+    """
+    n = len(targets)
+    writer = get_message_writer() if cid else None
+    refs = []
+    for t in targets:
+        if writer:
+            refs.append(await writer.add_message(
+                conversation_id=cid, role="assistant", content="",
+                provider=t.provider.lower(), model=t.model, prompt_tokens=prompt_tokens,
+            ))
+    queues = [asyncio.Queue() for _ in range(n)]
+    usages: list[list[Usage]] = [[] for _ in range(n)]
+    tasks = []
+    for prov, t, q, usage in zip(provs, targets, queues, usages):
+        # the window's token count stands in for the rate governor's own estimate
+        gen = astream(prov, prompt, model=t.model, temperature=temperature, prompt_tokens=prompt_tokens or None, **extra)
+        tasks.append(asyncio.create_task(stream_provider(gen, q, usage)))
+    if upstreams is not None:
+        upstreams.extend(tasks)
+
+    t0 = time.perf_counter()
+    first_token: list[float | None] = [None] * n
+    chunks: list[list[str]] = [[] for _ in range(n)]
+    finished = [False] * n
+    try:
+        async for i, item in fan_in([coalesce(q, policy) for q in queues]):
+            tag = {"index": i, "provider": targets[i].provider.lower(), "model": targets[i].model}
+            if isinstance(item, str):
+                if first_token[i] is None:
+                    first_token[i] = time.perf_counter()
+                chunks[i].append(item)
+                yield {"type": "delta", **tag, "data": item}
+                continue
+            if item is not STREAM_END:
+                continue
+            finished[i] = True
+            latency_ms = int((time.perf_counter() - t0) * 1000)
+            first_token_ms = int((first_token[i] - t0) * 1000) if first_token[i] else latency_ms
+            # the stream ends on the queue first; a failed upstream makes this target's answer an error
+            await asyncio.wait({tasks[i]})
+            error = None if tasks[i].cancelled() else tasks[i].exception()
+            status = "error" if error is not None else "cancelled" if cancelled() else "complete"
+            fields = usage_fields(usages[i], prompt_tokens)
+            done = {"type": "done", **tag, "status": status, "first_token_ms": first_token_ms, "latency_ms": latency_ms}
+            if error is not None:
+                done["error"] = str(error)
+                if isinstance(error, RateLimitExceeded):
+                    done.update(code="rate_limited", retry_after=round(error.retry_after, 1))
+            if writer:
+                await writer.update_message(
+                    refs[i], content="".join(chunks[i]).strip(), latency_ms=latency_ms,
+                    first_token_ms=first_token_ms, status=status, error=done.get("error"), **fields,
+                )
+                done["message_id"] = await refs[i].wait()
+            if fields:
+                done["usage"] = fields
+            done["text"] = "".join(chunks[i]).strip()
+            yield done
+    finally:
+        for task in tasks:
+            task.cancel()
+        if writer:
+            # the consumer went away (client disconnect): keep what each stream produced
+            for i in range(n):
+                if not finished[i]:
+                    await writer.update_message(refs[i], content="".join(chunks[i]).strip(), status="cancelled")
 
 
 @router.get("/ping")
@@ -30,26 +231,66 @@ def ping():
     return {"status": "ok"}
 
 
+@router.get("/metrics")
+def metrics():
+    return {
+        "provider_pool": get_provider_pool_stats(),
+        "http": get_http_stats(),
+        "offload": get_offloader().metrics(),
+        "response_cache": get_response_cache_stats(),
+        "semantic_cache": get_semantic_cache_stats(),
+        "model_catalog": get_model_catalog().stats(),
+        "hedging": get_hedge_stats(),
+        "router": get_router().stats(),
+        "rate_limits": get_rate_limit_stats(),
+        "retries": get_retry_stats(),
+    }
+
+
 @router.post("/complete")
-def complete(body: ChatRequest):
+async def complete(body: ChatRequest):
     try:
-        prov = get_provider(body.provider)
-        res = prov.complete(body.prompt, model=body.model, temperature=body.temperature)
+        prompt, extra = body.provider_input()
+        route = route_target(body.provider, body.candidates)
+        if route is not None:
+            res = await get_router().acomplete(route, lambda prov, model: acomplete_cached(
+                prov, prompt, model=model, temperature=body.temperature, cache=body.cache, **extra
+            ))
+            return {"text": res.text, "provider": res.provider, "model": res.model}
+        prov = get_provider(body.provider, semantic_cache=False if body.cache is False else None)
+        res = await acomplete_cached(
+            prov, prompt, model=body.model, temperature=body.temperature, cache=body.cache, **extra
+        )
         return {"text": res.text, "provider": res.provider, "model": res.model}
+    except RateLimitExceeded as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
     except Exception as e:
         raise HTTPException(500, f"Provider error: {e}")
 
 
 @router.post("/stream")
-def stream(body: ChatRequest):
+async def stream(body: ChatRequest):
+    route = route_target(body.provider, body.candidates)
     try:
-        prov = get_provider(body.provider)
+        if route is not None:
+            get_router().candidates(route)
+        else:
+            prov = get_provider(body.provider, semantic_cache=False if body.cache is False else None)
     except Exception as e:
         raise HTTPException(400, str(e))
 
-    def gen():
+    prompt, extra = body.provider_input()
+
+    async def gen():
         try:
-            for chunk in prov.stream(body.prompt, model=body.model, temperature=body.temperature):
+            if route is not None:
+                chunks = get_router().astream(route, prompt, temperature=body.temperature, **extra)
+            else:
+                chunks = astream_route(
+                    "stream", prov, prompt, provider=body.provider, model=body.model,
+                    temperature=body.temperature, **extra,
+                )
+            async for chunk in chunks:
                 if isinstance(chunk, str):
                     yield chunk
         except Exception as e:
@@ -58,43 +299,120 @@ def stream(body: ChatRequest):
     return StreamingResponse(gen(), media_type="text/plain")
 
 
+@router.post("/compare")
+async def compare(body: CompareRequest):
+    """
+    Stream one prompt from several providers/models at once as NDJSON:
+    one {"type": "delta", "index", "provider", "model", "data"} line per
+    chunk and a "done" line with first_token_ms/latency_ms per target.
+    """
+    try:
+        provs = load_compare_targets(body.targets)
+    except Exception as e:
+        raise HTTPException(400, str(e))
+    prompt, extra = body.provider_input()
+    if body.conversation_id:
+        await get_message_writer().add_message(
+            conversation_id=body.conversation_id, role="user",
+            content=prompt if isinstance(prompt, str) else prompt[-1]["content"],
+            provider=body.targets[0].provider.lower(), model=body.targets[0].model, prompt_tokens=0,
+        )
+
+    async def gen():
+        t0 = time.perf_counter()
+        async for event in compare_events(
+            provs, body.targets, prompt, temperature=body.temperature, extra=extra,
+            policy=FlushPolicy.negotiate({}), cid=body.conversation_id,
+        ):
+            if event["type"] == "done":
+                event.pop("text")
+            yield json.dumps(event) + "\n"
+        yield json.dumps({"type": "compare_done", "latency_ms": int((time.perf_counter() - t0) * 1000)}) + "\n"
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+
 @router.websocket("/ws")
 async def chat_ws(ws: WebSocket):
     await ws.accept()
-    await ws.send_json({"type": "info", "message": "Connected. Send JSON frames."})
+    # Delta batching is negotiated at connect time via ?flush_ms=&flush_bytes=
+    flush_policy = FlushPolicy.negotiate(ws.query_params)
+    await ws.send_json({"type": "info", "message": "Connected. Send JSON frames.", "flush": flush_policy.as_dict()})
 
     # Do NOT auto-create conversations; create on demand
     conversation_id: Optional[uuid.UUID] = None
     current_provider = "openai"
-    memory: list[dict[str, str]] = []
-    max_messages = 50
-
-    def build_context(user_prompt: str) -> str:
-        parts: list[str] = []
-        for m in memory:
-            parts.append(f"{'User' if m['role']=='user' else 'Assistant'}: {m['content']}")
-        parts.append(f"User: {user_prompt}")
-        parts.append("Assistant:")
-        return "\n".join(parts)
-
-    async def stream_provider(gen: Iterable[str], q: asyncio.Queue):
+    # Turns per conversation; each request sends what fits the model's token budget
+    contexts: dict[uuid.UUID, ConversationContext] = {}
+    # Prompts on one conversation run in order (its context must see each answer);
+    # prompts on different conversations stream in parallel
+    conv_locks: dict[uuid.UUID, asyncio.Lock] = {}
+    # Prompt tasks share the socket; frames must not interleave mid-write
+    send_lock = asyncio.Lock()
+
+    async def send(frame: dict) -> None:
+        async with send_lock:
+            await ws.send_json(frame)
+
+    def context_for(cid: uuid.UUID) -> ConversationContext:
+        ctx = contexts.get(cid)
+        if ctx is None:
+            ctx = contexts[cid] = ConversationContext()
+        return ctx
+
+    # Prompts in flight by request id: {"task", "upstreams" (stream tasks), "reason" (why it was cancelled)}
+    streams: dict[str, dict] = {}
+    # Title generations and model-list refreshes still running (the event loop only keeps weak references to tasks)
+    background: set[asyncio.Task] = set()
+
+    def spawn(coro) -> None:
+        task = asyncio.create_task(coro)
+        background.add(task)
+        task.add_done_callback(background.discard)
+    # Frames are read by a separate task so `stop` is seen while responses stream
+    inbox: asyncio.Queue = asyncio.Queue()
+
+    def cancel_stream(reason: str, request_id: str | None = None) -> bool:
+        """Cancel one prompt's upstream stream, or all of them when no request id is given."""
+        if request_id is not None:
+            targets = [streams[request_id]] if request_id in streams else []
+        else:
+            targets = list(streams.values())
+        for entry in targets:
+            # a disconnect wins over an earlier stop: nothing may be sent any more
+            if entry["reason"] is None or reason == "disconnected":
+                entry["reason"] = reason
+            for upstream in entry["upstreams"]:
+                if not upstream.done():
+                    upstream.cancel()
+        return bool(targets)
+
+    async def read_frames():
         try:
-            for raw in gen:
-                if not isinstance(raw, str):
+            while True:
+                try:
+                    data = await ws.receive_json()
+                except WebSocketDisconnect:
+                    break
+                except (ValueError, KeyError):  # bad JSON / binary frame
+                    await inbox.put(_INVALID_FRAME)
                     continue
-                for piece in re.split(r"(\s+)", raw):
-                    if piece:
-                        await q.put(piece)
+                if isinstance(data, dict) and "stop" in (data.get("type"), data.get("action")):
+                    # nothing to stop (e.g. the answer just finished) is not an error
+                    rid = data.get("request_id")
+                    cancel_stream("stopped", str(rid) if rid is not None else None)
+                    continue
+                await inbox.put(data)
+        except Exception:
+            pass
         finally:
-            await q.put(None)
+            cancel_stream("disconnected")
+            await inbox.put(_CLOSED)
 
     async def maybe_create_title(first_user: str, assistant_text: str, provider_name: str, model: str | None, cid: uuid.UUID):
-        # Only try if no title in DB yet
-
-        with session() as s:
-            db_conv = s.get(Conversation, cid)
-            if not db_conv or db_conv.title:
-                return
+        # Only try if no title in DB yet (looked up off the event loop)
+        if not await aconversation_needs_title(cid):
+            return
 
         def build_title_prompt() -> str:
             return (
@@ -109,7 +427,8 @@ async def chat_ws(ws: WebSocket):
             prov = get_provider(provider_name)
             prompt_txt = build_title_prompt()
             res = await asyncio.wait_for(
-                asyncio.to_thread(lambda: prov.complete(prompt_txt, model=model, temperature=0.2)),
+                # titles are regenerated for identical first exchanges; reuse them
+                acomplete_cached(prov, prompt_txt, model=model, temperature=0.2, cache=True),
                 timeout=15.0,
             )
             raw_title = (getattr(res, "text", "") or "").strip()
@@ -131,23 +450,219 @@ async def chat_ws(ws: WebSocket):
             return
 
         try:
-            with session() as s:
-                db = s.get(Conversation, cid)
-                if db and not db.title:
-                    db.title = title
-                    s.commit()
-            await ws.send_json({"type": "conversation_title", "id": str(cid), "title": title})
+            await aset_title_if_missing(cid, title)
+            await send({"type": "conversation_title", "id": str(cid), "title": title})
+        except Exception:
+            pass
+
+    async def push_refreshed_models(provider_name: str, sent: list[str]):
+        # Runs after the cached list went out; only sends a frame if upstream changed it
+        try:
+            models = await get_model_catalog().refresh(provider_name)
+            if models != sent:
+                await send({"type": "models", "provider": provider_name, "models": models})
         except Exception:
             pass
 
+    async def run_prompt(request_id: str, entry: dict, prov, prompt: str, cid: uuid.UUID, provider_name: str,
+                         model: str | None, temperature, extra: dict, route=None):
+        """One prompt's full exchange; every frame it sends carries its request id."""
+        async def emit(frame: dict) -> None:
+            if entry["reason"] != "disconnected":
+                await send({**frame, "request_id": request_id})
+
+        try:
+            async with conv_locks.setdefault(cid, asyncio.Lock()):
+                text_out = await stream_answer(
+                    entry, emit, prov, prompt, cid, provider_name, model, temperature, extra, route=route,
+                )
+        except Exception as e:
+            logging.warning(f"Prompt {request_id} failed: {e}")
+            return
+        finally:
+            # the answer is done: free the prompt slot before any title request goes out
+            streams.pop(request_id, None)
+        if text_out is not None and entry["reason"] is None:
+            # Create title for this conversation only, as its own task so a slow title never holds up prompts
+            spawn(maybe_create_title(
+                first_user=prompt, assistant_text=text_out, provider_name=provider_name, model=model, cid=cid,
+            ))
+
+    async def stream_answer(entry: dict, emit, prov, prompt: str, cid: uuid.UUID, provider_name: str,
+                            model: str | None, temperature, extra: dict, route=None) -> str | None:
+        """
+        Stream and persist one answer; returns its text, or None when it failed.
+        With `route` the router picks the provider/model (and `prov` is unused).
+        """
+        t0 = time.perf_counter()
+        first_token_time = None
+        memory = context_for(cid)
+
+        # Persistence is write-behind: queue the rows, never wait for the DB before streaming
+        writer = get_message_writer()
+        await writer.add_message(
+            conversation_id=cid,
+            role="user",
+            content=prompt,
+            provider=provider_name,
+            model=model,
+            prompt_tokens=0,
+        )
+        memory.append("user", prompt)
+        window = memory.window(model, provider_name)
+        # History goes out as native role-tagged turns so upstream prefix caches can hit
+        ctx = window.as_messages()
+
+        await emit({"type": "start", "provider": provider_name, "model": model, "conversation_id": str(cid)})
+        q: asyncio.Queue[str | None] = asyncio.Queue()
+        assistant_chunks: list[str] = []
+
+        assistant_ref = await writer.add_message(
+            conversation_id=cid,
+            role="assistant",
+            content="",
+            provider=provider_name,
+            model=model,
+            prompt_tokens=window.tokens,
+        )
+
+        # filled by the router / hedging when another provider or model answers
+        outcome: dict = {}
+        try:
+            if route is not None:
+                gen = get_router().astream(
+                    route, ctx, decision=outcome, temperature=temperature, prompt_tokens=window.tokens, **extra,
+                )
+            else:
+                # with a hedge policy on this route a backup provider may answer instead
+                gen = astream_route(
+                    "ws", prov, ctx, provider=provider_name, model=model,
+                    outcome=outcome, temperature=temperature, prompt_tokens=window.tokens, **extra,
+                )
+            usage: list[Usage] = []
+            upstream = asyncio.create_task(stream_provider(gen, q, usage))
+            entry["upstreams"].append(upstream)
+            if entry["reason"] is not None:
+                upstream.cancel()  # stopped while waiting for the conversation
+            async for piece in coalesce(q, flush_policy):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                assistant_chunks.append(piece)
+                await emit({"type": "delta", "data": piece})
+            # the stream ends on the queue first; a failed upstream (e.g. no healthy route) is an error
+            await asyncio.wait({upstream})
+            if not upstream.cancelled() and upstream.exception() is not None:
+                raise upstream.exception()
+            cancelled = entry["reason"]
+
+            text_out = "".join(assistant_chunks).strip()
+            memory.append("assistant", text_out)
+
+            latency_ms = int((time.perf_counter() - t0) * 1000)
+            first_token_ms = int((first_token_time - t0) * 1000) if first_token_time else latency_ms
+            if first_token_time and not outcome:
+                get_first_token_tracker().observe(provider_name, model, first_token_ms)
+            # Provider-reported usage (when the stream carries it) replaces the local estimate
+            fields = usage_fields(usage, window.tokens)
+            if outcome.get("provider") and (outcome["provider"], outcome["model"]) != (provider_name, model):
+                fields.update(provider=outcome["provider"], model=outcome["model"])
+            await writer.update_message(
+                assistant_ref,
+                content=text_out,
+                latency_ms=latency_ms,
+                first_token_ms=first_token_ms,
+                status="cancelled" if cancelled else "complete",
+                routing=json.dumps(outcome) if outcome else None,
+                **fields,
+            )
+            if cancelled == "disconnected":
+                return text_out  # the partial answer is saved; nobody is left to tell
+
+            # The placeholder insert was queued before streaming, so its id is normally ready
+            assistant_id = await assistant_ref.wait()
+            done = {"type": "done", "message_id": assistant_id, "status": "cancelled" if cancelled else "complete"}
+            usage_out = {k: v for k, v in fields.items() if k not in ("provider", "model")}
+            if usage_out:
+                done["usage"] = usage_out
+            if outcome.get("hedged"):
+                done["hedge"] = {k: outcome[k] for k in ("winner", "provider", "model")}
+            if route is not None:
+                done["route"] = {"provider": outcome["provider"], "model": outcome["model"],
+                                 "failovers": len(outcome["attempts"])}
+            await emit(done)
+            return text_out
+
+        except Exception as e:
+            for upstream in entry["upstreams"]:
+                upstream.cancel()
+            err = str(e)
+            await writer.update_message(
+                assistant_ref, content="".join(assistant_chunks), error=err, status="error",
+                routing=json.dumps(outcome) if outcome else None,
+            )
+            frame = {"type": "error", "error": err}
+            if isinstance(e, RateLimitExceeded):
+                # shed by the client-side governor: nothing was sent upstream
+                frame.update(code="rate_limited", retry_after=round(e.retry_after, 1))
+            try:
+                await emit(frame)
+            except Exception:
+                pass
+            return None
+
+    async def run_compare(request_id: str, entry: dict, provs: list, targets: list[CompareTarget], prompt: str,
+                          cid: uuid.UUID, temperature, extra: dict):
+        """A compare frame: every target streams at once; the first target's answer continues the conversation."""
+        async def emit(frame: dict) -> None:
+            if entry["reason"] != "disconnected":
+                await send({**frame, "request_id": request_id})
+
+        t0 = time.perf_counter()
+        try:
+            async with conv_locks.setdefault(cid, asyncio.Lock()):
+                memory = context_for(cid)
+                await get_message_writer().add_message(
+                    conversation_id=cid, role="user", content=prompt,
+                    provider=targets[0].provider.lower(), model=targets[0].model, prompt_tokens=0,
+                )
+                memory.append("user", prompt)
+                window = memory.window(targets[0].model, targets[0].provider.lower())
+                await emit({
+                    "type": "start",
+                    "compare": True,
+                    "conversation_id": str(cid),
+                    "targets": [{"index": i, "provider": t.provider.lower(), "model": t.model} for i, t in enumerate(targets)],
+                })
+                primary = ""
+                async for event in compare_events(
+                    provs, targets, window.as_messages(), temperature=temperature, extra=extra,
+                    policy=flush_policy, cid=cid, prompt_tokens=window.tokens,
+                    upstreams=entry["upstreams"], cancelled=lambda: entry["reason"] is not None,
+                ):
+                    if event["type"] == "done":
+                        text = event.pop("text")
+                        if event["index"] == 0:
+                            primary = text
+                    await emit(event)
+                memory.append("assistant", primary)
+            await emit({"type": "compare_done", "latency_ms": int((time.perf_counter() - t0) * 1000)})
+        except Exception as e:
+            logging.warning(f"Compare {request_id} failed: {e}")
+            try:
+                await emit({"type": "error", "error": str(e)})
+            except Exception:
+                pass
+        finally:
+            streams.pop(request_id, None)
+
+    reader = asyncio.create_task(read_frames())
     try:
         while True:
-            try:
-                data = await ws.receive_json()
-            except WebSocketDisconnect:
+            data = await inbox.get()
+            if data is _CLOSED:
                 break
-            except Exception:
-                await ws.send_json({"type": "error", "error": "Invalid JSON"})
+            if data is _INVALID_FRAME or not isinstance(data, dict):
+                await send({"type": "error", "error": "Invalid JSON"})
                 continue
 
             t = data.get("type")
@@ -156,144 +671,128 @@ async def chat_ws(ws: WebSocket):
             if t == "new_chat":
                 prov_req = (data.get("provider") or current_provider) or "openai"
                 try:
-                    conv = create_conversation(default_provider=prov_req)
+                    conv = await acreate_conversation(default_provider=prov_req)
                     conversation_id = conv.id
                     current_provider = conv.default_provider or prov_req
-                    memory.clear()
-                    await ws.send_json({
+                    contexts[conv.id] = ConversationContext()
+                    await send({
                         "type": "conversation_created",
                         "id": str(conversation_id),
                         "provider": current_provider,
                         "title": conv.title or "New chat",
                     })
                 except Exception as e:
-                    await ws.send_json({"type": "error", "error": f"Create chat failed: {e}"})
+                    await send({"type": "error", "error": f"Create chat failed: {e}"})
                 continue
 
             # History and conversation detail handlers
             if t == "history":
-                limit = int(data.get("limit", 50))
-                offset = int(data.get("offset", 0))
-                items: list[dict] = []
-                with session() as s:
-                    convs = (
-                        s.query(Conversation)
-                        .order_by(Conversation.updated_at.desc())
-                        .offset(offset)
-                        .limit(limit)
-                        .all()
+                before = data.get("before") or data.get("cursor")
+                try:
+                    limit = page_limit(data.get("limit"), settings.history_page_size)
+                    offset = page_offset(data.get("offset"))
+                    items = await alist_conversation_history(
+                        limit=limit, offset=offset, user_id=data.get("user_id"), before=before
                     )
-                    conv_ids = [c.id for c in convs]
-                    msgs_by_conv: dict[uuid.UUID, list[Message]] = {cid: [] for cid in conv_ids}
-                    if conv_ids:
-                        all_msgs = (
-                            s.query(Message)
-                            .filter(Message.conversation_id.in_(conv_ids))
-                            .order_by(Message.created_at.asc())
-                            .all()
-                        )
-                        for m in all_msgs:
-                            msgs_by_conv[m.conversation_id].append(m)
-
-                    for c in convs:
-                        conv_msgs = msgs_by_conv.get(c.id, [])
-                        last = conv_msgs[-1] if conv_msgs else None
-                        preview = None
-                        if last and last.content:
-                            preview = last.content[:160] + ("…" if len(last.content) > 160 else "")
-                        items.append(
-                            {
-                                "id": str(c.id),
-                                "title": c.title or "New chat",
-                                "started_at": c.started_at.isoformat(),
-                                "updated_at": c.updated_at.isoformat(),
-                                "default_provider": c.default_provider,
-                                "default_model": c.default_model,
-                                "message_count": len(conv_msgs),
-                                "last_message_preview": preview,
-                            }
-                        )
-                await ws.send_json({"type": "history", "items": items, "offset": offset, "limit": limit})
+                except ValueError as e:
+                    await send({"type": "error", "error": str(e)})
+                    continue
+                await send({
+                    "type": "history",
+                    "items": items,
+                    "offset": offset,
+                    "limit": limit,
+                    "before": before,
+                    "next_cursor": history_cursor(items, limit),
+                })
                 continue
 
             if t == "conversation" or t == "conversation_detail":
                 cid = data.get("id") or data.get("conversation_id")
                 if not cid:
-                    await ws.send_json({"type": "error", "error": "Missing conversation id"})
+                    await send({"type": "error", "error": "Missing conversation id"})
                     continue
                 try:
                     conv_uuid = uuid.UUID(str(cid))
                 except Exception:
-                    await ws.send_json({"type": "error", "error": "Invalid conversation id"})
+                    await send({"type": "error", "error": "Invalid conversation id"})
+                    continue
+                # Newest page first; older pages are fetched with the returned cursor as `before`
+                before = data.get("before")
+                try:
+                    limit = page_limit(data.get("limit"), settings.conversation_page_size)
+                    msgs = await alist_conversation_messages(conv_uuid, limit=limit, before=before)
+                except ValueError as e:
+                    await send({"type": "error", "error": str(e)})
                     continue
-                with session() as s:
-                    msgs = (
-                        s.query(Message)
-                        .filter(Message.conversation_id == conv_uuid)
-                        .order_by(Message.created_at.asc())
-                        .all()
-                    )
 
-                    memory.clear()
-                    # Rebuild in-memory context from this conversation (cap by max_messages)
-                    memory[:] = [
-                        {"role": m.role, "content": m.content}
-                        for m in msgs
-                        if m.role in ("user", "assistant") and m.content
-                    ]
-                    if len(memory) > max_messages:
-                        memory[:] = memory[-max_messages:]           
-
-                    payload = [
-                        {
-                            "id": m.id,
-                            "role": m.role,
-                            "content": m.content,
-                            "provider": m.provider,
-                            "model": m.model,
-                            "created_at": m.created_at.isoformat(),
-                            "latency_ms": m.latency_ms,
-                            "first_token_ms": m.first_token_ms,
-                            "error": m.error,
-                            "prompt_tokens": m.prompt_tokens,
-                            "response_tokens": m.response_tokens,
-                        }
-                        for m in msgs
-                    ]
-                await ws.send_json({"type": "conversation", "id": str(conv_uuid), "messages": payload})
+                if not before:
+                    # Rebuild in-memory context from the newest page
+                    context_for(conv_uuid).load((m.role, m.content) for m in msgs)
+
+                payload = [
+                    {
+                        "id": m.id,
+                        "role": m.role,
+                        "content": m.content,
+                        "provider": m.provider,
+                        "model": m.model,
+                        "created_at": m.created_at.isoformat(),
+                        "latency_ms": m.latency_ms,
+                        "first_token_ms": m.first_token_ms,
+                        "error": m.error,
+                        "status": m.status,
+                        "routing": json.loads(m.routing) if m.routing else None,
+                        "prompt_tokens": m.prompt_tokens,
+                        "response_tokens": m.response_tokens,
+                        "cached_tokens": m.cached_tokens,
+                    }
+                    for m in msgs
+                ]
+                await send({
+                    "type": "conversation",
+                    "id": str(conv_uuid),
+                    "messages": payload,
+                    "before": before,
+                    "next_cursor": messages_cursor(msgs, limit),
+                })
                 continue
 
             if t == "providers" or data.get("action") == "providers":
-                await ws.send_json({"type": "providers", "providers": get_available_providers()})
+                await send({"type": "providers", "providers": get_available_providers()})
                 continue
 
-            # Fetch models for a provider (with optional refresh to bypass cache)
+            # Fetch models for a provider; refresh revalidates in the background and pushes a second frame
             if t == "models" or data.get("action") == "models":
                 prov_name = (data.get("provider") or current_provider or "").lower().strip()
                 refresh = bool(data.get("refresh", False))
                 if not prov_name:
-                    await ws.send_json({"type": "error", "error": "Missing provider"})
+                    await send({"type": "error", "error": "Missing provider"})
                     continue
                 if prov_name not in get_available_providers():
-                    await ws.send_json({"type": "error", "error": f"Provider not available: {prov_name}"})
+                    await send({"type": "error", "error": f"Provider not available: {prov_name}"})
                     continue
                 try:
-                    models = get_provider_models(prov_name, use_cache=not refresh)
-                    await ws.send_json({"type": "models", "provider": prov_name, "models": models})
+                    catalog = get_model_catalog()
+                    cached = catalog.cached(prov_name) is not None
+                    models = await catalog.aget(prov_name)
+                    await send({"type": "models", "provider": prov_name, "models": models})
+                    if refresh and cached:
+                        spawn(push_refreshed_models(prov_name, models))
                 except Exception as e:
-                    await ws.send_json({"type": "error", "error": f"Model list failed: {e}"})
+                    await send({"type": "error", "error": f"Model list failed: {e}"})
                 continue
 
             if t == "set_provider":
                 requested = (data.get("provider") or "").lower().strip()
                 if not requested:
-                    await ws.send_json({"type": "error", "error": "Missing provider"})
+                    await send({"type": "error", "error": "Missing provider"})
                     continue
                 if requested not in get_available_providers():
-                    await ws.send_json({"type": "error", "error": f"Provider not available: {requested}"})
+                    await send({"type": "error", "error": f"Provider not available: {requested}"})
                     continue
                 current_provider = requested
-                await ws.send_json({"type": "provider_changed", "provider": current_provider})
+                await send({"type": "provider_changed", "provider": current_provider})
                 continue
 
             # Allow provider-only frames
@@ -301,38 +800,33 @@ async def chat_ws(ws: WebSocket):
                 requested = (data.get("provider") or "").lower().strip()
                 if requested and requested != current_provider:
                     if requested not in get_available_providers():
-                        await ws.send_json({"type": "error", "error": f"Provider not available: {requested}"})
+                        await send({"type": "error", "error": f"Provider not available: {requested}"})
                         continue
                     current_provider = requested
-                    await ws.send_json({"type": "provider_changed", "provider": current_provider})
+                    await send({"type": "provider_changed", "provider": current_provider})
                 continue
 
             # === Delete conversation ===
             if t == "delete_conversation":
                 cid = data.get("id") or data.get("conversation_id")
                 if not cid:
-                    await ws.send_json({"type": "error", "error": "Missing conversation id"})
+                    await send({"type": "error", "error": "Missing conversation id"})
                     continue
                 try:
                     conv_uuid = uuid.UUID(str(cid))
                 except Exception:
-                    await ws.send_json({"type": "error", "error": "Invalid conversation id"})
+                    await send({"type": "error", "error": "Invalid conversation id"})
                     continue
 
                 try:
-                    with session() as s:
-                        # Delete messages first (if no DB cascade)
-                        s.query(Message).filter(Message.conversation_id == conv_uuid).delete(synchronize_session=False)
-                        # Delete the conversation
-                        s.query(Conversation).filter(Conversation.id == conv_uuid).delete(synchronize_session=False)
-                        s.commit()
+                    await adelete_conversation(conv_uuid)
                     # Clear current selection if we deleted it
                     if conversation_id == conv_uuid:
                         conversation_id = None
-                        memory.clear()
-                    await ws.send_json({"type": "conversation_deleted", "id": str(conv_uuid)})
+                    contexts.pop(conv_uuid, None)
+                    await send({"type": "conversation_deleted", "id": str(conv_uuid)})
                 except Exception as e:
-                    await ws.send_json({"type": "error", "error": f"Delete failed: {e}"})
+                    await send({"type": "error", "error": f"Delete failed: {e}"})
                 continue
 
             # === Rename conversation ===
@@ -341,60 +835,55 @@ async def chat_ws(ws: WebSocket):
                 raw_title = (data.get("title") or "")
                 title = str(raw_title).strip()
                 if not cid:
-                    await ws.send_json({"type": "error", "error": "Missing conversation id"})
+                    await send({"type": "error", "error": "Missing conversation id"})
                     continue
                 try:
                     conv_uuid = uuid.UUID(str(cid))
                 except Exception:
-                    await ws.send_json({"type": "error", "error": "Invalid conversation id"})
+                    await send({"type": "error", "error": "Invalid conversation id"})
                     continue
                 if not title:
-                    await ws.send_json({"type": "error", "error": "Title must not be empty"})
+                    await send({"type": "error", "error": "Title must not be empty"})
                     continue
                 # Enforce max length (DB column String(200))
                 if len(title) > 200:
                     title = title[:200].rstrip()
                 try:
-                    with session() as s:
-                        conv = s.get(Conversation, conv_uuid)
-                        if not conv:
-                            await ws.send_json({"type": "error", "error": "Conversation not found"})
-                            continue
-                        conv.title = title
-                        s.commit()
-                        # s.refresh(conv)  # not strictly needed for title
+                    if not await arename_conversation(conv_uuid, title):
+                        await send({"type": "error", "error": "Conversation not found"})
+                        continue
                     # Reuse the same event type used by auto-title to keep the frontend simple
-                    await ws.send_json({"type": "conversation_title", "id": str(conv_uuid), "title": title})
+                    await send({"type": "conversation_title", "id": str(conv_uuid), "title": title})
                 except Exception as e:
-                    await ws.send_json({"type": "error", "error": f"Rename failed: {e}"})
+                    await send({"type": "error", "error": f"Rename failed: {e}"})
                 continue
 
             # === Rate a message (vote/score/label/comment) ===
             if t in ("rate", "rating"):
                 mid = data.get("message_id") or data.get("id")
                 if mid is None:
-                    await ws.send_json({"type": "error", "error": "Missing message_id"})
+                    await send({"type": "error", "error": "Missing message_id"})
                     continue
                 try:
                     mid_int = int(mid)
                 except Exception:
-                    await ws.send_json({"type": "error", "error": "Invalid message_id"})
+                    await send({"type": "error", "error": "Invalid message_id"})
                     continue
 
                 # Validate vote and score
                 vote = int(data.get("vote", 0))
                 if vote not in (-1, 0, 1):
-                    await ws.send_json({"type": "error", "error": "vote must be -1, 0, or 1"})
+                    await send({"type": "error", "error": "vote must be -1, 0, or 1"})
                     continue
                 score = data.get("score")
                 if score is not None:
                     try:
                         score = int(score)
                     except Exception:
-                        await ws.send_json({"type": "error", "error": "score must be integer 1..5"})
+                        await send({"type": "error", "error": "score must be integer 1..5"})
                         continue
                     if not (1 <= score <= 5):
-                        await ws.send_json({"type": "error", "error": "score must be between 1 and 5"})
+                        await send({"type": "error", "error": "score must be between 1 and 5"})
                         continue
 
                 label = (data.get("label") or None)
@@ -402,7 +891,7 @@ async def chat_ws(ws: WebSocket):
                 user_id = (data.get("user_id") or None)
 
                 try:
-                    rec = add_message_rating(
+                    rec = await aadd_message_rating(
                         message_id=mid_int,
                         user_id=user_id,
                         vote=vote,
@@ -410,7 +899,7 @@ async def chat_ws(ws: WebSocket):
                         label=label,
                         comment=comment,
                     )
-                    await ws.send_json(
+                    await send(
                         {
                             "type": "rating",
                             "ok": True,
@@ -424,13 +913,24 @@ async def chat_ws(ws: WebSocket):
                         }
                     )
                 except Exception as e:
-                    await ws.send_json({"type": "error", "error": f"Rating failed: {e}"})
+                    await send({"type": "error", "error": f"Rating failed: {e}"})
                 continue
 
             # === Chat prompt ===
+            request_id = str(data.get("request_id") or uuid.uuid4().hex[:12])
             prompt = (data.get("prompt") or "").strip()
             if not prompt:
-                await ws.send_json({"type": "error", "error": "Empty prompt"})
+                await send({"type": "error", "request_id": request_id, "error": "Empty prompt"})
+                continue
+            if request_id in streams:
+                await send({"type": "error", "request_id": request_id, "error": "Duplicate request_id"})
+                continue
+            if len(streams) >= settings.ws_max_concurrent_prompts:
+                await send({
+                    "type": "error",
+                    "request_id": request_id,
+                    "error": f"Too many concurrent prompts (limit {settings.ws_max_concurrent_prompts})",
+                })
                 continue
 
             # Determine which conversation to write to
@@ -440,93 +940,61 @@ async def chat_ws(ws: WebSocket):
               try:
                 use_cid = uuid.UUID(str(cid_in))
               except Exception:
-                await ws.send_json({"type": "error", "error": "Invalid conversation id"})
+                await send({"type": "error", "request_id": request_id, "error": "Invalid conversation id"})
                 continue
             else:
               use_cid = conversation_id
 
             if not use_cid:
-                await ws.send_json({"type": "error", "error": "No conversation selected. Create one first."})
+                await send({"type": "error", "request_id": request_id, "error": "No conversation selected. Create one first."})
                 continue
 
-            provider_name = (data.get("provider") or current_provider).lower()
-            model = data.get("model")
             temperature = data.get("temperature", 0.7)
+            # Optional system prompt; only passed on when set
+            extra = {"system": data["system"]} if data.get("system") else {}
 
-            t0 = time.perf_counter()
-            first_token_time = None
-
-            try:
-                prov = get_provider(provider_name)
-            except Exception as e:
-                await ws.send_json({"type": "error", "error": f"Provider load failed: {e}"})
+            # === Compare: the same prompt answered by several providers/models at once ===
+            if t == "compare":
+                try:
+                    targets = [CompareTarget(**x) for x in data.get("targets") or []]
+                    provs = load_compare_targets(targets)
+                except Exception as e:
+                    await send({"type": "error", "request_id": request_id, "error": f"Compare failed: {e}"})
+                    continue
+                entry = streams[request_id] = {"task": None, "upstreams": [], "reason": None}
+                entry["task"] = asyncio.create_task(run_compare(
+                    request_id, entry, provs, targets, prompt, use_cid, temperature=temperature, extra=extra,
+                ))
                 continue
 
-            add_message(
-                conversation_id=use_cid,
-                role="user",
-                content=prompt,
-                provider=provider_name,
-                model=model,
-                prompt_tokens=0,
-            )
-            memory.append({"role": "user", "content": prompt})
-            if len(memory) > max_messages:
-                memory[:] = memory[-max_messages:]
-
-            ctx = build_context(prompt)
-
-            logging.warning(ctx)
-            await ws.send_json({"type": "start", "provider": provider_name, "model": model})
-            q: asyncio.Queue[str | None] = asyncio.Queue()
-            assistant_chunks: list[str] = []
-
-            assistant = add_message(
-                conversation_id=use_cid,
-                role="assistant",
-                content="",
-                provider=provider_name,
-                model=model,
-            )
-            assistant_id = assistant.id
-
+            provider_name = (data.get("provider") or current_provider).lower()
+            route = route_target(provider_name, data.get("candidates"))
             try:
-                gen = prov.stream(ctx, model=model, temperature=temperature)
-                asyncio.create_task(stream_provider(gen, q))
-                while True:
-                    piece = await q.get()
-                    if piece is None:
-                        break
-                    if first_token_time is None:
-                        first_token_time = time.perf_counter()
-                    assistant_chunks.append(piece)
-                    await ws.send_json({"type": "delta", "data": piece})
-
-                text_out = "".join(assistant_chunks).strip()
-                memory.append({"role": "assistant", "content": text_out})
-                await ws.send_json({"type": "done", "message_id": assistant_id})
-
-                latency_ms = int((time.perf_counter() - t0) * 1000)
-                first_token_ms = int((first_token_time - t0) * 1000) if first_token_time else latency_ms
-                update_message_content(
-                    assistant_id,
-                    content=text_out,
-                    latency_ms=latency_ms,
-                    first_token_ms=first_token_ms,
-                )
-
-                # Create title for this conversation only
-                await maybe_create_title(first_user=prompt, assistant_text=text_out, provider_name=provider_name, model=model, cid=use_cid)
-
+                if route is not None:
+                    prov = None
+                    get_router().candidates(route)
+                else:
+                    prov = get_provider(provider_name)
             except Exception as e:
-                err = str(e)
-                await ws.send_json({"type": "error", "error": err})
-                update_message_content(assistant_id, content="".join(assistant_chunks), error=err)
+                await send({"type": "error", "request_id": request_id, "error": f"Provider load failed: {e}"})
                 continue
+
+            entry = streams[request_id] = {"task": None, "upstreams": [], "reason": None}
+            entry["task"] = asyncio.create_task(run_prompt(
+                request_id, entry, prov, prompt, use_cid, provider_name,
+                model=data.get("model"), temperature=temperature, extra=extra, route=route,
+            ))
     except WebSocketDisconnect:
         pass
     except Exception as e:
         try:
-            await ws.send_json({"type": "error", "error": f"Fatal: {e}"})
+            await send({"type": "error", "error": f"Fatal: {e}"})
         finally:
-            await ws.close()
\ No newline at end of file
+            await ws.close()
+    finally:
+        reader.cancel()
+        cancel_stream("disconnected")
+        # let cancelled prompts persist their partial answers, and pending titles be saved
+        await asyncio.gather(
+            *(e["task"] for e in list(streams.values()) if e["task"]), *background, return_exceptions=True,
+        )
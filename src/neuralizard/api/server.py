@@ -1,13 +1,28 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from neuralizard.db import init_db
+import logging
+from neuralizard.config import settings
+from neuralizard.db import init_db, recent_first_token_samples, stop_message_writer, dispose_async_engine
+from neuralizard.providers import aclose_providers, get_first_token_tracker, save_semantic_cache, shutdown_offloader
 from .routes import chat
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    if settings.hedge_policies:
+        # hedge delays start from the first-token times already on record
+        try:
+            get_first_token_tracker().seed(recent_first_token_samples())
+        except Exception as e:
+            logging.warning(f"Loading first-token samples failed: {e}")
     yield
+    # Drain queued message writes before tearing down clients
+    await stop_message_writer()
+    await dispose_async_engine()
+    await aclose_providers()
+    shutdown_offloader()
+    save_semantic_cache()
 
 app = FastAPI(title="Neuralizard API", version="0.1.0", lifespan=lifespan)
 
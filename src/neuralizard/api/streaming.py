@@ -0,0 +1,120 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Mapping, Sequence
+from neuralizard.config import settings
+
+MAX_FLUSH_MS = 250
+MAX_FLUSH_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    """When to flush buffered deltas: after `interval_ms` or once `max_bytes` are buffered."""
+    interval_ms: int
+    max_bytes: int
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_ms > 0 and self.max_bytes > 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {"flush_ms": self.interval_ms, "flush_bytes": self.max_bytes}
+
+    @classmethod
+    def negotiate(cls, params: Mapping[str, str]) -> "FlushPolicy":
+        """Build a policy from handshake query params, falling back to Settings."""
+        def read(key: str, default: int, upper: int) -> int:
+            try:
+                value = int(params.get(key, default))
+            except (TypeError, ValueError):
+                value = default
+            return max(0, min(upper, value))
+
+        return cls(
+            interval_ms=read("flush_ms", settings.ws_flush_ms, MAX_FLUSH_MS),
+            max_bytes=read("flush_bytes", settings.ws_flush_bytes, MAX_FLUSH_BYTES),
+        )
+
+
+async def coalesce(q: asyncio.Queue, policy: FlushPolicy) -> AsyncIterator[str]:
+    """
+    Read text pieces from `q` (None terminates) and yield them in batches.
+    The first piece is yielded immediately so first-token latency is unchanged;
+    later pieces are buffered until the time window or byte threshold is hit.
+    """
+    first = await q.get()
+    if first is None:
+        return
+    yield first
+
+    if not policy.enabled:
+        while (piece := await q.get()) is not None:
+            yield piece
+        return
+
+    loop = asyncio.get_running_loop()
+    interval = policy.interval_ms / 1000.0
+    buf: list[str] = []
+    size = 0
+    deadline: float | None = None
+
+    while True:
+        if deadline is None:
+            piece = await q.get()
+        else:
+            try:
+                piece = await asyncio.wait_for(q.get(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                yield "".join(buf)
+                buf, size, deadline = [], 0, None
+                continue
+
+        if piece is None:
+            if buf:
+                yield "".join(buf)
+            return
+
+        buf.append(piece)
+        size += len(piece.encode("utf-8"))
+        if size >= policy.max_bytes:
+            yield "".join(buf)
+            buf, size, deadline = [], 0, None
+        elif deadline is None:
+            deadline = loop.time() + interval
+
+
+# Marks the end of one source in fan_in()
+STREAM_END = object()
+
+
+async def fan_in(sources: Sequence[AsyncIterator[Any]]) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Iterate several async iterators at once and yield (index, item) in arrival
+    order, then (index, STREAM_END) once source `index` is exhausted. A source
+    that raises yields (index, exception) before its end marker. Closing the
+    generator cancels the sources still running.
+    """
+    q: asyncio.Queue = asyncio.Queue()
+
+    async def pump(index: int, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                await q.put((index, item))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await q.put((index, e))
+        await q.put((index, STREAM_END))
+
+    tasks = [asyncio.create_task(pump(i, src)) for i, src in enumerate(sources)]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            index, item = await q.get()
+            if item is STREAM_END:
+                remaining -= 1
+            yield index, item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
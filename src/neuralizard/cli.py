@@ -1,10 +1,12 @@
 import typer
 from rich import print
 from rich.console import Console
+from rich.markup import escape
 from typing import Optional
 from .config import settings, APP_DIR
-from .db import init_db, session, Interaction
-from .providers import get_provider
+from . import db
+from .db import init_db, session, backfill_conversation_summaries
+from .providers import get_provider, retry_call
 
 app = typer.Typer(add_completion=False)
 console = Console()
@@ -24,6 +26,18 @@ def init():
     print(f"[green]Initialized[/green] DB (url={settings.db_url}) and env at {env}")
 
 
+# ============================================================
+# 🧮 BACKFILL
+# ============================================================
+
+@app.command("backfill-summaries")
+def backfill_summaries():
+    """Recompute conversation message counts, last-message time and previews."""
+    init_db()
+    n = backfill_conversation_summaries()
+    print(f"[green]Backfilled[/green] summaries for {n} conversations")
+
+
 # ============================================================
 # 💬 ASK
 # ============================================================
@@ -33,30 +47,20 @@ def ask(
     prompt: str,
     provider: str = typer.Option(settings.default_provider, "--provider", "-p"),
     model: Optional[str] = typer.Option(None, "--model", "-m"),
-    category: Optional[str] = typer.Option(None, "--category", "-c"),
 ):
-    """Send a prompt, print answer, log interaction"""
+    """Send a prompt, print answer, save it as a one-exchange conversation"""
     prov = get_provider(provider)
-    res = prov.complete(prompt, model)
+    res = retry_call(provider, lambda: prov.complete(prompt, model))
 
-    with session() as s:
-        inter = Interaction(
-            provider=res.provider,
-            model=res.model,
-            prompt=prompt,
-            response=res.text,
-            prompt_tokens=res.prompt_tokens,
-            response_tokens=res.response_tokens,
-            latency_ms=res.latency_ms,
-            category=category,
-            rating=None,
-            source_app="cli",
-        )
-        s.add(inter)
-        s.commit()
-        print(f"[bold cyan]#{inter.id}[/bold cyan] {res.provider}/{res.model} [{res.latency_ms} ms]")
-        print()
-        print(res.text)
+    conv = db.create_conversation(default_provider=res.provider, default_model=res.model)
+    db.add_message(conv.id, "user", prompt, res.provider, res.model)
+    msg = db.add_message(
+        conv.id, "assistant", res.text, res.provider, res.model,
+        latency_ms=res.latency_ms, prompt_tokens=res.prompt_tokens, response_tokens=res.response_tokens,
+    )
+    print(f"[bold cyan]#{msg.id}[/bold cyan] {res.provider}/{res.model} [{res.latency_ms} ms]")
+    print()
+    print(res.text)
 
 
 # ============================================================
@@ -75,7 +79,9 @@ def chat(
     console.print("[dim]Type 'exit' or press Ctrl+C to quit. Use '/clear' to reset context.[/dim]\n")
 
     prov = get_provider(provider)
+    model_name = model or getattr(prov, "default_model", None)
     history = []
+    conv_id = None  # created with the first exchange; /clear starts a new conversation
 
     while True:
         try:
@@ -87,6 +93,7 @@ def chat(
                 break
             if user_input == "/clear":
                 history.clear()
+                conv_id = None
                 console.print("[blue]🧹 Context cleared.[/blue]")
                 continue
 
@@ -97,29 +104,20 @@ def chat(
             console.print(f"[bold magenta]{provider.title()}:[/bold magenta] ", end="")
             buffer = ""
             for token in prov.stream(prompt, model=model):
+                if not isinstance(token, str):
+                    continue  # end-of-stream usage
                 console.print(token, end="", style="white", soft_wrap=True)
                 buffer += token
             console.print("\n")
 
             history.append({"role": "assistant", "content": buffer})
 
-            # Log this interaction to DB
-            with session() as s:
-                inter = Interaction(
-                    provider=prov.name,
-                    model=model or getattr(prov, "default_model", "unknown"),
-                    prompt=user_input,
-                    response=buffer,
-                    prompt_tokens=0,
-                    response_tokens=0,
-                    latency_ms=0,
-                    category="chat",
-                    rating=None,
-                    source_app="cli-chat",
-                )
-                s.add(inter)
-                s.commit()
-                console.print(f"[dim]💾 Saved as interaction #{inter.id}[/dim]")
+            # Save this exchange to the conversation
+            if conv_id is None:
+                conv_id = db.create_conversation(default_provider=prov.name, default_model=model_name).id
+            db.add_message(conv_id, "user", user_input, prov.name, model_name)
+            msg = db.add_message(conv_id, "assistant", buffer, prov.name, model_name)
+            console.print(f"[dim]💾 Saved as message #{msg.id}[/dim]")
 
         except KeyboardInterrupt:
             console.print("\n[red]💤 Interrupted. Goodbye![/red]")
@@ -134,16 +132,15 @@ def chat(
 
 @app.command()
 def rate(id: int, value: str):
-    """Mark an interaction as good/bad"""
+    """Mark an answer (message id) as good/bad"""
     if value not in {"good", "bad"}:
         raise typer.BadParameter('Value must be "good" or "bad"')
     with session() as s:
-        inter = s.get(Interaction, id)
-        if not inter:
-            raise typer.BadParameter(f"Interaction {id} not found")
-        inter.rating = value
-        s.commit()
-        print(f"[green]Updated[/green] #{id} rating -> {value}")
+        msg = s.get(db.Message, id)
+    if not msg or msg.role != "assistant":
+        raise typer.BadParameter(f"Answer {id} not found")
+    db.add_message_rating(id, vote=1 if value == "good" else -1)
+    print(f"[green]Updated[/green] #{id} rating -> {value}")
 
 
 # ============================================================
@@ -152,13 +149,35 @@ def rate(id: int, value: str):
 
 @app.command()
 def log(last: int = typer.Option(10, "--last", "-n")):
-    """Show recent interactions"""
+    """Show recent answers with the prompt they replied to"""
     with session() as s:
-        rows = s.query(Interaction).order_by(Interaction.id.desc()).limit(last).all()
+        rows = (
+            s.query(db.Message)
+            .filter(db.Message.role == "assistant")
+            .order_by(db.Message.id.desc())
+            .limit(last)
+            .all()
+        )
         for r in rows:
-            title = (r.prompt[:80] + "…") if len(r.prompt) > 80 else r.prompt
-            print(f"[bold cyan]#{r.id}[/bold cyan] {r.provider}/{r.model} [{r.ts}] [{r.rating or '-'}]")
-            print(f"  {title}\n")
+            prompt = (
+                s.query(db.Message.content)
+                .filter(db.Message.conversation_id == r.conversation_id, db.Message.role == "user",
+                        db.Message.id < r.id)
+                .order_by(db.Message.id.desc())
+                .limit(1)
+                .scalar()
+            ) or ""
+            vote = (
+                s.query(db.MessageRating.vote)
+                .filter(db.MessageRating.message_id == r.id)
+                .order_by(db.MessageRating.id.desc())
+                .limit(1)
+                .scalar()
+            )
+            rating = {1: "good", -1: "bad"}.get(vote, "-")
+            title = (prompt[:80] + "…") if len(prompt) > 80 else prompt
+            print(f"[bold cyan]#{r.id}[/bold cyan] {r.provider}/{r.model} " + escape(f"[{r.created_at}] [{rating}]"))
+            print(f"  {escape(title)}\n")
 
 
 # ============================================================
@@ -9,6 +9,13 @@ class Settings(BaseSettings):
     db_url: str
     default_provider: str = "openai"
 
+    # Connection pools (sync engine and async engine share these settings)
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+
     openai_api_key: str | None = Field(default=None, alias="OPENAI_API_KEY")
     anthropic_api_key: str | None = Field(default=None, alias="ANTHROPIC_API_KEY")
     google_api_key: str | None = Field(default=None, alias="GOOGLE_API_KEY")
@@ -18,6 +25,104 @@ class Settings(BaseSettings):
     deepseek_api_key: str | None = Field(default=None, env="DEEPSEEK_API_KEY")
     perplexity_api_key: str | None = Field(default=None, env="PERPLEXITY_API_KEY")
 
+    # One HTTP connection pool shared by all provider clients (see neuralizard.providers.transport)
+    http_pool_size: int = 100  # connections across all hosts
+    http_max_keepalive: int = 40
+    http_keepalive_expiry: float = 30.0  # below common provider/LB idle timeouts, so stale sockets aren't reused
+    http_max_per_host: int = 20  # requests in flight per host; one slow provider can't drain the pool
+    http_dns_ttl: float = 300.0  # seconds resolved addresses are reused; 0 = resolve per connection
+    http_timeout: float = 60.0
+    http2: bool = True  # used when the h2 package is installed
+
+    # Extra OpenAI-compatible chat endpoints (vLLM, llama.cpp server, ...) served as
+    # providers by name, e.g. OPENAI_COMPATIBLE='{"local": {"base_url": "http://localhost:8000",
+    # "default_model": "llama-3.1-8b", "api_key": null}}'
+    # (fields: see neuralizard.providers.openai_compat.OpenAICompatProvider)
+    openai_compatible: dict[str, dict] = {}
+
+    # Worker pool for sync-only providers (streams run off the event loop)
+    offload_max_workers: int = 32
+    offload_queue_size: int = 64
+    offload_per_provider_limit: int = 8
+
+    # Write-behind persistence of chat messages
+    db_write_batch_size: int = 100
+    db_write_flush_ms: int = 50
+    db_write_max_pending: int = 10000
+
+    # WebSocket delta coalescing (clients may override via ?flush_ms=&flush_bytes=)
+    ws_flush_ms: int = 20
+    ws_flush_bytes: int = 512
+    # Prompts one WebSocket may stream at the same time (each gets its own request_id)
+    ws_max_concurrent_prompts: int = 4
+    # Providers/models one compare request may fan out to
+    compare_max_targets: int = 6
+
+    # Keyset pagination page sizes (sidebar history / conversation detail)
+    history_page_size: int = 50
+    conversation_page_size: int = 100
+    # Largest page a client may ask for ("limit" on history / conversation frames is clamped to it)
+    max_page_size: int = 200
+
+    # Conversation context sent to providers (see neuralizard.context)
+    context_max_tokens: int = 8192  # prompt token budget per request; 0 = the model's full window
+    context_reserve_tokens: int = 1024  # kept free for the response
+    context_max_messages: int = 200
+
+    # Mark the stable conversation prefix with Anthropic cache_control breakpoints
+    anthropic_prompt_cache: bool = True
+
+    # Exact-match response cache for non-streaming completions
+    response_cache_enabled: bool = True
+    response_cache_ttl: float = 3600.0
+    response_cache_max_entries: int = 1024
+    response_cache_max_bytes: int = 32 * 1024 * 1024
+    response_cache_url: str | None = None  # optional shared tier, e.g. the db_url
+
+    # Opt-in semantic response cache (see neuralizard.providers.semantic_cache)
+    semantic_cache_enabled: bool = False
+    semantic_cache_embedder: str = "hashing"  # or a sentence-transformers model name
+    semantic_cache_dim: int = 512  # hashing embedder only
+    semantic_cache_capacity: int = 10000
+    semantic_cache_ttl: float = 24 * 3600.0
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_thresholds: dict[str, float] = {}  # per-provider overrides
+    semantic_cache_path: str | None = None  # memory-mapped index file; None = in-memory
+
+    # Provider model lists (stale-while-revalidate; persisted so a cold start serves the last list)
+    model_catalog_ttl: float = 600.0
+    model_catalog_error_ttl: float = 60.0
+    model_catalog_path: str | None = str(APP_DIR / "models.json")
+
+    # Opt-in hedged streaming per route ("stream", "ws"), e.g.
+    # HEDGE_POLICIES='{"ws": {"backup_provider": "anthropic", "backup_model": "claude-3-5-haiku-latest", "percentile": 0.9}}'
+    # (fields: see neuralizard.providers.hedging.HedgePolicy)
+    hedge_policies: dict[str, dict] = {}
+    hedge_sample_window: int = 200  # first_token_ms samples kept per provider/model
+
+    # Health-aware routing: a request whose provider is an alias (or that names
+    # candidates) goes to the healthiest "provider[:model]" in the list, e.g.
+    # ROUTER_ALIASES='{"fast": ["openai:gpt-4o-mini", "anthropic:claude-3-5-haiku-latest"]}'
+    router_aliases: dict[str, list[str]] = {}
+    router_failure_threshold: int = 3  # consecutive failures that open a candidate's circuit
+    router_cooldown: float = 30.0  # seconds a tripped or rate-limited candidate is skipped
+    router_window: int = 50  # outcomes kept per candidate for its error rate
+
+    # Client-side rate limiting per provider and API key (token buckets, calibrated from
+    # x-ratelimit-* response headers), e.g. RATE_LIMITS='{"openai": {"rpm": 500, "tpm": 200000}}'
+    rate_limit_enabled: bool = True
+    rate_limits: dict[str, dict[str, float]] = {}
+    rate_limit_store: str | None = str(APP_DIR / "ratelimit.db")  # shared by local workers; None = per process
+    rate_limit_max_wait: float = 10.0  # queue up to this long for budget, then shed the request
+    rate_limit_output_tokens: int = 512  # response tokens reserved per request in the TPM bucket
+
+    # Provider retries (jittered exponential backoff; streams only retry before their first chunk)
+    retry_connect_attempts: int = 3  # retries after connection failures
+    retry_read_attempts: int = 2  # retries after timeouts, dropped reads and 429/5xx responses
+    retry_base_delay: float = 0.25
+    retry_max_delay: float = 8.0
+    retry_max_retry_after: float = 30.0  # a longer Retry-After fails the call instead of waiting
+
     model_config = SettingsConfigDict(
         env_file=str(APP_DIR / ".env"),
         env_file_encoding="utf-8",
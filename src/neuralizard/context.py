@@ -0,0 +1,261 @@
+"""
+Token-budgeted conversation context.
+
+Each chat keeps its turns in a ConversationContext. Per turn, window() fills
+the model's token budget from the newest message back to the oldest that still
+fits, so long chats neither overflow the context limit nor resend history the
+budget has no room for. Token counts are cached on each message per encoder,
+so a new turn only tokenizes the message that was just added.
+"""
+from __future__ import annotations
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, Optional, Protocol
+
+from .config import settings
+
+try:
+    import tiktoken
+except ImportError:  # counts fall back to the character estimate below
+    tiktoken = None
+
+
+# ============================================================
+# Tokenizers
+# ============================================================
+
+class Encoder(Protocol):
+    name: str
+    def count(self, text: str) -> int: ...
+    def truncate(self, text: str, max_tokens: int) -> str: ...
+
+
+class _TiktokenEncoder:
+    def __init__(self, enc):
+        self._enc = enc
+        self.name = enc.name
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        ids = self._enc.encode(text, disallowed_special=())
+        return text if len(ids) <= max_tokens else self._enc.decode(ids[:max(0, max_tokens)])
+
+
+class _ApproxEncoder:
+    """~4 characters per token; used when tiktoken is unavailable or cannot load an encoding."""
+    name = "approx"
+    CHARS_PER_TOKEN = 4
+
+    def count(self, text: str) -> int:
+        return -(-len(text) // self.CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return text[:max(0, max_tokens) * self.CHARS_PER_TOKEN]
+
+
+_APPROX = _ApproxEncoder()
+
+
+@lru_cache(maxsize=256)
+def get_encoder(model: Optional[str] = None) -> Encoder:
+    """
+    Encoder for `model`, cached per model name. OpenAI models get their own
+    encoding; other providers' models are approximated with o200k_base.
+    """
+    if tiktoken is None:
+        return _APPROX
+    try:
+        try:
+            enc = tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        return _TiktokenEncoder(enc)
+    except Exception as e:
+        # encodings are fetched on first use; offline installs fall back to the estimate
+        logging.warning("tiktoken unavailable for %r, estimating token counts: %s", model, e)
+        return _APPROX
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return get_encoder(model).count(text)
+
+
+# ============================================================
+# Context windows
+# ============================================================
+
+# Longest matching prefix wins
+CONTEXT_WINDOWS: dict[str, int] = {
+    "gpt-4.1": 1_047_576,
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+    "claude": 200_000,
+    "gemini-1.5": 1_048_576,
+    "gemini-2": 1_048_576,
+    "gemini": 32_768,
+    "mistral-large": 128_000,
+    "mistral-small": 32_000,
+    "open-mistral-nemo": 128_000,
+    "codestral": 256_000,
+    "deepseek": 64_000,
+    "grok": 131_072,
+    "sonar": 127_072,
+    "command-r": 128_000,
+    "command": 4_096,
+}
+
+PROVIDER_WINDOWS: dict[str, int] = {
+    "openai": 128_000,
+    "anthropic": 200_000,
+    "google": 32_768,
+    "mistral": 32_000,
+    "deepseek": 64_000,
+    "xai": 131_072,
+    "perplexity": 127_072,
+    "cohere": 128_000,
+}
+
+DEFAULT_CONTEXT_WINDOW = 8_192
+
+
+def context_window(model: Optional[str], provider: Optional[str] = None) -> int:
+    """Context size in tokens for `model`, falling back to the provider's default."""
+    m = (model or "").lower()
+    best = max((p for p in CONTEXT_WINDOWS if m.startswith(p)), key=len, default=None)
+    if best:
+        return CONTEXT_WINDOWS[best]
+    return PROVIDER_WINDOWS.get((provider or "").lower(), DEFAULT_CONTEXT_WINDOW)
+
+
+def context_budget(model: Optional[str], provider: Optional[str] = None) -> int:
+    """Prompt tokens available: the window minus the response reserve, capped by context_max_tokens."""
+    budget = context_window(model, provider) - settings.context_reserve_tokens
+    if settings.context_max_tokens > 0:
+        budget = min(budget, settings.context_max_tokens)
+    return max(budget, 1)
+
+
+# ============================================================
+# Conversation context
+# ============================================================
+
+_LABELS = {"user": "User", "assistant": "Assistant", "system": "System"}
+_SEPARATOR_TOKENS = 1  # newline between rendered turns
+_SUFFIX = "Assistant:"
+
+
+@dataclass(eq=False)
+class ContextMessage:
+    role: str
+    content: str
+    # token count per encoder name, filled lazily by tokens()
+    _tokens: dict[str, int] = field(default_factory=dict, repr=False)
+
+    def render(self) -> str:
+        return f"{_LABELS.get(self.role, self.role.title())}: {self.content}"
+
+    def tokens(self, enc: Encoder) -> int:
+        n = self._tokens.get(enc.name)
+        if n is None:
+            n = self._tokens[enc.name] = enc.count(self.render()) + _SEPARATOR_TOKENS
+        return n
+
+
+@dataclass
+class ContextWindow:
+    """The slice of a conversation that fits one request."""
+    messages: list[ContextMessage]
+    tokens: int
+    budget: int
+    dropped: int = 0
+    truncated: bool = False
+
+    def as_messages(self) -> list[dict[str, str]]:
+        """Role-tagged turns, oldest first, as the providers take them."""
+        return [{"role": m.role, "content": m.content} for m in self.messages]
+
+    def render(self) -> str:
+        """Flattened `User:/Assistant:` transcript ending with the assistant cue."""
+        return "\n".join([m.render() for m in self.messages] + [_SUFFIX])
+
+
+class ConversationContext:
+    """
+    Turns of one conversation in order, with cached token counts. The
+    message list is capped at `max_messages`; the token budget decides how
+    much of it each request actually carries.
+    """
+
+    def __init__(self, max_messages: Optional[int] = None):
+        self.max_messages = max_messages or settings.context_max_messages
+        self.messages: list[ContextMessage] = []
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def clear(self) -> None:
+        self.messages.clear()
+
+    def load(self, turns: Iterable[tuple[str, str]]) -> None:
+        """Replace the history with (role, content) pairs; empty and non-chat turns are skipped."""
+        self.messages = [
+            ContextMessage(role, content)
+            for role, content in turns
+            if role in ("user", "assistant") and content
+        ][-self.max_messages:]
+
+    def append(self, role: str, content: str) -> ContextMessage:
+        msg = ContextMessage(role, content)
+        self.messages.append(msg)
+        if len(self.messages) > self.max_messages:
+            del self.messages[:-self.max_messages]
+        return msg
+
+    def window(self, model: Optional[str] = None, provider: Optional[str] = None,
+               budget: Optional[int] = None) -> ContextWindow:
+        """
+        Newest-to-oldest fill: the latest message is always included (cut down
+        to the budget if it alone is too large); older turns are added while
+        they fit, stopping at the first that does not so history stays contiguous.
+        """
+        enc = get_encoder(model)
+        budget = budget or context_budget(model, provider)
+        used = enc.count(_SUFFIX)
+        picked: list[ContextMessage] = []
+        truncated = False
+
+        for i in range(len(self.messages) - 1, -1, -1):
+            msg = self.messages[i]
+            n = msg.tokens(enc)
+            if used + n > budget:
+                if picked:
+                    break
+                # Only the newest message: keep its head within the budget
+                # (re-checked, since tokens can merge across the role prefix)
+                room = budget - used - (n - enc.count(msg.content))
+                while True:
+                    cut = ContextMessage(msg.role, enc.truncate(msg.content, max(room, 0)))
+                    n = cut.tokens(enc)
+                    if used + n <= budget or room <= 0:
+                        break
+                    room -= used + n - budget
+                msg, truncated = cut, True
+            picked.append(msg)
+            used += n
+
+        picked.reverse()
+        return ContextWindow(
+            messages=picked,
+            tokens=used,
+            budget=budget,
+            dropped=len(self.messages) - len(picked),
+            truncated=truncated,
+        )
@@ -1,12 +1,13 @@
 from __future__ import annotations
 from datetime import datetime, timezone
-import time, logging, uuid
-from typing import Iterator, Optional
-from contextlib import contextmanager
+import asyncio, base64, time, logging, uuid
+from typing import AsyncIterator, Iterator, Optional
+from contextlib import asynccontextmanager, contextmanager
 from sqlalchemy import (
-    create_engine, Integer, String, Text, DateTime, text,
-    ForeignKey, UUID as SAUUID, CheckConstraint
+    create_engine, Integer, String, Text, DateTime, text, select, update, delete, func,
+    case, or_, and_, inspect, ForeignKey, UUID as SAUUID, CheckConstraint, Index
 )
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import (
     DeclarativeBase, Mapped, mapped_column, sessionmaker,
     Session, relationship
@@ -37,8 +38,18 @@ class Conversation(Base):
     title: Mapped[str | None] = mapped_column(String(200), nullable=True)
     default_provider: Mapped[str] = mapped_column(String(50))
     default_model: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    # Denormalized summary, maintained by the message write paths (see _summary_update)
+    message_count: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
+    last_message_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_message_preview: Mapped[str | None] = mapped_column(String(170), nullable=True)
     messages: Mapped[list["Message"]] = relationship(back_populates="conversation", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # history sidebar: newest conversations first (optionally per user), id breaks ties for keyset paging
+        Index("ix_conversations_updated_at", "updated_at", "id"),
+        Index("ix_conversations_user_updated", "user_id", "updated_at", "id"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -51,9 +62,16 @@ class Message(Base):
     model: Mapped[str | None] = mapped_column(String(100), nullable=True)
     prompt_tokens: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
     response_tokens: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
+    # provider prompt-cache usage: tokens read from / written to the cache
+    cached_tokens: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
+    cache_write_tokens: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
     latency_ms: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
     first_token_ms: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # complete | cancelled (stopped or client gone mid-stream; content is the partial text) | error
+    status: Mapped[str] = mapped_column(String(16), default="complete", server_default=text("'complete'"))
+    # JSON: how the answering provider/model was picked (router failover / hedging), when it was not the requested one
+    routing: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
@@ -63,6 +81,11 @@ class Message(Base):
     conversation: Mapped[Conversation] = relationship(back_populates="messages")
     ratings: Mapped[list["MessageRating"]] = relationship(back_populates="message", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # per-conversation count / last message / ordered detail
+        Index("ix_messages_conv_created", "conversation_id", "created_at", "id"),
+    )
+
 class MessageRating(Base):
     __tablename__ = "message_ratings"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -90,22 +113,18 @@ class MessageRating(Base):
 
 DB_URL = settings.db_url
 
-if DB_URL.startswith("sqlite://"):
-    engine = create_engine(
-        DB_URL,
-        future=True,
-        echo=getattr(settings, "db_echo", False),
-        pool_pre_ping=True,
-    )
-else:
-    engine = create_engine(
-        DB_URL,
-        future=True,
-        echo=getattr(settings, "db_echo", False),
-        pool_pre_ping=True,
-        pool_size=getattr(settings, "db_pool_size", 5),
-        pool_timeout=getattr(settings, "db_pool_timeout", 30),
-    )
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {"echo": settings.db_echo, "pool_pre_ping": True}
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    return kwargs
+
+engine = create_engine(DB_URL, future=True, **_engine_kwargs(DB_URL))
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
 
@@ -121,8 +140,33 @@ def init_db(retries: int = 10, delay: float = 2.0):
                 raise
             time.sleep(delay)
     Base.metadata.create_all(engine)
+    # create_all skips existing tables; add newer columns and indexes too
+    with engine.begin() as conn:
+        added = _add_missing_columns(conn)
+    if "message_count" in added.get("conversations", []):
+        logging.warning("Added conversation summary columns; run `neuralizard backfill-summaries` to populate them.")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     logging.info("DB initialized (conversations/messages).")
 
+def _add_missing_columns(conn) -> dict[str, list[str]]:
+    insp = inspect(conn)
+    added: dict[str, list[str]] = {}
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=conn.dialect)}"
+            if col.server_default is not None:
+                ddl += f" DEFAULT {col.server_default.arg.text}"
+            conn.execute(text(ddl))
+            added.setdefault(table.name, []).append(col.name)
+    return added
+
 @contextmanager
 def session() -> Iterator[Session]:
     s = SessionLocal()
@@ -131,6 +175,114 @@ def session() -> Iterator[Session]:
     finally:
         s.close()
 
+# ============================================================
+# Async engine / sessions
+# ============================================================
+
+def async_db_url(url: str) -> str:
+    """Map a sync DB URL onto its async driver (psycopg async / aiosqlite)."""
+    if url.startswith("sqlite+aiosqlite://") or url.startswith("postgresql+psycopg://") or "+asyncpg" in url:
+        return url
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+_async_engine: AsyncEngine | None = None
+_AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+
+def get_async_engine() -> AsyncEngine:
+    # Built lazily so the async driver is only imported when it is actually used
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        url = async_db_url(DB_URL)
+        _async_engine = create_async_engine(url, **_engine_kwargs(url))
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+@asynccontextmanager
+async def asession() -> AsyncIterator[AsyncSession]:
+    get_async_engine()
+    async with _AsyncSessionLocal() as s:
+        yield s
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+# ============================================================
+# Conversation summary maintenance
+# ============================================================
+
+PREVIEW_CHARS = 160
+
+def _preview(content: str | None) -> str | None:
+    if not content:
+        return None
+    return content[:PREVIEW_CHARS] + ("…" if len(content) > PREVIEW_CHARS else "")
+
+def _summary_update(msg: Message, added: bool):
+    """
+    UPDATE keeping Conversation.message_count / last_message_* / updated_at in
+    step with a message write. Run in the same transaction as the write.
+    """
+    now = datetime.now(timezone.utc)
+    stmt = update(Conversation).where(Conversation.id == msg.conversation_id)
+    values = {
+        "updated_at": now,
+        "last_message_at": msg.created_at or now,
+        "last_message_preview": _preview(msg.content),
+    }
+    if added:
+        values["message_count"] = Conversation.message_count + 1
+    else:
+        # Content edits only move the preview while this is still the newest message
+        stmt = stmt.where(or_(
+            Conversation.last_message_at.is_(None),
+            Conversation.last_message_at <= msg.created_at,
+        ))
+    return stmt.values(**values).execution_options(synchronize_session=False)
+
+def backfill_conversation_summaries() -> int:
+    """Recompute the summary columns for every conversation from its messages."""
+    count_sq = (
+        select(func.count(Message.id))
+        .where(Message.conversation_id == Conversation.id)
+        .scalar_subquery()
+    )
+    last_at_sq = (
+        select(func.max(Message.created_at))
+        .where(Message.conversation_id == Conversation.id)
+        .scalar_subquery()
+    )
+    last_content_sq = (
+        select(func.substr(Message.content, 1, PREVIEW_CHARS + 1, type_=Text))
+        .where(Message.conversation_id == Conversation.id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    preview = case(
+        (func.length(last_content_sq) > PREVIEW_CHARS, func.substr(last_content_sq, 1, PREVIEW_CHARS, type_=Text) + "…"),
+        (func.length(last_content_sq) == 0, None),
+        else_=last_content_sq,
+    )
+    stmt = update(Conversation).values(
+        message_count=count_sq,
+        last_message_at=last_at_sq,
+        last_message_preview=preview,
+        updated_at=case((last_at_sq > Conversation.updated_at, last_at_sq), else_=Conversation.updated_at),
+    ).execution_options(synchronize_session=False)
+    with session() as s:
+        result = s.execute(stmt)
+        s.commit()
+        return result.rowcount or 0
+
 def create_conversation(default_provider: str, default_model: Optional[str] = None,
                         user_id: Optional[str] = None, title: Optional[str] = None) -> Conversation:
     with session() as s:
@@ -164,6 +316,8 @@ def add_message(conversation_id: uuid.UUID, role: str, content: str,
             error=error
         )
         s.add(msg)
+        s.flush()
+        s.execute(_summary_update(msg, added=True))
         s.commit()
         s.refresh(msg)
         return msg
@@ -186,6 +340,7 @@ def update_message_content(message_id: int, content: str,
             msg.error = error
         if first_token_ms is not None:
             msg.first_token_ms = first_token_ms
+        s.execute(_summary_update(msg, added=False))
         s.commit()
 
 def add_message_rating(
@@ -209,4 +364,382 @@ def add_message_rating(
         s.add(r)
         s.commit()
         s.refresh(r)
-        return r
\ No newline at end of file
+        return r
+
+# ============================================================
+# Keyset cursors
+# ============================================================
+
+def encode_cursor(ts: datetime, key) -> str:
+    """Opaque page cursor for a (timestamp, id) sort key."""
+    raw = f"{ts.isoformat()}|{key}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, key = raw.split("|", 1)
+        return datetime.fromisoformat(ts), key
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def _before(ts_col, id_col, ts: datetime, key):
+    # Row-value "(ts, id) < (:ts, :id)" spelled out, so every backend can use the composite index
+    return or_(ts_col < ts, and_(ts_col == ts, id_col < key))
+
+# ============================================================
+# History queries
+# ============================================================
+
+def _history_stmt(limit: int, offset: int = 0, user_id: Optional[str] = None, before: Optional[str] = None):
+    """
+    Sidebar page straight off the conversations table: counts and previews are
+    the denormalized summary columns, ordered via ix_conversations_(user_)updated_at.
+    With a `before` cursor the page seeks past the previous one instead of using OFFSET.
+    """
+    stmt = select(Conversation)
+    if user_id is not None:
+        stmt = stmt.where(Conversation.user_id == user_id)
+    if before:
+        ts, key = decode_cursor(before)
+        stmt = stmt.where(_before(Conversation.updated_at, Conversation.id, ts, uuid.UUID(key)))
+        offset = 0
+    return stmt.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).offset(offset).limit(limit)
+
+def _messages_stmt(conversation_id: uuid.UUID, limit: Optional[int] = None, before: Optional[str] = None):
+    """Messages newest-first; callers reverse the page back to chronological order."""
+    stmt = select(Message).where(Message.conversation_id == conversation_id)
+    if before:
+        ts, key = decode_cursor(before)
+        stmt = stmt.where(_before(Message.created_at, Message.id, ts, int(key)))
+    stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc())
+    return stmt.limit(limit) if limit else stmt
+
+def history_cursor(items: list[dict], limit: int) -> Optional[str]:
+    """Cursor for the page after `items`, or None when this page was the last one."""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(datetime.fromisoformat(last["updated_at"]), last["id"])
+
+def messages_cursor(msgs: list[Message], limit: Optional[int]) -> Optional[str]:
+    """Cursor for the page of older messages before `msgs` (chronological), or None."""
+    if not limit or len(msgs) < limit:
+        return None
+    return encode_cursor(msgs[0].created_at, msgs[0].id)
+
+def _history_item(c: Conversation) -> dict:
+    return {
+        "id": str(c.id),
+        "title": c.title or "New chat",
+        "started_at": c.started_at.isoformat(),
+        "updated_at": c.updated_at.isoformat(),
+        "default_provider": c.default_provider,
+        "default_model": c.default_model,
+        "message_count": c.message_count or 0,
+        "last_message_preview": c.last_message_preview,
+    }
+
+def list_conversation_history(limit: int = 50, offset: int = 0, user_id: Optional[str] = None,
+                              before: Optional[str] = None) -> list[dict]:
+    with session() as s:
+        convs = s.execute(_history_stmt(limit, offset, user_id, before)).scalars().all()
+    return [_history_item(c) for c in convs]
+
+def list_conversation_messages(conversation_id: uuid.UUID, limit: Optional[int] = None,
+                               before: Optional[str] = None) -> list[Message]:
+    with session() as s:
+        msgs = list(s.execute(_messages_stmt(conversation_id, limit, before)).scalars().all())
+    msgs.reverse()
+    return msgs
+
+def recent_first_token_samples(limit: int = 5000) -> list[tuple[str, Optional[str], int]]:
+    """(provider, model, first_token_ms) of recent completed answers, oldest first."""
+    stmt = (
+        select(Message.provider, Message.model, Message.first_token_ms)
+        .where(Message.role == "assistant", Message.status == "complete", Message.first_token_ms > 0)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(limit)
+    )
+    with session() as s:
+        rows = s.execute(stmt).all()
+    return [(p, m, ms) for p, m, ms in reversed(rows) if p]
+
+# ============================================================
+# Async CRUD (awaitable from FastAPI handlers)
+# ============================================================
+
+async def acreate_conversation(default_provider: str, default_model: Optional[str] = None,
+                               user_id: Optional[str] = None, title: Optional[str] = None) -> Conversation:
+    async with asession() as s:
+        conv = Conversation(
+            default_provider=default_provider,
+            default_model=default_model,
+            user_id=user_id,
+            title=title
+        )
+        s.add(conv)
+        await s.commit()
+        await s.refresh(conv)
+        return conv
+
+async def aadd_message(conversation_id: uuid.UUID, role: str, content: str,
+                       provider: Optional[str], model: Optional[str],
+                       latency_ms: int = 0, first_token_ms: int = 0,
+                       prompt_tokens: int = 0, response_tokens: int = 0,
+                       error: Optional[str] = None) -> Message:
+    async with asession() as s:
+        msg = Message(
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            provider=provider,
+            model=model,
+            latency_ms=latency_ms,
+            first_token_ms=first_token_ms,
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+            error=error
+        )
+        s.add(msg)
+        await s.flush()
+        await s.execute(_summary_update(msg, added=True))
+        await s.commit()
+        await s.refresh(msg)
+        return msg
+
+async def aupdate_message_content(message_id: int, content: str,
+                                  latency_ms: int | None = None,
+                                  response_tokens: int | None = None,
+                                  error: str | None = None,
+                                  first_token_ms: int | None = None):
+    async with asession() as s:
+        msg = await s.get(Message, message_id)
+        if not msg:
+            return
+        msg.content = content
+        if latency_ms is not None:
+            msg.latency_ms = latency_ms
+        if response_tokens is not None:
+            msg.response_tokens = response_tokens
+        if error is not None:
+            msg.error = error
+        if first_token_ms is not None:
+            msg.first_token_ms = first_token_ms
+        await s.execute(_summary_update(msg, added=False))
+        await s.commit()
+
+async def aadd_message_rating(
+    message_id: int,
+    *,
+    user_id: Optional[str] = None,
+    vote: int = 0,
+    score: Optional[int] = None,
+    label: Optional[str] = None,
+    comment: Optional[str] = None,
+) -> MessageRating:
+    async with asession() as s:
+        r = MessageRating(
+            message_id=message_id,
+            user_id=user_id,
+            vote=vote,
+            score=score,
+            label=label,
+            comment=comment,
+        )
+        s.add(r)
+        await s.commit()
+        await s.refresh(r)
+        return r
+
+async def alist_conversation_history(limit: int = 50, offset: int = 0, user_id: Optional[str] = None,
+                                     before: Optional[str] = None) -> list[dict]:
+    """Sidebar page: conversations by recency with message count and last-message preview."""
+    async with asession() as s:
+        convs = (await s.execute(_history_stmt(limit, offset, user_id, before))).scalars().all()
+    return [_history_item(c) for c in convs]
+
+async def alist_conversation_messages(conversation_id: uuid.UUID, limit: Optional[int] = None,
+                                      before: Optional[str] = None) -> list[Message]:
+    """The newest `limit` messages older than `before` (all when limit is None), in chronological order."""
+    async with asession() as s:
+        msgs = list((await s.execute(_messages_stmt(conversation_id, limit, before))).scalars().all())
+    msgs.reverse()
+    return msgs
+
+async def adelete_conversation(conversation_id: uuid.UUID) -> None:
+    async with asession() as s:
+        # Delete messages first (if no DB cascade)
+        await s.execute(delete(Message).where(Message.conversation_id == conversation_id))
+        await s.execute(delete(Conversation).where(Conversation.id == conversation_id))
+        await s.commit()
+
+async def arename_conversation(conversation_id: uuid.UUID, title: str) -> bool:
+    async with asession() as s:
+        conv = await s.get(Conversation, conversation_id)
+        if not conv:
+            return False
+        conv.title = title
+        await s.commit()
+        return True
+
+async def aconversation_needs_title(conversation_id: uuid.UUID) -> bool:
+    async with asession() as s:
+        conv = await s.get(Conversation, conversation_id)
+        return bool(conv) and not conv.title
+
+async def aset_title_if_missing(conversation_id: uuid.UUID, title: str) -> None:
+    async with asession() as s:
+        conv = await s.get(Conversation, conversation_id)
+        if conv and not conv.title:
+            conv.title = title
+            await s.commit()
+
+# ============================================================
+# Write-behind message persistence
+# ============================================================
+
+class MessageRef:
+    """Handle for a queued message INSERT; `id` is set once the batch commits."""
+    __slots__ = ("id", "_future")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.id: int | None = None
+        self._future: asyncio.Future = loop.create_future()
+
+    async def wait(self) -> int:
+        return await asyncio.shield(self._future)
+
+
+_STOP = object()
+
+
+class MessageWriter:
+    """
+    Async write-behind queue for chat messages.
+    add_message()/update_message() return as soon as the operation is queued;
+    a background task groups queued operations into one transaction per batch
+    (flushed on batch size or interval) and runs it on a worker thread.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+        self.batches = 0
+        self.failures = 0
+
+    async def add_message(self, **fields) -> MessageRef:
+        ref = MessageRef(self._loop)
+        await self._queue.put(("insert", ref, fields))
+        return ref
+
+    async def update_message(self, target: MessageRef | int, **fields) -> None:
+        fields = {k: v for k, v in fields.items() if v is not None}
+        await self._queue.put(("update", target, fields))
+
+    async def stop(self) -> None:
+        """Drain everything queued so far, then stop the worker."""
+        await self._queue.put(_STOP)
+        await self._task
+
+    async def _run(self) -> None:
+        while True:
+            op = await self._queue.get()
+            if op is _STOP:
+                return
+            batch = [op]
+            if self._queue.qsize() < self.batch_size:
+                # Give concurrent writers a moment to join this transaction
+                await asyncio.sleep(self.flush_interval)
+            stopping = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                op = self._queue.get_nowait()
+                if op is _STOP:
+                    stopping = True
+                    break
+                batch.append(op)
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: list) -> None:
+        self.batches += 1
+        try:
+            self._resolve(await asyncio.to_thread(_apply_message_ops, batch))
+            return
+        except Exception as e:
+            logging.warning(f"Message batch of {len(batch)} failed, retrying one by one: {e}")
+        for op in batch:
+            try:
+                self._resolve(await asyncio.to_thread(_apply_message_ops, [op]))
+            except Exception as op_err:
+                self.failures += 1
+                logging.exception(f"Dropping message write {op[0]}: {op_err}")
+                ref = op[1]
+                if op[0] == "insert" and not ref._future.done():
+                    ref._future.set_exception(op_err)
+
+    @staticmethod
+    def _resolve(results: list[tuple[MessageRef, int]]) -> None:
+        for ref, msg_id in results:
+            ref.id = msg_id
+            if not ref._future.done():
+                ref._future.set_result(msg_id)
+
+
+def _apply_message_ops(ops: list) -> list[tuple[MessageRef, int]]:
+    """Apply queued inserts/updates in one transaction; return (ref, id) for inserts."""
+    inserted: list[tuple[MessageRef, int]] = []
+    pending_ids: dict[int, int] = {}
+    with session() as s:
+        for kind, target, fields in ops:
+            if kind == "insert":
+                msg = Message(**fields)
+                s.add(msg)
+                s.flush()
+                s.execute(_summary_update(msg, added=True))
+                pending_ids[id(target)] = msg.id
+                inserted.append((target, msg.id))
+                continue
+            if isinstance(target, MessageRef):
+                msg_id = target.id or pending_ids.get(id(target))
+            else:
+                msg_id = target
+            if msg_id is None:
+                continue
+            msg = s.get(Message, msg_id)
+            if not msg:
+                continue
+            for key, value in fields.items():
+                setattr(msg, key, value)
+            if "content" in fields:
+                s.execute(_summary_update(msg, added=False))
+        s.commit()
+    return inserted
+
+
+_WRITER: MessageWriter | None = None
+
+
+def get_message_writer() -> MessageWriter:
+    """Return the write-behind queue bound to the running event loop (started lazily)."""
+    global _WRITER
+    loop = asyncio.get_running_loop()
+    if _WRITER is None or _WRITER._loop is not loop:
+        _WRITER = MessageWriter(
+            batch_size=settings.db_write_batch_size,
+            flush_interval=settings.db_write_flush_ms / 1000.0,
+            max_pending=settings.db_write_max_pending,
+        )
+    return _WRITER
+
+
+async def stop_message_writer() -> None:
+    global _WRITER
+    if _WRITER is not None:
+        writer, _WRITER = _WRITER, None
+        await writer.stop()
@@ -1,3 +1,5 @@
+import os
+from urllib.parse import urlsplit
 from .openai_provider import OpenAIProvider
 from .anthropic_provider import AnthropicProvider
 from .google_provider import GoogleProvider
@@ -6,11 +8,19 @@ from .cohere_provider import CohereProvider
 from .xai_provider import XAIProvider
 from .deepseek_provider import DeepSeekProvider
 from .perplexity_provider import PerplexityProvider
+from .openai_compat import OpenAICompatProvider
 from ..config import settings
-from .base import Provider
-import os
-import time
-from typing import Dict, List, Tuple
+from .base import Provider, AsyncProvider
+from .base_streaming import astream, acomplete
+from .offload import get_offloader, shutdown_offloader
+from .model_catalog import ModelCatalog
+from .hedging import FirstTokenTracker, HedgePolicy, HedgeStats, hedged_astream
+from .router import ProviderRouter, parse_candidates
+from .governor import PROVIDER_HOSTS, RateGovernor, RateLimitExceeded, get_governor, set_governor
+from .retry import RetryPolicy, aretry_call, get_retry_stats, retry_call
+from .registry import ProviderRegistry
+from .transport import HTTPPool, get_http_pool, set_http_pool
+from .response_cache import ResponseCache, acomplete_cached, get_response_cache, set_response_cache
 
 _DEFAULT_MODELS: dict[str, list[str]] = {
     "openai": ["gpt-4o", "gpt-4o-mini", "gpt-4.1-mini"],
@@ -23,28 +33,89 @@ _DEFAULT_MODELS: dict[str, list[str]] = {
     "perplexity": ["sonar-pro", "sonar-medium-online", "sonar-small-online"],
 }
 
-# cache: name -> (timestamp, models)
-_MODEL_CACHE: Dict[str, Tuple[float, List[str]]] = {}
+# name -> (provider class, Settings attribute holding its API key)
+_PROVIDER_CLASSES: dict[str, tuple[type, str]] = {
+    "openai": (OpenAIProvider, "openai_api_key"),
+    "anthropic": (AnthropicProvider, "anthropic_api_key"),
+    "google": (GoogleProvider, "google_api_key"),
+    "mistral": (MistralProvider, "mistral_api_key"),
+    "cohere": (CohereProvider, "cohere_api_key"),
+    "xai": (XAIProvider, "xai_api_key"),
+    "deepseek": (DeepSeekProvider, "deepseek_api_key"),
+    "perplexity": (PerplexityProvider, "perplexity_api_key"),
+}
+
+# name -> OpenAICompatProvider fields for endpoints that only exist in configuration
+_COMPAT_ENDPOINTS: dict[str, dict] = {k.lower(): v for k, v in settings.openai_compatible.items()}
+for _name, _config in _COMPAT_ENDPOINTS.items():
+    # lets the rate governor attribute x-ratelimit-* headers from the endpoint
+    PROVIDER_HOSTS.setdefault(urlsplit(str(_config.get("base_url", ""))).hostname or "", _name)
+
+_REGISTRY = ProviderRegistry()
+
+def get_provider(name: str, *, semantic_cache: bool | None = None, **options) -> Provider:
+    """
+    Return the shared provider instance for (name, api key, options).
+    Instances are long-lived and keep their HTTP connection pools open
+    until close_providers() is called.
 
-def get_provider(name: str) -> Provider:
+    With the semantic cache on (settings.semantic_cache_enabled, or
+    `semantic_cache=True`) the instance comes wrapped so near-duplicate
+    single-question prompts are answered from the cache.
+    """
     n = (name or "openai").lower()
-    if n == "openai":
-        return OpenAIProvider(api_key=settings.openai_api_key)
-    if n == "anthropic":
-        return AnthropicProvider(api_key=settings.anthropic_api_key)
-    if n == "google":
-        return GoogleProvider(api_key=settings.google_api_key)
-    if n == "mistral":
-        return MistralProvider(api_key=settings.mistral_api_key)
-    if n == "cohere":
-        return CohereProvider(api_key=settings.cohere_api_key)
-    if n == "xai":
-        return XAIProvider(api_key=settings.xai_api_key)
-    if n == "deepseek":
-        return DeepSeekProvider(api_key=settings.deepseek_api_key)
-    if n == "perplexity":
-        return PerplexityProvider(api_key=settings.perplexity_api_key)
-    raise ValueError(f"Unknown provider: {name}")
+    entry = _PROVIDER_CLASSES.get(n)
+    if entry is not None:
+        cls, key_attr = entry
+        api_key = getattr(settings, key_attr)
+        prov = _REGISTRY.get(n, api_key, lambda: cls(api_key=api_key, **options), **options)
+    elif n in _COMPAT_ENDPOINTS:
+        config = dict(_COMPAT_ENDPOINTS[n])
+        api_key = config.pop("api_key", None)
+        config.setdefault("api_key_required", False)  # local servers usually take none
+        prov = _REGISTRY.get(
+            n, api_key, lambda: OpenAICompatProvider(api_key=api_key, name=n, **config, **options), **options,
+        )
+    else:
+        raise ValueError(f"Unknown provider: {name}")
+    if settings.semantic_cache_enabled if semantic_cache is None else semantic_cache:
+        # imported lazily: numpy is only needed when the cache is switched on
+        from .semantic_cache import SemanticCachedProvider, get_semantic_cache
+        return SemanticCachedProvider(prov, get_semantic_cache())
+    return prov
+
+def close_providers() -> None:
+    """Close all pooled provider clients and the shared HTTP connections."""
+    _REGISTRY.close()
+    get_http_pool().close()
+
+async def aclose_providers() -> None:
+    """Async variant of close_providers() (called from the API lifespan hook)."""
+    await _REGISTRY.aclose()
+    await get_http_pool().aclose()
+
+def get_provider_pool_stats() -> dict[str, int]:
+    return _REGISTRY.stats()
+
+def get_http_stats() -> dict:
+    """Requests, new connections and the connection reuse ratio of the shared HTTP pool, per host."""
+    return get_http_pool().stats()
+
+def get_response_cache_stats() -> dict:
+    return get_response_cache().stats()
+
+def get_semantic_cache_stats() -> dict | None:
+    """Semantic cache stats, or None when the cache is switched off."""
+    if not settings.semantic_cache_enabled:
+        return None
+    from .semantic_cache import get_semantic_cache
+    return get_semantic_cache().stats()
+
+def save_semantic_cache() -> None:
+    """Flush a memory-mapped semantic index to disk (called from the API lifespan hook)."""
+    if settings.semantic_cache_enabled:
+        from .semantic_cache import save_semantic_cache as _save
+        _save()
 
 def get_available_providers() -> list[str]:
     mapping = {
@@ -57,23 +128,83 @@ def get_available_providers() -> list[str]:
         "deepseek": settings.deepseek_api_key,
         "perplexity": settings.perplexity_api_key,
     }
-    return [name for name, key in mapping.items() if key and str(key).strip()]
+    available = [name for name, key in mapping.items() if key and str(key).strip()]
+    # configured OpenAI-compatible endpoints are available without a key unless they require one
+    available += [
+        name for name, config in _COMPAT_ENDPOINTS.items()
+        if not config.get("api_key_required", False)
+        or config.get("api_key") or os.getenv(config.get("api_key_env") or "")
+    ]
+    return available
+
+def _list_models(name: str) -> list[str]:
+    prov = get_provider(name, semantic_cache=False)
+    if hasattr(prov, "list_models"):
+        return list(prov.list_models() or [])
+    return list(_DEFAULT_MODELS.get(name, []))
+
+_MODEL_CATALOG = ModelCatalog(
+    _list_models,
+    ttl=settings.model_catalog_ttl,
+    error_ttl=settings.model_catalog_error_ttl,
+    path=settings.model_catalog_path,
+    fallback=_DEFAULT_MODELS,
+)
+
+def get_model_catalog() -> ModelCatalog:
+    return _MODEL_CATALOG
+
+_FIRST_TOKENS = FirstTokenTracker(window=settings.hedge_sample_window)
+_HEDGE_STATS = HedgeStats()
+
+def get_first_token_tracker() -> FirstTokenTracker:
+    return _FIRST_TOKENS
+
+def get_hedge_stats() -> dict:
+    return _HEDGE_STATS.stats()
+
+def get_hedge_policy(route: str) -> HedgePolicy | None:
+    """The hedge policy configured for `route` in settings.hedge_policies, if any."""
+    raw = settings.hedge_policies.get(route)
+    return HedgePolicy.from_dict(raw) if raw else None
+
+def astream_route(route: str, prov, prompt, *, provider: str, model: str | None = None,
+                  outcome: dict | None = None, **kwargs):
+    """
+    astream() under the hedge policy of `route`. Without a policy (or when
+    the backup is the primary itself) this is plain astream() and `outcome`
+    stays empty; otherwise `outcome` names the provider/model that answered.
+    """
+    policy = get_hedge_policy(route)
+    if policy is None or (policy.backup_provider.lower(), policy.backup_model or model) == (provider.lower(), model):
+        return astream(prov, prompt, model=model, **kwargs)
+    return hedged_astream(
+        prov, get_provider(policy.backup_provider), prompt,
+        route=route, policy=policy, primary_name=provider, model=model,
+        tracker=_FIRST_TOKENS, stats=_HEDGE_STATS, outcome=outcome, **kwargs,
+    )
+
+_ROUTER = ProviderRouter(
+    get_provider,
+    aliases=settings.router_aliases,
+    failure_threshold=settings.router_failure_threshold,
+    cooldown=settings.router_cooldown,
+    window=settings.router_window,
+)
+
+def get_router() -> ProviderRouter:
+    return _ROUTER
+
+def get_rate_limit_stats() -> dict | None:
+    """Admission counters and queue wait per provider, or None when the governor is off."""
+    governor = get_governor()
+    return governor.stats() if governor is not None else None
 
-def get_provider_models(name: str, use_cache: bool = True, ttl: float = 600.0) -> list[str]:
+def get_provider_models(name: str, use_cache: bool = True) -> list[str]:
     """
-    Return models for a provider by calling its list_models() if available.
-    Falls back to a small default list and caches results for ttl seconds.
+    Return models for a provider from the shared catalog, calling its
+    list_models() when the cached list is missing or older than
+    settings.model_catalog_ttl. Falls back to a small default list.
+    Blocking; async callers should use `await get_model_catalog().aget(name)`.
     """
-    key = (name or "").lower()
-
-    try:
-        prov = get_provider(key)
-        if hasattr(prov, "list_models"):
-            models = list(prov.list_models() or [])
-            return models
-        else:
-            models = _DEFAULT_MODELS.get(key, [])
-            return models
-    except Exception:
-        models = _DEFAULT_MODELS.get(key, [])
-        return models
+    return _MODEL_CATALOG.get((name or "").lower(), use_cache=use_cache)
@@ -0,0 +1,38 @@
+import asyncio
+import httpx
+from .transport import get_http_pool
+
+
+def _observe(response) -> None:
+    # feed x-ratelimit-* headers to the rate governor; never let bookkeeping break a request
+    from .governor import get_governor
+    governor = get_governor()
+    if governor is None:
+        return
+    try:
+        governor.observe_response(response.request.url, response.request.headers, response.headers, response.status_code)
+    except Exception:
+        pass
+
+
+async def _aobserve(response) -> None:
+    from .governor import get_governor, parse_rate_headers
+    # most responses carry no rate-limit headers: nothing to record, no thread hop
+    if get_governor() is None or not parse_rate_headers(response.headers, response.status_code):
+        return
+    # the governor's store may be SQLite (BEGIN IMMEDIATE); keep that write off the event loop
+    await asyncio.to_thread(_observe, response)
+
+
+def httpx_client(**kwargs) -> httpx.Client:
+    """
+    httpx client on the shared connection pool (see transport.py); also
+    accepted as `http_client=` by the OpenAI/Anthropic SDKs. Closing it
+    leaves the pool open for the other clients.
+    """
+    return get_http_pool().client(event_hooks={"response": [_observe]}, **kwargs)
+
+
+def httpx_async_client(**kwargs) -> httpx.AsyncClient:
+    """Async twin of httpx_client(), for AsyncOpenAI/AsyncAnthropic and raw async calls."""
+    return get_http_pool().async_client(event_hooks={"response": [_aobserve]}, **kwargs)
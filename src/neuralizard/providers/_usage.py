@@ -1,4 +1,5 @@
 from typing import Any
+from .base import Usage
 
 def usage_get(usage: Any, key: str, default: int = 0) -> int:
     # Works for dicts and typed SDK objects
@@ -6,4 +7,36 @@ def usage_get(usage: Any, key: str, default: int = 0) -> int:
         return default
     if isinstance(usage, dict):
         return usage.get(key, default)
-    return getattr(usage, key, default)
\ No newline at end of file
+    return getattr(usage, key, default)
+
+def parse_usage(usage: Any) -> Usage:
+    """
+    Normalize provider usage, including prompt-cache counters:
+    - OpenAI: prompt_tokens_details.cached_tokens
+    - DeepSeek: prompt_cache_hit_tokens
+    - Anthropic: cache_read_input_tokens / cache_creation_input_tokens, which
+      are not part of input_tokens, so they are added back into prompt_tokens
+    """
+    details = usage_get(usage, "prompt_tokens_details", None)
+    cache_read = usage_get(usage, "cache_read_input_tokens", 0) or 0
+    cache_write = usage_get(usage, "cache_creation_input_tokens", 0) or 0
+    prompt = usage_get(usage, "prompt_tokens", 0) or 0
+    if not prompt:
+        prompt = (usage_get(usage, "input_tokens", 0) or 0) + cache_read + cache_write
+    cached = (
+        cache_read
+        or usage_get(details, "cached_tokens", 0)
+        or usage_get(usage, "prompt_cache_hit_tokens", 0)
+        or 0
+    )
+    return Usage(
+        prompt_tokens=prompt,
+        response_tokens=(
+            usage_get(usage, "completion_tokens", 0)
+            or usage_get(usage, "output_tokens", 0)
+            or usage_get(usage, "response_tokens", 0)
+            or 0
+        ),
+        cached_tokens=cached,
+        cache_write_tokens=cache_write,
+    )
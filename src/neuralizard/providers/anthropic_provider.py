@@ -2,15 +2,18 @@ import os
 import time
 import anthropic
 from typing import Any
-from .base import LLMResult
-from .base_streaming import StreamingProviderMixin
-from ._usage import usage_get
+from .base import LLMResult, Prompt, StreamError, Usage, to_messages, split_system
+from ..config import settings
+from .base_streaming import StreamingProviderMixin, AsyncStreamingProviderMixin
+from ._usage import parse_usage
+from ._http import httpx_client, httpx_async_client
 
 
-class AnthropicProvider(StreamingProviderMixin):
+class AnthropicProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
     """
     Provider wrapper for Anthropic Claude models (Claude 3, 3.5, etc.)
-    Supports both single responses and streaming token-by-token output.
+    Supports both single responses and streaming token-by-token output,
+    sync and async.
     """
 
     name = "anthropic"
@@ -19,15 +22,82 @@ class AnthropicProvider(StreamingProviderMixin):
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise RuntimeError("ANTHROPIC_API_KEY missing. Add it to ~/.neuralizard/.env")
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # retries are handled by neuralizard.providers.retry for every provider
+        self.client = anthropic.Anthropic(api_key=self.api_key, http_client=httpx_client(), max_retries=0)
+        self.aclient = anthropic.AsyncAnthropic(api_key=self.api_key, http_client=httpx_async_client(), max_retries=0)
         self.default_model = "claude-sonnet-4-20250514"
 
+    @staticmethod
+    def _message_args(prompt: Prompt, system: str | None) -> dict:
+        """
+        Messages API arguments: system turns go to the top-level `system`
+        field, and the conversation must open with a user turn.
+        """
+        system_text, messages = split_system(to_messages(prompt, system))
+        while messages and messages[0]["role"] != "user":
+            messages.pop(0)
+        args: dict[str, Any] = {"messages": messages}
+        if system_text:
+            args["system"] = system_text
+        if settings.anthropic_prompt_cache:
+            AnthropicProvider._add_cache_breakpoints(args)
+        return args
+
+    @staticmethod
+    def _add_cache_breakpoints(args: dict) -> None:
+        """
+        Mark the stable prefix for prompt caching (at most 3 of the 4 allowed
+        breakpoints): the system prompt, the previous user turn — where last
+        turn's cache entry ends, so it is read back — and the latest turn, which
+        writes the entry the next turn reads. Prefixes under the model's minimum
+        cacheable length are simply not cached.
+        """
+        def cached(text: str) -> list[dict]:
+            return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+        if isinstance(args.get("system"), str):
+            args["system"] = cached(args["system"])
+        messages = args["messages"]
+        user_turns = [i for i, m in enumerate(messages) if m["role"] == "user"]
+        marks = set(user_turns[-2:-1]) | ({len(messages) - 1} if messages else set())
+        for i in marks:
+            if isinstance(messages[i]["content"], str) and messages[i]["content"]:
+                messages[i] = {"role": messages[i]["role"], "content": cached(messages[i]["content"])}
+
     # ============================================================
     # 🔹 Single complete
     # ============================================================
 
-    def complete(self, prompt: str, model: str | None = None, temperature: float | None = None, **kwargs):
-        """Send a single prompt to the Claude API."""
+    def _to_result(self, resp, chosen_model: str, t0: float) -> LLMResult:
+        usage = parse_usage(getattr(resp, "usage", None))
+        # Claude typically returns content list with text
+        text = ""
+        try:
+            content = getattr(resp, "content", None) or []
+            if content and hasattr(content[0], "text"):
+                text = content[0].text
+        except Exception:
+            text = getattr(resp, "text", "") or ""
+
+        return LLMResult(
+            text=(text or "").strip(),
+            provider=self.name,
+            model=chosen_model,
+            prompt_tokens=usage.prompt_tokens,
+            response_tokens=usage.response_tokens,
+            latency_ms=int((time.time() - t0) * 1000),
+            cached_tokens=usage.cached_tokens,
+            cache_write_tokens=usage.cache_write_tokens,
+        )
+
+    @staticmethod
+    def _final_usage(final) -> Usage | None:
+        usage = getattr(final, "usage", None)
+        return parse_usage(usage) if usage else None
+
+    def complete(self, prompt: Prompt, model: str | None = None, temperature: float | None = None,
+                 system: str | None = None, **kwargs):
+        """Send a prompt or conversation to the Claude API."""
         chosen_model = model or self.default_model
         t0 = time.time()
 
@@ -39,72 +109,122 @@ class AnthropicProvider(StreamingProviderMixin):
                 model=chosen_model,
                 max_tokens=max_tokens,
                 temperature=temp,
-                messages=[{"role": "user", "content": prompt}],
+                **self._message_args(prompt, system),
             )
         except Exception as e:
             raise RuntimeError(f"Anthropic API error: {e}")
 
-        usage = getattr(resp, "usage", None)
-        # Claude typically returns content list with text
-        text = ""
+        return self._to_result(resp, chosen_model, t0)
+
+    async def acomplete(self, prompt: Prompt, model: str | None = None, temperature: float | None = None,
+                        system: str | None = None, **kwargs):
+        """Async completion via AsyncAnthropic."""
+        chosen_model = model or self.default_model
+        t0 = time.time()
+
+        max_tokens = kwargs.get("max_tokens", 1024)
+        temp = temperature if temperature is not None else kwargs.get("temperature", 0.7)
+
         try:
-            content = getattr(resp, "content", None) or []
-            if content and hasattr(content[0], "text"):
-                text = content[0].text
-        except Exception:
-            text = getattr(resp, "text", "") or ""
+            resp = await self.aclient.messages.create(
+                model=chosen_model,
+                max_tokens=max_tokens,
+                temperature=temp,
+                **self._message_args(prompt, system),
+            )
+        except Exception as e:
+            raise RuntimeError(f"Anthropic API error: {e}")
 
-        return LLMResult(
-            text=(text or "").strip(),
-            provider=self.name,
-            model=chosen_model,
-            prompt_tokens=usage_get(usage, "input_tokens", usage_get(usage, "prompt_tokens", 0)),
-            response_tokens=usage_get(usage, "output_tokens", usage_get(usage, "completion_tokens", 0)),
-            latency_ms=int((time.time() - t0) * 1000),
-        )
+        return self._to_result(resp, chosen_model, t0)
 
     # ============================================================
     # 🔹 Streaming complete
     # ============================================================
 
-    def _stream_request(self, prompt: str, model: str | None = None, **kwargs):
+    @staticmethod
+    def _event_text(event, debug: bool = False) -> tuple[str | None, bool]:
+        """Map one stream event to (text to yield, stop)."""
+        et = getattr(event, "type", None)
+        if et == "content_block_delta":
+            # event.delta is a TextDelta object (not a dict)
+            delta_obj = getattr(event, "delta", None)
+            return getattr(delta_obj, "text", "") or None, False
+        if et in ("message_start", "content_block_start", "message_delta", "content_block_stop"):
+            return (f"[DEBUG {et}]" if debug else None), False
+        if et == "message_stop":
+            return None, True
+        if et == "error":
+            err = getattr(event, "error", None)
+            return StreamError(f"[ERROR: {err}]"), True
+        return None, False
+
+    def _stream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
         """
         Stream Claude responses token-by-token.
         """
         chosen_model = model or self.default_model
         debug = kwargs.get("debug", False)
 
-        try:
-            with self.client.messages.stream(
-                model=chosen_model,
-                max_tokens=kwargs.get("max_tokens", 1024),
-                temperature=kwargs.get("temperature", 0.7),
-                messages=[{"role": "user", "content": prompt}],
-            ) as stream:
-                for event in stream:
-                    et = getattr(event, "type", None)
-                    if et == "content_block_delta":
-                        # event.delta is a TextDelta object (not a dict)
-                        delta_obj = getattr(event, "delta", None)
-                        text = getattr(delta_obj, "text", "")
-                        if text:
-                            yield text
-                    elif et in ("message_start", "content_block_start", "message_delta", "content_block_stop"):
-                        if debug:
-                            yield f"[DEBUG {et}]"
-                        continue
-                    elif et == "message_stop":
-                        break
-                    elif et == "error":
-                        err = getattr(event, "error", None)
-                        yield f"[ERROR: {err}]"
-                        break
-        except Exception as e:
-            yield f"[Stream error: {e}]"
+        with self.client.messages.stream(
+            model=chosen_model,
+            max_tokens=kwargs.get("max_tokens", 1024),
+            temperature=kwargs.get("temperature", 0.7),
+            **self._message_args(prompt, system),
+        ) as stream:
+            for event in stream:
+                text, stop = self._event_text(event, debug)
+                if text:
+                    yield text
+                if stop:
+                    break
+            try:
+                usage = self._final_usage(stream.get_final_message())
+            except Exception:
+                usage = None
+        if usage:
+            yield usage
+
+    async def _astream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
+        """
+        Async token stream via AsyncAnthropic.
+        """
+        chosen_model = model or self.default_model
+        debug = kwargs.get("debug", False)
+
+        async with self.aclient.messages.stream(
+            model=chosen_model,
+            max_tokens=kwargs.get("max_tokens", 1024),
+            temperature=kwargs.get("temperature", 0.7),
+            **self._message_args(prompt, system),
+        ) as stream:
+            async for event in stream:
+                text, stop = self._event_text(event, debug)
+                if text:
+                    yield text
+                if stop:
+                    break
+            try:
+                usage = self._final_usage(await stream.get_final_message())
+            except Exception:
+                usage = None
+        if usage:
+            yield usage
 
     def list_models(self) -> list[str]:
         try:
             resp = self.client.models.list()
             return [m.id for m in getattr(resp, "data", [])]
         except Exception as e:
-            raise RuntimeError(f"Anthropic list models error: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Anthropic list models error: {e}")
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+    async def aclose(self):
+        try:
+            await self.aclient.close()
+        except Exception:
+            pass
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Protocol
+from typing import AsyncIterator, Protocol, Sequence, Union
 
 @dataclass
 class LLMResult:
@@ -9,7 +9,73 @@ class LLMResult:
     prompt_tokens: int = 0
     response_tokens: int = 0
     latency_ms: int = 0
+    # prompt tokens served from / written to the provider's prompt cache
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+
+@dataclass
+class Usage:
+    """
+    Token usage reported at the end of a stream. Streaming providers yield one
+    of these after the text; consumers that only want text skip non-str items.
+    """
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    # why generation stopped ("stop", "length", ...), when the provider says
+    finish_reason: str | None = None
+
+@dataclass
+class ChatDelta:
+    """
+    One parsed chat-completions stream frame. `_stream_request()` may yield
+    these instead of raw SSE; the streaming mixin turns them into tokens and
+    a final Usage without parsing anything again.
+    """
+    content: str = ""
+    finish_reason: str | None = None
+    usage: Usage | None = None
+
+class StreamError(str):
+    """
+    Error text a stream yields instead of raising once its answer has started
+    ("[stream error: ...]"). It is still a str, so it shows up in the answer
+    like any token, but consumers tell it from real text by type, never by
+    content: an answer may well begin with "[Error".
+    """
+    __slots__ = ()
+
+# One role-tagged turn: {"role": "system" | "user" | "assistant", "content": str}
+ChatMessage = dict[str, str]
+# Providers accept either a single user prompt or a list of turns (oldest first)
+Prompt = Union[str, Sequence[ChatMessage]]
+
+def to_messages(prompt: Prompt, system: str | None = None) -> list[ChatMessage]:
+    """
+    Normalize a prompt to role-tagged messages. A string becomes one user turn;
+    `system`, when given, is put in front as a system turn.
+    """
+    if isinstance(prompt, str):
+        messages = [{"role": "user", "content": prompt}]
+    else:
+        messages = [{"role": m["role"], "content": m["content"]} for m in prompt]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    return messages
+
+def split_system(messages: list[ChatMessage]) -> tuple[str | None, list[ChatMessage]]:
+    """Pull system turns out for APIs that take the system prompt as a separate field."""
+    system = [m["content"] for m in messages if m["role"] == "system"]
+    rest = [m for m in messages if m["role"] != "system"]
+    return ("\n\n".join(system) if system else None), rest
 
 class Provider(Protocol):
     name: str
-    def complete(self, prompt: str, model: str | None = None) -> LLMResult: ...
+    def complete(self, prompt: Prompt, model: str | None = None, *, system: str | None = None) -> LLMResult: ...
+
+class AsyncProvider(Protocol):
+    """Native asyncio interface, built on the providers' async SDK / httpx clients."""
+    name: str
+    async def acomplete(self, prompt: Prompt, model: str | None = None, *, system: str | None = None) -> LLMResult: ...
+    def astream(self, prompt: Prompt, model: str | None = None, *, system: str | None = None) -> AsyncIterator[str]: ...
@@ -1,56 +1,231 @@
-import json
-import re
+import asyncio
+from contextlib import aclosing, closing
+from .base import ChatDelta, Prompt, StreamError, Usage
+from ._usage import parse_usage
+from .governor import get_governor
+from .offload import get_offloader
+from .retry import aretry_call, aretry_stream, retry_stream
+from .sse import SSEDecoder, SSEEvent, loads
+
+def is_error_token(token) -> bool:
+    """True for the StreamError text providers yield instead of raising mid-stream."""
+    return isinstance(token, StreamError)
+
+
+class _ChunkParser:
+    """
+    Per-stream parser for what `_stream_request()` yields.
+
+    `Usage` items pass straight through and `ChatDelta` events (already
+    parsed by the provider) only need unpacking. Bytes are raw transport
+    data and go through an incremental SSEDecoder, so frames split across
+    network chunks are reassembled. Str chunks are always answer text, even
+    when they look like SSE fields ("data: ..."): providers that read SSE
+    hand over bytes or ChatDelta events instead.
+    """
+
+    __slots__ = ("sse", "finish_reason")
+
+    def __init__(self):
+        self.sse = SSEDecoder()
+        self.finish_reason: str | None = None
+
+    def feed(self, chunk) -> tuple[list, bool]:
+        """(tokens, done) for one chunk; done is True once '[DONE]' was seen."""
+        if isinstance(chunk, Usage):
+            return [chunk], False
+        if isinstance(chunk, ChatDelta):
+            return self._delta(chunk), False
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            return self._tokens(self.sse.feed(chunk))
+        text = chunk if isinstance(chunk, str) else str(chunk)  # keeps StreamError's type
+        return ([text] if text else []), False
+
+    def finish(self) -> list:
+        """Tokens of an event the server left unterminated at end of stream."""
+        return self._tokens(self.sse.flush())[0]
+
+    def _tokens(self, events: list[SSEEvent]) -> tuple[list, bool]:
+        tokens: list = []
+        for ev in events:
+            if ev.data == "[DONE]":
+                return tokens, True
+            delta = parse_chat_frame(ev)
+            if delta is not None:
+                tokens += self._delta(delta)
+        return tokens, False
+
+    def _delta(self, delta: ChatDelta) -> list:
+        if delta.finish_reason:
+            self.finish_reason = delta.finish_reason
+        tokens: list = [delta.content] if delta.content else []
+        if delta.usage is not None:
+            # usage arrives in the last frame, after the one carrying finish_reason
+            if delta.usage.finish_reason is None:
+                delta.usage.finish_reason = self.finish_reason
+            tokens.append(delta.usage)
+        return tokens
+
+
+def parse_chat_frame(event: SSEEvent) -> ChatDelta | None:
+    """
+    Parse one OpenAI-compatible chat-completions SSE event; None for
+    payloads that are not JSON objects. Error events raise RuntimeError.
+    """
+    try:
+        obj = loads(event.data)
+    except ValueError:
+        return None  # not JSON; skip quietly
+    if not isinstance(obj, dict):
+        return None
+    if event.event == "error" or obj.get("error"):
+        err = obj.get("error") or obj
+        raise RuntimeError(err.get("message", err) if isinstance(err, dict) else err)
+    delta = ChatDelta()
+    # OpenAI/DeepSeek delta content shape
+    choices = obj.get("choices")
+    if choices:
+        choice = choices[0]
+        delta.content = (choice.get("delta") or {}).get("content") or ""
+        delta.finish_reason = choice.get("finish_reason")
+    # Final frame of OpenAI-compatible streams (stream_options.include_usage)
+    if obj.get("usage"):
+        delta.usage = parse_usage(obj["usage"])
+    return delta
+
 
 class StreamingProviderMixin:
     """
     Adds a universal `.stream()` method for any provider.
-    The provider must implement `_stream_request(prompt, model, **kwargs)`
-    and yield either:
+    The provider must implement `_stream_request(prompt, model, **kwargs)`,
+    where `prompt` is a string or a list of role-tagged messages (see base.Prompt)
+    and `system` may arrive in kwargs, and yield either:
       - plain token strings, or
-      - SSE chunks like 'data: {...}' (bytes or str). Multiple 'data: ' blocks
-        may come concatenated in a single chunk — we split and parse all.
+      - raw SSE bytes as read off the wire (frames may span chunks), or
+      - ChatDelta events it parsed itself (see openai_compat.py).
+    Str chunks are never parsed as SSE.
+    A final `Usage` item (yielded directly or parsed from an SSE usage frame)
+    is passed through after the text.
+    `_stream_request` should raise on failure: requests that fail before their
+    first chunk are retried (see retry.py), later errors end the stream as a
+    StreamError ("[stream error: ...]" text).
     """
 
-    def stream(self, prompt: str, model: str | None = None, **kwargs):
+    def stream(self, prompt: Prompt, model: str | None = None, **kwargs):
         try:
-            for chunk in self._stream_request(prompt, model=model, **kwargs):
-                # Normalize to text
-                if isinstance(chunk, (bytes, bytearray)):
-                    text = chunk.decode("utf-8", errors="ignore")
-                else:
-                    text = str(chunk)
-
-                if not text:
-                    continue
-
-                # If chunk contains SSE frames, split and parse them
-                if "data: " in text:
-                    # Split while keeping only the payload parts after 'data: '
-                    parts = text.split("data: ")
-                    for part in parts:
-                        part = part.strip()
-                        if not part:
-                            continue
-                        if part == "[DONE]":
-                            return
-                        # Some servers concatenate without newline; each 'part' should be a JSON object
-                        try:
-                            obj = json.loads(part)
-                        except json.JSONDecodeError:
-                            # Not JSON; skip quietly
-                            continue
-
-                        # OpenAI/DeepSeek delta content shape
-                        delta = (
-                            (obj.get("choices") or [{}])[0]
-                            .get("delta", {})
-                        )
-                        token = delta.get("content") or ""
-                        if token:
-                            yield token
-                    continue
-
-                # Otherwise treat as already-parsed token text
-                yield text
+            # closing(): a consumer that stops early closes the upstream response too
+            request = lambda: self._stream_request(prompt, model=model, **kwargs)
+            parser = _ChunkParser()
+            with closing(retry_stream(_provider_name(self), request)) as chunks:
+                for chunk in chunks:
+                    tokens, done = parser.feed(chunk)
+                    yield from tokens
+                    if done:
+                        return
+            yield from parser.finish()
         except Exception as e:
-            yield f"[stream error: {e}]"
+            yield StreamError(f"[stream error: {e}]")
+
+
+class AsyncStreamingProviderMixin:
+    """
+    Async counterpart of StreamingProviderMixin.
+    The provider must implement `_astream_request(prompt, model, **kwargs)` as an
+    async generator yielding the same chunk shapes as `_stream_request`.
+    """
+
+    async def astream(self, prompt: Prompt, model: str | None = None, **kwargs):
+        try:
+            request = lambda: self._astream_request(prompt, model=model, **kwargs)
+            parser = _ChunkParser()
+            async with aclosing(aretry_stream(_provider_name(self), request)) as chunks:
+                async for chunk in chunks:
+                    tokens, done = parser.feed(chunk)
+                    for token in tokens:
+                        yield token
+                    if done:
+                        return
+            for token in parser.finish():
+                yield token
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield StreamError(f"[stream error: {e}]")
+
+
+def _provider_name(prov) -> str:
+    return getattr(prov, "name", None) or type(prov).__name__
+
+
+async def _admit(prov, prompt: Prompt, model: str | None, kwargs: dict) -> None:
+    """
+    Wait for the provider's rate budget (raises RateLimitExceeded when the
+    request is shed). Consumes the optional `prompt_tokens` kwarg: callers
+    that already counted the prompt pass it so it is not tokenized again.
+    """
+    prompt_tokens = kwargs.pop("prompt_tokens", None)
+    governor = get_governor()
+    if governor is None:
+        return
+    name, api_key = _provider_name(prov), getattr(prov, "api_key", None)
+    if not governor.limited(name, api_key):
+        return  # no configured limit and no rate-limit headers seen yet: nothing to draw from
+    tokens = governor.estimate_tokens(prompt, model, kwargs.get("system"), prompt_tokens)
+    await governor.acquire(name, api_key, tokens)
+
+
+def _is_wrapper(prov) -> bool:
+    # wrappers (e.g. SemanticCachedProvider) admit and retry their own upstream calls
+    return getattr(type(prov), "wraps_upstream", False)
+
+
+async def astream(prov, prompt: Prompt, model: str | None = None, **kwargs):
+    """
+    Iterate a provider's tokens without blocking the event loop.
+    Uses the native `astream()` when available; sync-only providers run on the
+    bounded offload pool and hand tokens back through a bounded queue.
+    The request is admitted by the rate governor first (a `prompt_tokens`
+    kwarg only feeds that admission); wrappers are called as they are and
+    admit only what they send upstream.
+    """
+    if _is_wrapper(prov):
+        async with aclosing(prov.astream(prompt, model=model, **kwargs)) as tokens:
+            async for token in tokens:
+                yield token
+        return
+    async with aclosing(astream_upstream(prov, prompt, model=model, **kwargs)) as tokens:
+        async for token in tokens:
+            yield token
+
+
+async def astream_upstream(prov, prompt: Prompt, model: str | None = None, **kwargs):
+    """astream() for a provider that talks to its API itself: admission, then the stream."""
+    await _admit(prov, prompt, model, kwargs)
+    if hasattr(prov, "astream"):
+        async with aclosing(prov.astream(prompt, model=model, **kwargs)) as tokens:
+            async for token in tokens:
+                yield token
+        return
+
+    offloader = get_offloader()
+    async for token in offloader.stream(_provider_name(prov), lambda: prov.stream(prompt, model=model, **kwargs)):
+        yield token
+
+
+async def acomplete(prov, prompt: Prompt, model: str | None = None, **kwargs):
+    """
+    Await a completion (retried on transient failures); sync-only providers
+    run `complete()` on the offload pool. Wrappers are awaited as they are.
+    """
+    if _is_wrapper(prov):
+        return await prov.acomplete(prompt, model=model, **kwargs)
+    return await acomplete_upstream(prov, prompt, model=model, **kwargs)
+
+
+async def acomplete_upstream(prov, prompt: Prompt, model: str | None = None, **kwargs):
+    """acomplete() for a provider that talks to its API itself: admitted once, retried here only."""
+    await _admit(prov, prompt, model, kwargs)
+    name = _provider_name(prov)
+    if hasattr(prov, "acomplete"):
+        return await aretry_call(name, lambda: prov.acomplete(prompt, model=model, **kwargs))
+    return await aretry_call(name, lambda: get_offloader().run(name, lambda: prov.complete(prompt, model=model, **kwargs)))
@@ -1,6 +1,7 @@
 # src/neuralizard/providers/cohere_provider.py
-import time, os, requests
-from .base import LLMResult
+import time, os
+from .base import LLMResult, Prompt, to_messages, split_system
+from ._http import httpx_client, httpx_async_client
 
 API_URL = "https://api.cohere.ai/v1/chat"
 
@@ -9,22 +10,31 @@ class CohereProvider:
 
     def __init__(self, api_key: str | None):
         self.api_key = api_key or os.getenv("COHERE_API_KEY")
+        self._client = httpx_client()
+        self._aclient = httpx_async_client()
 
-    def complete(self, prompt: str, model: str | None = None, **kwargs) -> LLMResult:
+    def _request(self, prompt: Prompt, model: str | None, system: str | None = None) -> tuple[dict, dict]:
         if not self.api_key:
             raise RuntimeError("COHERE_API_KEY missing")
 
         headers = {"Authorization": f"Bearer {self.api_key}"} 
+        # v1 chat: the last turn is `message`, earlier turns go to chat_history, system to preamble
+        preamble, messages = split_system(to_messages(prompt, system))
+        last = messages.pop() if messages else {"content": ""}
         payload = {
             "model": model or "command-r-plus",
-            "message": prompt,
+            "message": last["content"],
         }
+        if messages:
+            payload["chat_history"] = [
+                {"role": "CHATBOT" if m["role"] == "assistant" else "USER", "message": m["content"]}
+                for m in messages
+            ]
+        if preamble:
+            payload["preamble"] = preamble
+        return headers, payload
 
-        t0 = time.time()
-        r = requests.post(API_URL, headers=headers, json=payload, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-
+    def _to_result(self, data: dict, model: str | None, t0: float) -> LLMResult:
         text = data["text"]
 
         return LLMResult(
@@ -33,3 +43,25 @@ class CohereProvider:
             model=model or "command-r-plus",
             latency_ms=int((time.time() - t0) * 1000),
         )
+
+    def complete(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs) -> LLMResult:
+        headers, payload = self._request(prompt, model, system)
+
+        t0 = time.time()
+        r = self._client.post(API_URL, headers=headers, json=payload)
+        r.raise_for_status()
+        return self._to_result(r.json(), model, t0)
+
+    async def acomplete(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs) -> LLMResult:
+        headers, payload = self._request(prompt, model, system)
+
+        t0 = time.time()
+        r = await self._aclient.post(API_URL, headers=headers, json=payload)
+        r.raise_for_status()
+        return self._to_result(r.json(), model, t0)
+
+    def close(self):
+        self._client.close()
+
+    async def aclose(self):
+        await self._aclient.aclose()
@@ -3,7 +3,7 @@ import time
 import re
 import google.generativeai as genai
 from typing import Any
-from .base import LLMResult
+from .base import LLMResult, Prompt, to_messages, split_system
 from .base_streaming import StreamingProviderMixin
 from ._usage import usage_get
 
@@ -23,19 +23,32 @@ class GoogleProvider(StreamingProviderMixin):
         genai.configure(api_key=self.api_key)
         self.default_model = "gemini-2.5-flash"
 
+    @staticmethod
+    def _request(prompt: Prompt, system: str | None, chosen_model: str):
+        """
+        Model instance plus `contents` for generate_content(): Gemini calls the
+        assistant role "model" and takes the system prompt as system_instruction.
+        """
+        system_text, messages = split_system(to_messages(prompt, system))
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in messages
+        ]
+        return genai.GenerativeModel(chosen_model, system_instruction=system_text), contents
+
     # ============================================================
     # 🔹 Single completion
     # ============================================================
 
-    def complete(self, prompt: str, model: str | None = None, **kwargs) -> LLMResult:
-        """Send a single prompt to the Gemini API."""
+    def complete(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs) -> LLMResult:
+        """Send a prompt or conversation to the Gemini API."""
         chosen_model = model or self.default_model
         t0 = time.time()
 
         try:
-            model_instance = genai.GenerativeModel(chosen_model)
+            model_instance, contents = self._request(prompt, system, chosen_model)
             response = model_instance.generate_content(
-                prompt,
+                contents,
                 generation_config={
                     "temperature": kwargs.get("temperature", 0.7),
                     "max_output_tokens": kwargs.get("max_tokens", 1024),
@@ -135,31 +148,28 @@ class GoogleProvider(StreamingProviderMixin):
     # 🔹 Streaming completion
     # ============================================================
 
-    def _stream_request(self, prompt: str, model: str | None = None, **kwargs):
+    def _stream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
         """
         Stream content from Gemini using the SDK's generate_content(..., stream=True)
         """
         chosen_model = model or self.default_model
 
-        try:
-            model_instance = genai.GenerativeModel(chosen_model)
-            stream = model_instance.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": kwargs.get("temperature", 0.7),
-                    "max_output_tokens": kwargs.get("max_tokens", 1024),
-                },
-                stream=True,
-            )
+        model_instance, contents = self._request(prompt, system, chosen_model)
+        stream = model_instance.generate_content(
+            contents,
+            generation_config={
+                "temperature": kwargs.get("temperature", 0.7),
+                "max_output_tokens": kwargs.get("max_tokens", 1024),
+            },
+            stream=True,
+        )
 
-            for chunk in stream:
-                # each chunk contains candidate parts; yield text tokens
-                if hasattr(chunk, "text") and chunk.text:
-                    yield chunk.text
-                elif hasattr(chunk, "candidates"):
-                    for c in chunk.candidates or []:
-                        for part in getattr(c, "content", {}).get("parts", []):
-                            if hasattr(part, "text") and part.text:
-                                yield part.text
-        except Exception as e:
-            yield f"[Stream error: {e}]"
+        for chunk in stream:
+            # each chunk contains candidate parts; yield text tokens
+            if hasattr(chunk, "text") and chunk.text:
+                yield chunk.text
+            elif hasattr(chunk, "candidates"):
+                for c in chunk.candidates or []:
+                    for part in getattr(c, "content", {}).get("parts", []):
+                        if hasattr(part, "text") and part.text:
+                            yield part.text
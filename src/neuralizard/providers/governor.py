@@ -0,0 +1,359 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Mapping, Protocol
+from urllib.parse import urlsplit
+from ..config import settings
+from ..context import count_tokens
+from .base import Prompt, to_messages
+
+# API host -> provider name, so response headers can be attributed without the provider's help
+PROVIDER_HOSTS = {
+    "api.openai.com": "openai",
+    "api.anthropic.com": "anthropic",
+    "generativelanguage.googleapis.com": "google",
+    "api.mistral.ai": "mistral",
+    "api.cohere.ai": "cohere",
+    "api.cohere.com": "cohere",
+    "api.x.ai": "xai",
+    "api.deepseek.com": "deepseek",
+    "api.perplexity.ai": "perplexity",
+}
+
+
+class RateLimitExceeded(RuntimeError):
+    """A request was shed because its provider's budget would not free up within the allowed wait."""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit reached for {provider}; retry in {retry_after:.1f}s")
+
+
+def key_id(provider: str, api_key: str | None) -> str:
+    """Bucket key: provider plus a short hash of the API key (the key itself is never stored)."""
+    digest = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+    return f"{provider.lower()}:{digest}"
+
+
+# -------- bucket arithmetic (shared by both stores) --------
+
+def _new_state(rpm: float, tpm: float, now: float) -> dict:
+    return {"rpm": rpm, "tpm": tpm, "req": rpm, "tok": tpm, "updated": now, "blocked_until": 0.0}
+
+
+def _refill(state: dict, now: float) -> None:
+    dt = max(0.0, now - state["updated"])
+    if state["rpm"]:
+        state["req"] = min(state["rpm"], state["req"] + dt * state["rpm"] / 60.0)
+    if state["tpm"]:
+        state["tok"] = min(state["tpm"], state["tok"] + dt * state["tpm"] / 60.0)
+    state["updated"] = now
+
+
+def _admit(state: dict, tokens: int, now: float) -> float:
+    """Take one request and `tokens` from the buckets; returns 0.0, or the seconds to wait instead."""
+    _refill(state, now)
+    wait = max(0.0, state["blocked_until"] - now)
+    if state["rpm"] and state["req"] < 1:
+        wait = max(wait, (1 - state["req"]) * 60.0 / state["rpm"])
+    need = min(tokens, state["tpm"]) if state["tpm"] else 0
+    if need and state["tok"] < need:
+        wait = max(wait, (need - state["tok"]) * 60.0 / state["tpm"])
+    if wait > 0:
+        return wait
+    if state["rpm"]:
+        state["req"] -= 1
+    state["tok"] -= need
+    return 0.0
+
+
+class BucketStore(Protocol):
+    def update(self, key: str, fn: Callable[[dict | None], object], default: dict | None) -> object:
+        """Run `fn` on the key's state atomically; `default` is used (and stored) when there is none."""
+        ...
+
+    def keys(self) -> list[str]:
+        """Keys that have a stored state."""
+        ...
+
+
+class MemoryBucketStore:
+    """Buckets for a single process."""
+
+    def __init__(self):
+        self._states: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, fn, default):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None and default is not None:
+                state = self._states[key] = default
+            return fn(state)
+
+    def keys(self):
+        with self._lock:
+            return list(self._states)
+
+
+class SQLiteBucketStore:
+    """
+    Buckets in a local SQLite file, so every worker process on the host
+    draws from the same budget. Each update is one IMMEDIATE transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute("CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def update(self, key, fn, default):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            state = json.loads(row[0]) if row else default
+            result = fn(state)
+            if state is not None:
+                conn.execute("INSERT OR REPLACE INTO rate_buckets (key, state) VALUES (?, ?)", (key, json.dumps(state)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def keys(self):
+        return [row[0] for row in self._conn().execute("SELECT key FROM rate_buckets")]
+
+
+# -------- response header calibration --------
+
+def _duration(value: str | None) -> float | None:
+    """'1s', '6m0s', '20ms', '2.5', or an HTTP date / RFC 3339 time -> seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00")) if "T" in value else parsedate_to_datetime(value)
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return max(0.0, ts.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _number(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def parse_rate_headers(headers: Mapping[str, str], status: int) -> dict:
+    """Limits/remaining/back-off from `x-ratelimit-*` (and Anthropic's `anthropic-ratelimit-*`) headers."""
+    h = {k.lower(): v for k, v in headers.items()}
+
+    def pick(*names):
+        return next((h[n] for n in names if n in h), None)
+
+    out = {
+        "rpm": _number(pick("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit")),
+        "tpm": _number(pick("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit")),
+        "req": _number(pick("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")),
+        "tok": _number(pick("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining")),
+    }
+    if status == 429:
+        out["retry_after"] = (
+            _duration(pick("retry-after"))
+            or _duration(pick("x-ratelimit-reset-requests", "anthropic-ratelimit-requests-reset"))
+            or 1.0
+        )
+    return {k: v for k, v in out.items() if v is not None}
+
+
+def _auth_key(headers: Mapping[str, str]) -> str | None:
+    h = {k.lower(): v for k, v in headers.items()}
+    auth = h.get("authorization") or ""
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+    return h.get("x-api-key") or h.get("x-goog-api-key")
+
+
+class RateGovernor:
+    """
+    Client-side admission control per provider and API key.
+
+    Requests-per-minute and tokens-per-minute are token buckets, seeded from
+    settings.rate_limits and re-calibrated from the limit/remaining headers
+    of every response; a 429 empties the request bucket until its
+    retry-after. A request that would have to wait up to `max_wait` seconds
+    is queued (it sleeps until the budget refills); longer waits are shed
+    with RateLimitExceeded. Keys with no known limit pass straight through
+    without tokenizing the prompt or touching the store (see `limited()`).
+    """
+
+    def __init__(self, store: BucketStore, limits: dict[str, dict] | None = None,
+                 max_wait: float = 10.0, output_tokens: int = 512):
+        self.store = store
+        self.limits = {k.lower(): v for k, v in (limits or {}).items()}
+        self.max_wait = max_wait
+        self.output_tokens = output_tokens
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        # bucket keys with state in the store: calibrated here or (before we started) by another worker
+        self._known: set[str] = set(store.keys())
+
+    def limited(self, provider: str, api_key: str | None) -> bool:
+        """Whether requests for this provider/key have a bucket to draw from (configured or from headers)."""
+        provider = provider.lower()
+        return provider in self.limits or key_id(provider, api_key) in self._known
+
+    def _default(self, provider: str, now: float) -> dict | None:
+        cfg = self.limits.get(provider)
+        if not cfg:
+            return None
+        return _new_state(float(cfg.get("rpm") or 0), float(cfg.get("tpm") or 0), now)
+
+    def estimate_tokens(self, prompt: Prompt, model: str | None = None, system: str | None = None,
+                        prompt_tokens: int | None = None) -> int:
+        """Tokens one request takes from the TPM bucket; `prompt_tokens`, when the caller already counted them, skips tokenizing."""
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens("\n".join(m["content"] for m in to_messages(prompt, system)), model)
+        return prompt_tokens + self.output_tokens
+
+    def try_acquire(self, provider: str, api_key: str | None, tokens: int) -> float:
+        """One admission attempt (blocking store I/O): 0.0 when admitted, else the seconds to wait."""
+        now = time.time()
+        provider = provider.lower()
+        return self.store.update(
+            key_id(provider, api_key),
+            lambda state: 0.0 if state is None else _admit(state, tokens, now),
+            self._default(provider, now),
+        )
+
+    async def acquire(self, provider: str, api_key: str | None, tokens: int) -> float:
+        """Wait for room in the provider's buckets; returns the time queued (s) or raises RateLimitExceeded."""
+        t0 = time.perf_counter()
+        queued = False
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, provider, api_key, tokens)
+            waited = time.perf_counter() - t0
+            if wait <= 0:
+                self._record(provider, "admitted", waited, queued)
+                return waited
+            if waited + wait > self.max_wait:
+                self._record(provider, "shed", waited, queued)
+                raise RateLimitExceeded(provider, wait)
+            queued = True
+            await asyncio.sleep(wait)
+
+    def observe(self, provider: str, api_key: str | None, headers: Mapping[str, str], status: int) -> None:
+        """Calibrate the buckets from one response's rate-limit headers."""
+        info = parse_rate_headers(headers, status)
+        if not info:
+            return
+        now = time.time()
+        provider = provider.lower()
+
+        def apply(state: dict | None):
+            _refill(state, now)
+            if "rpm" in info:
+                state["rpm"] = info["rpm"]
+            if "tpm" in info:
+                state["tpm"] = info["tpm"]
+            # the server's view of what is left wins when it is stricter than ours
+            if "req" in info:
+                state["req"] = min(state["req"], info["req"]) if state["rpm"] else info["req"]
+            if "tok" in info:
+                state["tok"] = min(state["tok"], info["tok"]) if state["tpm"] else info["tok"]
+            if "retry_after" in info:
+                state["req"] = 0.0
+                state["blocked_until"] = max(state["blocked_until"], now + info["retry_after"])
+
+        default = self._default(provider, now) or _new_state(0.0, 0.0, now)
+        key = key_id(provider, api_key)
+        try:
+            self.store.update(key, apply, default)
+        except Exception as e:
+            logging.warning(f"Rate-limit calibration for {provider} failed: {e}")
+            return
+        self._known.add(key)
+
+    def observe_response(self, url: str, request_headers: Mapping[str, str], headers: Mapping[str, str],
+                         status: int) -> None:
+        provider = PROVIDER_HOSTS.get(urlsplit(str(url)).hostname or "")
+        if provider:
+            self.observe(provider, _auth_key(request_headers), headers, status)
+
+    def _record(self, provider: str, outcome: str, waited: float, queued: bool) -> None:
+        with self._lock:
+            s = self._stats.setdefault(provider.lower(), {
+                "admitted": 0, "queued": 0, "shed": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+            })
+            s[outcome] += 1
+            s["queued"] += queued
+            s["wait_ms_total"] += waited * 1000
+            s["wait_ms_max"] = max(s["wait_ms_max"], waited * 1000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {p: dict(s) for p, s in self._stats.items()}
+        for s in out.values():
+            n = s["admitted"] + s["shed"]
+            s["wait_ms_avg"] = round(s["wait_ms_total"] / n, 1) if n else 0.0
+            s["wait_ms_total"] = round(s["wait_ms_total"], 1)
+            s["wait_ms_max"] = round(s["wait_ms_max"], 1)
+        return out
+
+
+_GOVERNOR: RateGovernor | None = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+def get_governor() -> RateGovernor | None:
+    """The process-wide governor, or None when settings.rate_limit_enabled is off."""
+    global _GOVERNOR
+    if not settings.rate_limit_enabled:
+        return None
+    if _GOVERNOR is None:
+        with _GOVERNOR_LOCK:
+            if _GOVERNOR is None:
+                path = settings.rate_limit_store
+                _GOVERNOR = RateGovernor(
+                    SQLiteBucketStore(path) if path else MemoryBucketStore(),
+                    limits=settings.rate_limits,
+                    max_wait=settings.rate_limit_max_wait,
+                    output_tokens=settings.rate_limit_output_tokens,
+                )
+    return _GOVERNOR
+
+
+def set_governor(governor: RateGovernor | None) -> None:
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        _GOVERNOR = governor
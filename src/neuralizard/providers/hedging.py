@@ -0,0 +1,220 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from ..context import _APPROX
+from .base import Prompt, to_messages
+from .base_streaming import astream, is_error_token
+
+# hedged_astream lane markers: the lane's stream ended
+_END = object()
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    When to race a backup against the primary on one route.
+
+    The primary gets until the `percentile` of its observed first_token_ms
+    (clamped to [min_delay_ms, max_delay_ms]) to produce its first token;
+    until `min_samples` observations exist `default_delay_ms` is used.
+    After that the backup starts and whichever answers first wins.
+    """
+    backup_provider: str
+    backup_model: str | None = None
+    percentile: float = 0.95
+    min_delay_ms: int = 200
+    max_delay_ms: int = 10000
+    default_delay_ms: int = 2000
+    min_samples: int = 20
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "HedgePolicy":
+        known = {f.name for f in fields(cls)}
+        unknown = set(raw) - known
+        if unknown:
+            raise ValueError(f"Unknown hedge policy fields: {', '.join(sorted(unknown))}")
+        return cls(**raw)
+
+    def delay_ms(self, tracker: "FirstTokenTracker", provider: str, model: str | None) -> float:
+        observed = tracker.percentile(provider, model, self.percentile, self.min_samples)
+        delay = self.default_delay_ms if observed is None else observed
+        return min(max(delay, self.min_delay_ms), self.max_delay_ms)
+
+
+class FirstTokenTracker:
+    """Rolling window of first_token_ms samples per (provider, model)."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[tuple[str, str | None], deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, provider: str, model: str | None, first_token_ms: float) -> None:
+        if first_token_ms <= 0:
+            return
+        key = ((provider or "").lower(), model)
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(float(first_token_ms))
+
+    def seed(self, samples) -> None:
+        """Load (provider, model, first_token_ms) rows, oldest first (e.g. from stored messages)."""
+        for provider, model, ms in samples:
+            self.observe(provider, model, ms)
+
+    def percentile(self, provider: str, model: str | None, q: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(((provider or "").lower(), model), ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = list(self._samples.items())
+        return {
+            f"{p}/{m or 'default'}": {"samples": len(s), "p50_ms": sorted(s)[len(s) // 2]}
+            for (p, m), s in keys if s
+        }
+
+
+class HedgeStats:
+    """Per-route hedging counters: how often a backup was started, how often it won, what it cost."""
+
+    def __init__(self):
+        self._routes: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, *, hedged: bool, backup_won: bool, wasted_tokens: int) -> None:
+        with self._lock:
+            c = self._routes.setdefault(route, {"requests": 0, "hedged": 0, "backup_wins": 0, "wasted_tokens": 0})
+            c["requests"] += 1
+            c["hedged"] += hedged
+            c["backup_wins"] += backup_won
+            c["wasted_tokens"] += wasted_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {r: dict(c) for r, c in self._routes.items()}
+        for c in routes.values():
+            c["hedge_rate"] = round(c["hedged"] / c["requests"], 3) if c["requests"] else 0.0
+            c["backup_win_rate"] = round(c["backup_wins"] / c["hedged"], 3) if c["hedged"] else 0.0
+        return routes
+
+
+def _prompt_text(prompt: Prompt, system: str | None) -> str:
+    return "\n".join(m["content"] for m in to_messages(prompt, system))
+
+
+async def _pump(lane: int, gen, q: asyncio.Queue, errors: dict) -> None:
+    try:
+        async for item in gen:
+            await q.put((lane, item))
+    except Exception as e:
+        errors[lane] = e  # re-raised by hedged_astream if this lane's failure decides the answer
+    finally:
+        try:
+            await gen.aclose()
+        finally:
+            await q.put((lane, _END))
+
+
+def _answers(item) -> bool:
+    """Only real text settles the race; error text, Usage and empty tokens do not."""
+    return isinstance(item, str) and bool(item) and not is_error_token(item)
+
+
+async def hedged_astream(primary, backup, prompt: Prompt, *, route: str, policy: HedgePolicy,
+                         primary_name: str, model: str | None = None,
+                         tracker: FirstTokenTracker, stats: HedgeStats,
+                         outcome: dict | None = None, **kwargs):
+    """
+    astream() from `primary`, hedged with `backup` under `policy`.
+
+    If the primary has produced no text by the policy's delay, or fails or
+    ends before producing any, the backup request starts. The first lane to
+    yield real text wins and the other is cancelled (closing its upstream
+    response); only the winner's items are passed on. When neither lane
+    answers, the primary's error (raised or yielded as error text) is what
+    the caller gets. `outcome` (when given) is filled with the winner's
+    provider/model, so callers can attribute the answer correctly.
+    """
+    backup_model = policy.backup_model or model
+    lanes = [(primary_name.lower(), model), (policy.backup_provider.lower(), backup_model)]
+    q: asyncio.Queue = asyncio.Queue()
+    errors: dict[int, Exception] = {}
+    error_text: dict[int, str] = {}
+    ended: set[int] = set()
+    started = [time.perf_counter(), None]
+    tasks = [asyncio.create_task(_pump(0, astream(primary, prompt, model=model, **kwargs), q, errors))]
+
+    def start_backup() -> None:
+        if len(tasks) == 1:
+            started[1] = time.perf_counter()
+            tasks.append(asyncio.create_task(_pump(1, astream(backup, prompt, model=backup_model, **kwargs), q, errors)))
+
+    deadline = started[0] + policy.delay_ms(tracker, *lanes[0]) / 1000.0
+    winner = None
+    loser_chars = 0
+    try:
+        while winner is None:
+            try:
+                timeout = None if len(tasks) > 1 else max(0.0, deadline - time.perf_counter())
+                lane, item = await asyncio.wait_for(q.get(), timeout)
+            except asyncio.TimeoutError:
+                start_backup()
+                continue
+            if _answers(item):
+                winner = lane
+            elif item is _END:
+                ended.add(lane)
+                if len(ended) == len(tasks) and len(tasks) > 1:
+                    break  # both lanes finished without an answer
+                start_backup()
+            elif is_error_token(item):
+                error_text.setdefault(lane, item)
+                start_backup()
+        if winner is None:
+            for lane in (0, 1):
+                if lane in errors:
+                    raise errors[lane]
+                if lane in error_text:
+                    yield error_text[lane]
+                    return
+            return
+        first_token_ms = (time.perf_counter() - started[winner]) * 1000
+        tracker.observe(*lanes[winner], first_token_ms)
+        if len(tasks) > 1:
+            if winner == 1 and 0 not in ended and 0 not in error_text:
+                # the primary's first token is at least this late; keeps its percentile honest
+                tracker.observe(*lanes[0], (time.perf_counter() - started[0]) * 1000)
+            tasks[1 - winner].cancel()
+        if outcome is not None:
+            outcome.update({
+                "provider": lanes[winner][0],
+                "model": lanes[winner][1],
+                "hedged": len(tasks) > 1,
+                "winner": "backup" if winner else "primary",
+                "first_token_ms": int(first_token_ms),
+            })
+        while item is not _END:
+            yield item
+            lane, item = await q.get()
+            while lane != winner:
+                if isinstance(item, str):
+                    loser_chars += len(item)
+                lane, item = await q.get()
+        if winner in errors:
+            raise errors[winner]
+    finally:
+        for task in tasks:
+            task.cancel()
+        if len(tasks) > 1:
+            # the losing request was billed for its prompt plus whatever it produced;
+            # estimated from characters so stats never cost a tokenizer pass per request
+            chars = len(_prompt_text(prompt, kwargs.get("system"))) + loser_chars
+            wasted = -(-chars // _APPROX.CHARS_PER_TOKEN)
+        else:
+            wasted = 0
+        stats.record(route, hedged=len(tasks) > 1, backup_won=winner == 1, wasted_tokens=wasted)
@@ -2,13 +2,14 @@ import os
 import time
 import re
 from mistralai import Mistral
-from .base import LLMResult
-from .base_streaming import StreamingProviderMixin
+from .base import LLMResult, Prompt, StreamError, to_messages
+from .base_streaming import StreamingProviderMixin, AsyncStreamingProviderMixin
+from ._http import httpx_client, httpx_async_client
 
 
-class MistralProvider(StreamingProviderMixin):
+class MistralProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
     """
-    Mistral provider (single + streaming).
+    Mistral provider (single + streaming, sync and async).
     """
 
     name = "mistral"
@@ -17,104 +18,152 @@ class MistralProvider(StreamingProviderMixin):
         self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
             raise RuntimeError("MISTRAL_API_KEY missing. Add it to ~/.neuralizard/.env")
-        self.client = Mistral(api_key=self.api_key)
+        self._http = httpx_client()
+        self._ahttp = httpx_async_client()
+        self.client = Mistral(api_key=self.api_key, client=self._http, async_client=self._ahttp)
         self.default_model = "mistral-large-latest"
 
     # -------- Non‑streaming --------
-    def complete(self, prompt: str, model: str | None = None, **kwargs) -> LLMResult:
+    def _to_result(self, resp, chosen_model: str, t0: float) -> LLMResult:
+        text = resp.choices[0].message.content
+        usage = getattr(resp, "usage", {}) or {}
+        return LLMResult(
+            text=text.strip(),
+            provider=self.name,
+            model=chosen_model,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            response_tokens=usage.get("completion_tokens", 0),
+            latency_ms=int((time.time() - t0) * 1000),
+        )
+
+    def complete(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs) -> LLMResult:
         chosen_model = model or self.default_model
         t0 = time.time()
         try:
             resp = self.client.chat.complete(
                 model=chosen_model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=to_messages(prompt, system),
                 temperature=kwargs.get("temperature", 0.7),
                 max_tokens=kwargs.get("max_tokens", 1024),
             )
         except Exception as e:
             raise RuntimeError(f"Mistral API error: {e}")
 
-        text = resp.choices[0].message.content
-        usage = getattr(resp, "usage", {}) or {}
-        return LLMResult(
-            text=text.strip(),
-            provider=self.name,
-            model=chosen_model,
-            prompt_tokens=usage.get("prompt_tokens", 0),
-            response_tokens=usage.get("completion_tokens", 0),
-            latency_ms=int((time.time() - t0) * 1000),
-        )
+        return self._to_result(resp, chosen_model, t0)
+
+    async def acomplete(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs) -> LLMResult:
+        chosen_model = model or self.default_model
+        t0 = time.time()
+        try:
+            resp = await self.client.chat.complete_async(
+                model=chosen_model,
+                messages=to_messages(prompt, system),
+                temperature=kwargs.get("temperature", 0.7),
+                max_tokens=kwargs.get("max_tokens", 1024),
+            )
+        except Exception as e:
+            raise RuntimeError(f"Mistral API error: {e}")
+
+        return self._to_result(resp, chosen_model, t0)
 
     # -------- Streaming (used by mixin) --------
-    def _stream_request(self, prompt: str, model: str | None = None, **kwargs):
+    @staticmethod
+    def _event_pieces(event, debug: bool = False) -> tuple[list[str], bool]:
         """
-        Yield incremental text chunks. Defensive against SDK variations
-        (some events lack .type; use .event_type or class name).
+        Map one stream event to (text pieces, stop). Defensive against SDK
+        variations (some events lack .type; use .event_type or class name).
+        """
+        pieces: list[str] = []
+        etype = (
+            getattr(event, "type", None)
+            or getattr(event, "event_type", None)
+            or getattr(event, "event", None)
+            or event.__class__.__name__
+        )
+
+        if debug:
+            pieces.append(f"[DEBUG {etype}]")
+
+        # Known delta patterns
+        # Pattern A: event.data.delta.content (list or str)
+        delta_obj = getattr(getattr(event, "data", None), "delta", None)
+        if delta_obj:
+            content = getattr(delta_obj, "content", None)
+            if isinstance(content, str) and content:
+                pieces.append(content)
+                return pieces, False
+            if isinstance(content, list):
+                pieces.extend(part for part in content if isinstance(part, str) and part)
+                return pieces, False
+
+        # Pattern B: direct message chunk (fallback)
+        if hasattr(event, "data") and hasattr(event.data, "choices"):
+            try:
+                choices = event.data.choices
+                if choices:
+                    piece = getattr(choices[0].delta, "content", None)
+                    if piece:
+                        if isinstance(piece, str):
+                            pieces.append(piece)
+                        elif isinstance(piece, list):
+                            pieces.extend(p for p in piece if isinstance(p, str))
+            except Exception:
+                pass
+
+        # Completion / stop signals
+        if any(k in str(etype).lower() for k in ("completed", "stop", "end")):
+            return pieces, True
+
+        # Errors
+        if "error" in str(etype).lower():
+            err = getattr(event, "error", None) or getattr(getattr(event, "data", None), "error", None)
+            pieces.append(StreamError(f"[ERROR: {err}]"))
+            return pieces, True
+
+        return pieces, False
+
+    def _stream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
+        """
+        Yield incremental text chunks.
         """
         chosen_model = model or self.default_model
         debug = kwargs.get("debug", False)
 
-        try:
-            # Some SDKs: self.client.chat.stream(...)
-            with self.client.chat.stream(
-                model=chosen_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=kwargs.get("temperature", 0.7),
-                max_tokens=kwargs.get("max_tokens", 1024),
-            ) as stream:
-                for event in stream:
-                    etype = (
-                        getattr(event, "type", None)
-                        or getattr(event, "event_type", None)
-                        or getattr(event, "event", None)
-                        or event.__class__.__name__
-                    )
-
-                    if debug:
-                        yield f"[DEBUG {etype}]"
-
-                    # Known delta patterns
-                    # Pattern A: event.data.delta.content (list or str)
-                    delta_obj = getattr(getattr(event, "data", None), "delta", None)
-                    if delta_obj:
-                        content = getattr(delta_obj, "content", None)
-                        if isinstance(content, str) and content:
-                            yield content
-                            continue
-                        if isinstance(content, list):
-                            for part in content:
-                                if isinstance(part, str) and part:
-                                    yield part
-                            continue
-
-                    # Pattern B: direct message chunk (fallback)
-                    if hasattr(event, "data") and hasattr(event.data, "choices"):
-                        try:
-                            choices = event.data.choices
-                            if choices:
-                                piece = getattr(choices[0].delta, "content", None)
-                                if piece:
-                                    if isinstance(piece, str):
-                                        yield piece
-                                    elif isinstance(piece, list):
-                                        for p in piece:
-                                            if isinstance(p, str):
-                                                yield p
-                        except Exception:
-                            pass
-
-                    # Completion / stop signals
-                    if any(k in str(etype).lower() for k in ("completed", "stop", "end")):
-                        break
-
-                    # Errors
-                    if "error" in str(etype).lower():
-                        err = getattr(event, "error", None) or getattr(getattr(event, "data", None), "error", None)
-                        yield f"[ERROR: {err}]"
-                        break
+        # Some SDKs: self.client.chat.stream(...)
+        with self.client.chat.stream(
+            model=chosen_model,
+            messages=to_messages(prompt, system),
+            temperature=kwargs.get("temperature", 0.7),
+            max_tokens=kwargs.get("max_tokens", 1024),
+        ) as stream:
+            for event in stream:
+                pieces, stop = self._event_pieces(event, debug)
+                yield from pieces
+                if stop:
+                    break
+
+
+    async def _astream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
+        """
+        Async incremental text chunks via chat.stream_async().
+        """
+        chosen_model = model or self.default_model
+        debug = kwargs.get("debug", False)
+
+        stream = await self.client.chat.stream_async(
+            model=chosen_model,
+            messages=to_messages(prompt, system),
+            temperature=kwargs.get("temperature", 0.7),
+            max_tokens=kwargs.get("max_tokens", 1024),
+        )
+        async with stream:
+            async for event in stream:
+                pieces, stop = self._event_pieces(event, debug)
+                for piece in pieces:
+                    yield piece
+                if stop:
+                    break
 
-        except Exception as e:
-            yield f"[Stream error: {e}]"
 
     # -------- List models --------
     def list_models(self) -> list[str]:
@@ -204,4 +253,16 @@ class MistralProvider(StreamingProviderMixin):
 
             return ordered[:10]
         except Exception:
-            return [self.default_model] if getattr(self, "default_model", None) else []
\ No newline at end of file
+            return [self.default_model] if getattr(self, "default_model", None) else []
+
+    def close(self):
+        try:
+            self._http.close()
+        except Exception:
+            pass
+
+    async def aclose(self):
+        try:
+            await self._ahttp.aclose()
+        except Exception:
+            pass
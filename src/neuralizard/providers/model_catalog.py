@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+ModelFetcher = Callable[[str], list[str]]
+
+# Model listing is rare and slow; a small dedicated pool keeps it off the provider offload workers
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="model-catalog")
+
+
+class ModelCatalog:
+    """
+    Per-provider model lists with stale-while-revalidate semantics.
+
+    A fresh entry (younger than `ttl`) is served as is. A stale entry is
+    served immediately while one background refresh replaces it. Only a
+    provider with no entry at all waits for upstream. Concurrent refreshes
+    of the same provider share one fetch (single flight), and successful
+    lists are written to `path` so a cold process starts with the last known
+    catalog. When a fetch fails, the previous list (or `fallback`) is kept and
+    retried after `error_ttl`.
+    """
+
+    def __init__(self, fetch: ModelFetcher, ttl: float = 600.0, error_ttl: float = 60.0,
+                 path: str | None = None, fallback: dict[str, list[str]] | None = None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.path = path
+        self.fallback = fallback or {}
+        # name -> (expires_at, fetched_at, models); wall-clock so persisted entries stay meaningful
+        self._entries: dict[str, tuple[float, float, list[str]]] = {}
+        self._lock = threading.Lock()
+        # name -> in-flight background fetch (single flight)
+        self._inflight: dict[str, Future] = {}
+        self._name_locks: dict[str, threading.Lock] = {}
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "coalesced": 0, "errors": 0}
+        self._load()
+
+    # -------- persistence --------
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning(f"Model catalog {self.path} unreadable, starting empty: {e}")
+            return
+        for name, entry in (raw.get("providers") or {}).items():
+            models = [m for m in entry.get("models") or [] if isinstance(m, str)]
+            if models:
+                # persisted lists are served immediately but revalidated on first use
+                self._entries[name] = (0.0, float(entry.get("fetched_at") or 0.0), models)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            providers = {n: {"fetched_at": e[1], "models": e[2]} for n, e in self._entries.items() if e[1]}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"providers": providers}, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logging.warning(f"Saving model catalog failed: {e}")
+
+    # -------- lookups --------
+
+    def cached(self, name: str) -> tuple[list[str], bool] | None:
+        """(models, fresh) for `name`, or None when nothing is known yet."""
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        return list(entry[2]), entry[0] > time.time()
+
+    def get(self, name: str, use_cache: bool = True) -> list[str]:
+        """Blocking lookup for sync callers (CLI); stale entries are refetched inline."""
+        hit = self.cached(name) if use_cache else None
+        if hit is not None and hit[1]:
+            self.counters["fresh_hits"] += 1
+            return hit[0]
+        self.counters["misses"] += 1
+        return self._refresh_sync(name)
+
+    async def aget(self, name: str, refresh: bool = False) -> list[str]:
+        """
+        Non-blocking lookup. Returns the cached list (fresh or stale) right
+        away and revalidates in the background when it is stale or `refresh`
+        is set; only a provider with no list yet awaits the fetch.
+        """
+        hit = self.cached(name)
+        if hit is None:
+            self.counters["misses"] += 1
+            return await self.refresh(name)
+        models, fresh = hit
+        self.counters["fresh_hits" if fresh else "stale_hits"] += 1
+        if refresh or not fresh:
+            self.refresh(name)
+        return models
+
+    def refresh(self, name: str) -> "asyncio.Future[list[str]]":
+        """Start (or join) the background fetch for `name`; await the result to get the new list."""
+        fut = self._inflight.get(name)
+        if fut is not None and not fut.done():
+            self.counters["coalesced"] += 1
+            return asyncio.wrap_future(fut)
+        with self._lock:
+            fut = self._inflight.get(name)
+            if fut is None or fut.done():
+                fut = _EXECUTOR.submit(self._refresh_sync, name)
+                self._inflight[name] = fut
+            else:
+                self.counters["coalesced"] += 1
+        return asyncio.wrap_future(fut)
+
+    def _refresh_sync(self, name: str) -> list[str]:
+        # the per-name lock makes a sync get() and a background refresh share one fetch
+        with self._lock:
+            lock = self._name_locks.setdefault(name, threading.Lock())
+            started = time.time()
+        with lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[1] >= started:
+                self.counters["coalesced"] += 1
+                return list(entry[2])  # another caller refreshed while we waited
+            self.counters["refreshes"] += 1
+            try:
+                models = list(self.fetch(name) or [])
+                if not models:
+                    raise RuntimeError("empty model list")
+            except Exception as e:
+                self.counters["errors"] += 1
+                logging.warning(f"Model list for {name} failed: {e}")
+                models = list(entry[2]) if entry is not None else list(self.fallback.get(name, []))
+                with self._lock:
+                    self._entries[name] = (time.time() + self.error_ttl, entry[1] if entry else 0.0, models)
+                return models
+            now = time.time()
+            with self._lock:
+                self._entries[name] = (now + self.ttl, now, models)
+        self._save()
+        return models
+
+    def invalidate(self, name: str | None = None) -> None:
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self) -> dict:
+        now = time.time()
+        out: dict = dict(self.counters)
+        out["providers"] = {
+            name: {"models": len(e[2]), "fresh": e[0] > now, "age_s": round(now - e[1], 1) if e[1] else None}
+            for name, e in list(self._entries.items())
+        }
+        out["refreshing"] = sorted(n for n, f in list(self._inflight.items()) if not f.done())
+        return out
+
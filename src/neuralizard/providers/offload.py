@@ -0,0 +1,169 @@
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable
+from ..config import settings
+
+_DONE = object()
+
+
+class SyncStreamOffloader:
+    """
+    Runs blocking provider generators on a bounded thread pool.
+    Tokens travel back to the event loop through a bounded asyncio.Queue, so a
+    slow consumer blocks the worker thread (backpressure) instead of buffering
+    the whole answer. A per-provider semaphore caps how many workers one
+    provider may hold.
+    """
+
+    def __init__(self, max_workers: int, queue_size: int, per_provider_limit: int):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.per_provider_limit = per_provider_limit
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider-offload")
+        self._limits: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+        self._active: dict[str, int] = {}
+        self._waiting: dict[str, int] = {}
+        self._queues: set[asyncio.Queue] = set()
+        self._stopping = threading.Event()
+
+    async def _acquire(self, name: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        entry = self._limits.get(name)
+        # Semaphores bind to a loop; rebuild if the server restarted its loop
+        if entry is None or entry[0] is not loop:
+            entry = self._limits[name] = (loop, asyncio.Semaphore(self.per_provider_limit))
+        sem = entry[1]
+        self._waiting[name] = self._waiting.get(name, 0) + 1
+        try:
+            await sem.acquire()
+        finally:
+            self._waiting[name] -= 1
+        self._active[name] = self._active.get(name, 0) + 1
+        return sem
+
+    def _release_after(self, name: str, sem: asyncio.Semaphore, job: concurrent.futures.Future | None) -> None:
+        """
+        Give the provider's slot back once `job` has finished on its thread.
+        A caller that stops waiting (cancelled, or a stream abandoned midway)
+        does not stop the thread, so releasing on the caller's exit would let
+        more workers than the cap read from the provider at once.
+        """
+        loop = asyncio.get_running_loop()
+
+        def release():
+            self._active[name] -= 1
+            sem.release()
+
+        if job is None or job.done():
+            release()
+            return
+
+        def on_done(_):
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                pass  # loop closed; its semaphore is rebuilt by the next loop
+
+        job.add_done_callback(on_done)
+
+    async def run(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run a blocking call on the pool under the provider's concurrency cap."""
+        sem = await self._acquire(name)
+        job = None
+        try:
+            job = self.executor.submit(fn)
+            return await asyncio.wrap_future(job)
+        finally:
+            self._release_after(name, sem, job)
+
+    async def stream(self, name: str, make_iter: Callable[[], Any]) -> AsyncIterator[Any]:
+        """Iterate `make_iter()` on a worker thread and yield its items on the loop."""
+        loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            fut = asyncio.run_coroutine_threadsafe(q.put(item), loop)
+            # Wake up periodically so an abandoned stream cannot pin the worker
+            while not (stop.is_set() or self._stopping.is_set()):
+                try:
+                    fut.result(timeout=0.25)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    continue
+            fut.cancel()
+            return False
+
+        def work():
+            it = make_iter()
+            try:
+                for item in it:
+                    if not put(item):
+                        return
+                put(_DONE)
+            except BaseException as e:
+                put(e)
+            finally:
+                close = getattr(it, "close", None)
+                if callable(close):
+                    close()
+
+        sem = await self._acquire(name)
+        job = None
+        self._queues.add(q)
+        try:
+            job = self.executor.submit(work)
+            while True:
+                item = await q.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+            await asyncio.wrap_future(job)
+        finally:
+            stop.set()
+            self._queues.discard(q)
+            # the worker may still be inside the provider's iterator; it holds the slot until it returns
+            self._release_after(name, sem, job)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "per_provider_limit": self.per_provider_limit,
+            "queue_size": self.queue_size,
+            "active": {k: v for k, v in self._active.items() if v},
+            "waiting": {k: v for k, v in self._waiting.items() if v},
+            "queued_tokens": sum(q.qsize() for q in list(self._queues)),
+        }
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_OFFLOADER: SyncStreamOffloader | None = None
+_OFFLOADER_LOCK = threading.Lock()
+
+
+def get_offloader() -> SyncStreamOffloader:
+    global _OFFLOADER
+    if _OFFLOADER is None:
+        with _OFFLOADER_LOCK:
+            if _OFFLOADER is None:
+                _OFFLOADER = SyncStreamOffloader(
+                    max_workers=settings.offload_max_workers,
+                    queue_size=settings.offload_queue_size,
+                    per_provider_limit=settings.offload_per_provider_limit,
+                )
+    return _OFFLOADER
+
+
+def shutdown_offloader() -> None:
+    global _OFFLOADER
+    with _OFFLOADER_LOCK:
+        if _OFFLOADER is not None:
+            _OFFLOADER.shutdown()
+            _OFFLOADER = None
@@ -0,0 +1,192 @@
+import os
+import time
+from typing import Any, AsyncIterator, Iterable, Iterator
+import httpx
+from .base import ChatDelta, LLMResult, Prompt, to_messages
+from ._usage import parse_usage
+from .base_streaming import StreamingProviderMixin, AsyncStreamingProviderMixin, parse_chat_frame
+from .sse import SSEDecoder, SSEEvent
+from ._http import httpx_client, httpx_async_client
+
+# identity: iter_raw() then yields the event stream exactly as the server wrote it
+_STREAM_HEADERS = {"Accept": "text/event-stream", "Accept-Encoding": "identity"}
+
+
+def _deltas(events: list[SSEEvent]) -> tuple[list[ChatDelta], bool]:
+    out: list[ChatDelta] = []
+    for ev in events:
+        if ev.data == "[DONE]":
+            return out, True
+        delta = parse_chat_frame(ev)
+        if delta is not None:
+            out.append(delta)
+    return out, False
+
+
+def iter_chat_deltas(chunks: Iterable[bytes]) -> Iterator[ChatDelta]:
+    """Decode a raw chat-completions SSE body into ChatDelta events, up to '[DONE]'."""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        deltas, done = _deltas(decoder.feed(chunk))
+        yield from deltas
+        if done:
+            return
+    yield from _deltas(decoder.flush())[0]
+
+
+async def aiter_chat_deltas(chunks: AsyncIterator[bytes]) -> AsyncIterator[ChatDelta]:
+    """Async twin of iter_chat_deltas()."""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        deltas, done = _deltas(decoder.feed(chunk))
+        for delta in deltas:
+            yield delta
+        if done:
+            return
+    for delta in _deltas(decoder.flush())[0]:
+        yield delta
+
+
+class OpenAICompatProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
+    """
+    Provider for any OpenAI-compatible chat-completions endpoint.
+
+    Streams read the raw response body, decode SSE once and yield typed
+    ChatDelta events (content, finish reason, usage) to the streaming mixin.
+    Requests go out on the shared connection pool (HTTP/2 when available,
+    see transport.py). Hosted APIs subclass this and only set class
+    attributes; anything else (a local vLLM or llama.cpp server, ...) is
+    configured in settings.openai_compatible with the same field names.
+    """
+    name = "openai_compatible"
+    base_url = ""
+    chat_path = "/v1/chat/completions"
+    models_path = "/v1/models"
+    default_model = ""
+    api_key_env: str | None = None
+    api_key_required = True
+    default_system: str | None = None
+    default_temperature: float | None = None
+    # ask for the final usage frame (stream_options.include_usage)
+    stream_usage = True
+
+    _CONFIG_FIELDS = (
+        "name", "base_url", "chat_path", "models_path", "default_model", "api_key_env",
+        "api_key_required", "default_system", "default_temperature", "stream_usage",
+    )
+
+    def __init__(self, api_key: str | None = None, default_model: str | None = None,
+                 timeout: float | None = None, headers: dict[str, str] | None = None, **config: Any):
+        unknown = set(config) - set(self._CONFIG_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown OpenAI-compatible provider fields: {', '.join(sorted(unknown))}")
+        for field, value in config.items():
+            setattr(self, field, value)
+        if not self.base_url:
+            raise ValueError(f"{self.name}: base_url is required")
+        if default_model:
+            self.default_model = default_model
+        self.api_key = api_key or (os.getenv(self.api_key_env) if self.api_key_env else None)
+        if self.api_key_required and not self.api_key:
+            env = self.api_key_env or f"an API key for {self.name}"
+            raise RuntimeError(f"{env} not found (set env or add to ~/.neuralizard/.env)")
+        headers = dict(headers or {})
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        client_kwargs = {"base_url": self.base_url, "headers": headers}
+        if timeout is not None:
+            client_kwargs["timeout"] = timeout
+        self._client = httpx_client(**client_kwargs)
+        self._aclient = httpx_async_client(**client_kwargs)
+
+    def _payload(self, prompt: Prompt, model: str | None, stream: bool = False, system: str | None = None,
+                 temperature: float | None = None, **kwargs: Any) -> dict:
+        messages = to_messages(prompt, system)
+        if self.default_system and not any(m["role"] == "system" for m in messages):
+            messages.insert(0, {"role": "system", "content": self.default_system})
+        payload: dict = {"model": model or self.default_model, "messages": messages}
+        if temperature is None:
+            temperature = self.default_temperature
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if stream:
+            payload["stream"] = True
+            if self.stream_usage:
+                payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _to_result(self, resp: httpx.Response, model: str, t0: float) -> LLMResult:
+        resp.raise_for_status()  # HTTPStatusError carries the status the retry policy looks at
+        data = resp.json()
+        try:
+            text = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            text = ""
+        usage = parse_usage(data.get("usage") or {})
+        return LLMResult(
+            text=(text or "").strip(),
+            provider=self.name,
+            model=model,
+            prompt_tokens=usage.prompt_tokens,
+            response_tokens=usage.response_tokens,
+            latency_ms=int((time.time() - t0) * 1000),
+            cached_tokens=usage.cached_tokens,
+        )
+
+    # ------------- Non-streaming -------------
+    def complete(self, prompt: Prompt, model: str | None = None, **kwargs) -> LLMResult:
+        payload = self._payload(prompt, model, **kwargs)
+        t0 = time.time()
+        resp = self._client.post(self.chat_path, json=payload)
+        return self._to_result(resp, payload["model"], t0)
+
+    async def acomplete(self, prompt: Prompt, model: str | None = None, **kwargs) -> LLMResult:
+        payload = self._payload(prompt, model, **kwargs)
+        t0 = time.time()
+        resp = await self._aclient.post(self.chat_path, json=payload)
+        return self._to_result(resp, payload["model"], t0)
+
+    # ------------- Streaming (SSE) -------------
+    def _stream_request(self, prompt: Prompt, model: str | None = None, **kwargs) -> Iterator[ChatDelta]:
+        payload = self._payload(prompt, model, stream=True, **kwargs)
+        with self._client.stream("POST", self.chat_path, json=payload, headers=_STREAM_HEADERS) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                resp.raise_for_status()  # retried by the mixin when transient
+            yield from iter_chat_deltas(resp.iter_raw())
+
+    async def _astream_request(self, prompt: Prompt, model: str | None = None, **kwargs) -> AsyncIterator[ChatDelta]:
+        payload = self._payload(prompt, model, stream=True, **kwargs)
+        async with self._aclient.stream("POST", self.chat_path, json=payload, headers=_STREAM_HEADERS) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                resp.raise_for_status()
+            async for delta in aiter_chat_deltas(resp.aiter_raw()):
+                yield delta
+
+    # ------------- Models -------------
+    def _model_ids(self) -> list[str]:
+        resp = self._client.get(self.models_path, headers={"Accept": "application/json"})
+        resp.raise_for_status()
+        items = (resp.json() or {}).get("data") or []
+        return sorted({it["id"] for it in items if isinstance(it, dict) and isinstance(it.get("id"), str) and it["id"]})
+
+    def list_models(self) -> list[str]:
+        """Model ids from the endpoint's /models listing (plus the default); [default_model] on error."""
+        try:
+            names = self._model_ids()
+        except Exception:
+            return [self.default_model] if self.default_model else []
+        return sorted(set(names) | ({self.default_model} if self.default_model else set()))
+
+    def close(self):
+        try:
+            self._client.close()
+        except Exception:
+            pass
+
+    async def aclose(self):
+        try:
+            await self._aclient.aclose()
+        except Exception:
+            pass
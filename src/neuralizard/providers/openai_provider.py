@@ -1,19 +1,20 @@
 import os
 import time
 import re
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import time, logging
-from .base import LLMResult
-from .base_streaming import StreamingProviderMixin
+from .base import LLMResult, Prompt, StreamError, Usage, to_messages
+from .base_streaming import StreamingProviderMixin, AsyncStreamingProviderMixin
 from typing import Any
-from ._usage import usage_get
+from ._usage import parse_usage
+from ._http import httpx_client, httpx_async_client
 
 
-class OpenAIProvider(StreamingProviderMixin):
+class OpenAIProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
     """
     OpenAI provider (simple).
-    - complete(): non‑streaming
-    - stream(): provided by StreamingProviderMixin, uses _stream_request()
+    - complete() / acomplete(): non‑streaming
+    - stream() / astream(): provided by the streaming mixins, use _stream_request() / _astream_request()
     """
     name = "openai"
 
@@ -21,38 +22,81 @@ class OpenAIProvider(StreamingProviderMixin):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY not found (set env or add to ~/.neuralizard/.env)")
-        self.client = OpenAI(api_key=self.api_key)
+        # retries are handled by neuralizard.providers.retry for every provider
+        self.client = OpenAI(api_key=self.api_key, http_client=httpx_client(), max_retries=0)
+        self.aclient = AsyncOpenAI(api_key=self.api_key, http_client=httpx_async_client(), max_retries=0)
         self.default_model = default_model or "gpt-4"
 
+    def _to_result(self, resp, chosen_model: str, t0: float) -> LLMResult:
+        usage = parse_usage(getattr(resp, "usage", None))
+
+        msg = resp.choices[0].message.content
+
+        return LLMResult(
+            text=msg.strip(),
+            provider=self.name,
+            model=chosen_model,
+            prompt_tokens=usage.prompt_tokens,
+            response_tokens=usage.response_tokens,
+            latency_ms=int((time.time() - t0) * 1000),
+            # prompts >= 1024 tokens are cached automatically; hits show up here
+            cached_tokens=usage.cached_tokens,
+        )
+
+    @staticmethod
+    def _final_usage(final) -> Usage | None:
+        usage = getattr(final, "usage", None)
+        return parse_usage(usage) if usage else None
+
     # ---------------- Non‑streaming ----------------
-    def complete(self, prompt: str, model: str | None = None, temperature: float | None = None):
+    def complete(self, prompt: Prompt, model: str | None = None, temperature: float | None = None,
+                 system: str | None = None):
         chosen_model = model or self.default_model
 
         t0 = time.time()
         try:
             resp = self.client.chat.completions.create(
                 model=chosen_model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=to_messages(prompt, system),
             )
         except Exception as e:
             raise RuntimeError(f"OpenAI API error: {e}")
 
-        usage = getattr(resp, "usage", None)
+        return self._to_result(resp, chosen_model, t0)
 
-        msg = resp.choices[0].message.content
+    async def acomplete(self, prompt: Prompt, model: str | None = None, temperature: float | None = None,
+                        system: str | None = None):
+        chosen_model = model or self.default_model
 
-        return LLMResult(
-            text=msg.strip(),
-            provider=self.name,
-            model=chosen_model,
-            # FIX: safe accessor for typed usage objects
-            prompt_tokens=usage_get(usage, "prompt_tokens", 0),
-            response_tokens=usage_get(usage, "completion_tokens", usage_get(usage, "response_tokens", 0)),
-            latency_ms=int((time.time() - t0) * 1000),
-        )
+        t0 = time.time()
+        try:
+            resp = await self.aclient.chat.completions.create(
+                model=chosen_model,
+                messages=to_messages(prompt, system),
+            )
+        except Exception as e:
+            raise RuntimeError(f"OpenAI API error: {e}")
+
+        return self._to_result(resp, chosen_model, t0)
 
     # ---------------- Streaming (used by mixin) ----------------
-    def _stream_request(self, prompt: str, model: str | None = None, **kwargs):
+    @staticmethod
+    def _event_text(event, debug: bool = False) -> tuple[str | None, bool]:
+        """Map one stream event to (text to yield, stop)."""
+        etype = getattr(event, "type", None)
+        if etype == "content.delta":
+            return getattr(event, "delta", "") or None, False
+        if etype in ("content.done", "message.completed"):
+            return None, True
+        if etype in ("error", "response.error"):
+            err = getattr(event, "error", None)
+            return StreamError(f"[ERROR: {err}]"), True
+        if debug:
+            # Minimal debug (only if requested)
+            return f"[DEBUG {etype}]", False
+        return None, False
+
+    def _stream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
         """
         Yield plain text chunks. Observed event types:
           - content.delta  (event.delta -> str piece)
@@ -63,28 +107,47 @@ class OpenAIProvider(StreamingProviderMixin):
 
         logging.warning(f"OpenAIProvider._stream_request() using model: {chosen_model}")
 
-        try:
-            with self.client.chat.completions.stream(
-                model=chosen_model,
-                messages=[{"role": "user", "content": prompt}],
-            ) as stream:
-                for event in stream:
-                    etype = getattr(event, "type", None)
-                    if etype == "content.delta":
-                        delta = getattr(event, "delta", "")
-                        if delta:
-                            yield delta
-                    elif etype in ("content.done", "message.completed"):
-                        break
-                    elif etype in ("error", "response.error"):
-                        err = getattr(event, "error", None)
-                        yield f"[ERROR: {err}]"
-                        break
-                    elif debug:
-                        # Minimal debug (only if requested)
-                        yield f"[DEBUG {etype}]"
-        except Exception as e:
-            yield f"[Streaming error: {e}]"
+        with self.client.chat.completions.stream(
+            model=chosen_model,
+            messages=to_messages(prompt, system),
+            stream_options={"include_usage": True},
+        ) as stream:
+            for event in stream:
+                text, stop = self._event_text(event, debug)
+                if text:
+                    yield text
+                if stop:
+                    break
+            try:
+                # drains the trailing usage chunk
+                usage = self._final_usage(stream.get_final_completion())
+            except Exception:
+                usage = None
+        if usage:
+            yield usage
+
+    async def _astream_request(self, prompt: Prompt, model: str | None = None, system: str | None = None, **kwargs):
+        """Async twin of _stream_request() on AsyncOpenAI."""
+        chosen_model = model or self.default_model
+        debug = kwargs.get("debug", False)
+
+        async with self.aclient.chat.completions.stream(
+            model=chosen_model,
+            messages=to_messages(prompt, system),
+            stream_options={"include_usage": True},
+        ) as stream:
+            async for event in stream:
+                text, stop = self._event_text(event, debug)
+                if text:
+                    yield text
+                if stop:
+                    break
+            try:
+                usage = self._final_usage(await stream.get_final_completion())
+            except Exception:
+                usage = None
+        if usage:
+            yield usage
 
     def list_models(self) -> list[str]:
         try:
@@ -124,4 +187,16 @@ class OpenAIProvider(StreamingProviderMixin):
             unique_ordered = list(dict.fromkeys(ordered))
             return unique_ordered[:25]
         except Exception as e:
-            raise RuntimeError(f"OpenAI list models error: {e}")
\ No newline at end of file
+            raise RuntimeError(f"OpenAI list models error: {e}")
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+    async def aclose(self):
+        try:
+            await self.aclient.close()
+        except Exception:
+            pass
@@ -1,14 +1,27 @@
 import os
-from typing import Any, Generator, Optional
-from perplexity import Perplexity
-from .base_streaming import StreamingProviderMixin
+from typing import Any, AsyncGenerator, Generator, Optional
+from perplexity import Perplexity, AsyncPerplexity
+from .base import Prompt, to_messages
+from .base_streaming import StreamingProviderMixin, AsyncStreamingProviderMixin
+from ._http import httpx_client, httpx_async_client
 
 
-class PerplexityProvider(StreamingProviderMixin):
+# return a result with attributes .text/.model/.provider
+class SimpleResult:
+    def __init__(self, text: str, model: str, usage: Any = None, raw: Any = None):
+        self.text = text
+        self.model = model
+        self.provider = "perplexity"
+        self.usage = usage or {}
+        self.raw = raw
+
+
+class PerplexityProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
     """
     Perplexity via official SDK (OpenAI-compatible).
     Uses PERPLEXITY_API_KEY from env by default.
     """
+    name = "perplexity"
 
     ALLOWED_MODELS = {
         "sonar-small-online",
@@ -24,18 +37,47 @@ class PerplexityProvider(StreamingProviderMixin):
         self.default_model = (default_model or "sonar-pro")
         self.timeout = timeout
         # SDK uses env if api_key=None
-        self.client = Perplexity(api_key=self.api_key) if self.api_key else Perplexity()
+        http_client = httpx_client(timeout=timeout)
+        # retries are handled by neuralizard.providers.retry for every provider
+        self.client = (
+            Perplexity(api_key=self.api_key, http_client=http_client, max_retries=0)
+            if self.api_key
+            else Perplexity(http_client=http_client, max_retries=0)
+        )
+        ahttp_client = httpx_async_client(timeout=timeout)
+        self.aclient = (
+            AsyncPerplexity(api_key=self.api_key, http_client=ahttp_client, max_retries=0)
+            if self.api_key
+            else AsyncPerplexity(http_client=ahttp_client, max_retries=0)
+        )
 
     def _normalize_model(self, model: Optional[str]) -> str:
         m = (model or self.default_model or "").strip()
         return m if m in self.ALLOWED_MODELS else self.default_model
 
+    @staticmethod
+    def _chunk_token(chunk) -> str:
+        # SDK yields chunk objects; extract delta content
+        try:
+            choice0 = (chunk.choices or [None])[0]
+            delta = getattr(choice0, "delta", None)
+            if delta is not None:
+                return getattr(delta, "content", None) or getattr(delta, "text", None) or ""
+            # some SDK versions expose chunk.choices[0].message.content
+            msg = getattr(choice0, "message", None)
+            if msg is not None:
+                return getattr(msg, "content", "") or ""
+        except Exception:
+            pass
+        return ""
+
     def _stream_request(
         self,
-        prompt: str,
+        prompt: Prompt,
         model: Optional[str] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
         **kwargs: Any,
     ) -> Generator[str, None, None]:
         chosen_model = self._normalize_model(model)
@@ -43,70 +85,106 @@ class PerplexityProvider(StreamingProviderMixin):
 
         stream = self.client.chat.completions.create(
             model=chosen_model,
-            messages=[{"role": "user", "content": prompt}],
+            messages=to_messages(prompt, system),
             temperature=T,
             max_tokens=max_tokens,
             stream=True,
         )
 
-        # SDK yields chunk objects; extract delta content
         try:
             for chunk in stream:
-                try:
-                    choice0 = (chunk.choices or [None])[0]
-                    delta = getattr(choice0, "delta", None)
-                    token = ""
-                    if delta is not None:
-                        token = getattr(delta, "content", None) or getattr(delta, "text", None) or ""
-                    else:
-                        # some SDK versions expose chunk.choices[0].message.content
-                        msg = getattr(choice0, "message", None)
-                        if msg is not None:
-                            token = getattr(msg, "content", "") or ""
-                    if token:
-                        yield token
-                except Exception:
-                    continue
-        except Exception as e:
-            yield f"data: {{\"error\":\"{e}\"}}"
+                token = self._chunk_token(chunk)
+                if token:
+                    yield token
+        finally:
+            # release the HTTP connection when the consumer stops early
+            stream.close()
+
+    async def _astream_request(
+        self,
+        prompt: Prompt,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
+        **kwargs: Any,
+    ) -> AsyncGenerator[str, None]:
+        chosen_model = self._normalize_model(model)
+        T = None if temperature is None else max(0.0, min(2.0, float(temperature)))
+
+        stream = await self.aclient.chat.completions.create(
+            model=chosen_model,
+            messages=to_messages(prompt, system),
+            temperature=T,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+
+        try:
+            async for chunk in stream:
+                token = self._chunk_token(chunk)
+                if token:
+                    yield token
+        finally:
+            await stream.close()
+
+    @staticmethod
+    def _to_result(completion, chosen_model: str) -> "SimpleResult":
+        choice0 = (completion.choices or [None])[0]
+        msg = getattr(choice0, "message", None)
+        text = (getattr(msg, "content", None) or getattr(choice0, "text", None) or "") or ""
+        return SimpleResult(
+            text=text,
+            model=getattr(completion, "model", chosen_model),
+            usage=getattr(completion, "usage", {}) or {},
+            raw=completion,
+        )
 
     def complete(
         self,
-        prompt: str,
+        prompt: Prompt,
         model: Optional[str] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = 1024,
+        system: Optional[str] = None,
         **kwargs: Any,
     ):
-        # return a result with attributes .text/.model/.provider
-        class SimpleResult:
-            def __init__(self, text: str, model: str, usage: Any = None, raw: Any = None):
-                self.text = text
-                self.model = model
-                self.provider = "perplexity"
-                self.usage = usage or {}
-                self.raw = raw
-
         chosen_model = self._normalize_model(model)
         T = None if temperature is None else max(0.0, min(2.0, float(temperature)))
 
         try:
             completion = self.client.chat.completions.create(
                 model=chosen_model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=to_messages(prompt, system),
                 temperature=T,
                 max_tokens=max_tokens,
                 stream=False,
             )
-            choice0 = (completion.choices or [None])[0]
-            msg = getattr(choice0, "message", None)
-            text = (getattr(msg, "content", None) or getattr(choice0, "text", None) or "") or ""
-            return SimpleResult(
-                text=text,
-                model=getattr(completion, "model", chosen_model),
-                usage=getattr(completion, "usage", {}) or {},
-                raw=completion,
+            return self._to_result(completion, chosen_model)
+        except Exception as e:
+            return SimpleResult(text="", model=chosen_model, usage={}, raw={"error": str(e)})
+
+    async def acomplete(
+        self,
+        prompt: Prompt,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = 1024,
+        system: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        chosen_model = self._normalize_model(model)
+        T = None if temperature is None else max(0.0, min(2.0, float(temperature)))
+
+        try:
+            completion = await self.aclient.chat.completions.create(
+                model=chosen_model,
+                messages=to_messages(prompt, system),
+                temperature=T,
+                max_tokens=max_tokens,
+                stream=False,
             )
+            return self._to_result(completion, chosen_model)
         except Exception as e:
             return SimpleResult(text="", model=chosen_model, usage={}, raw={"error": str(e)})
 
@@ -128,4 +206,16 @@ class PerplexityProvider(StreamingProviderMixin):
                 names.append(self.default_model)
             return sorted({n for n in names if isinstance(n, str) and n})
         except Exception:
-            return [self.default_model] if getattr(self, "default_model", None) else []
\ No newline at end of file
+            return [self.default_model] if getattr(self, "default_model", None) else []
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+    async def aclose(self):
+        try:
+            await self.aclient.close()
+        except Exception:
+            pass
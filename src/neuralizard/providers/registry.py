@@ -0,0 +1,64 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+from .base import Provider
+
+RegistryKey = Tuple[str, str | None, Tuple[Tuple[str, Hashable], ...]]
+
+
+class ProviderRegistry:
+    """
+    Process-wide cache of provider instances.
+    One instance is built per (name, api key, options) and reused, so the
+    SDK clients it owns (and their state) are shared across requests.
+    """
+
+    def __init__(self):
+        self._instances: Dict[RegistryKey, Provider] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(name: str, api_key: str | None, options: dict[str, Any]) -> RegistryKey:
+        return (name, api_key, tuple(sorted(options.items())))
+
+    def get(self, name: str, api_key: str | None, factory: Callable[[], Provider], **options: Any) -> Provider:
+        key = self.make_key(name, api_key, options)
+        prov = self._instances.get(key)
+        if prov is not None:
+            return prov
+        with self._lock:
+            prov = self._instances.get(key)
+            if prov is None:
+                # Construction errors (e.g. missing key) propagate and are not cached
+                prov = factory()
+                self._instances[key] = prov
+            return prov
+
+    def close(self) -> None:
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+        for prov in instances:
+            closer = getattr(prov, "close", None)
+            if callable(closer):
+                try:
+                    closer()
+                except Exception as e:
+                    logging.warning(f"Closing provider {getattr(prov, 'name', prov)} failed: {e}")
+
+    async def aclose(self) -> None:
+        """Close async clients first (they need the running loop), then the sync pools."""
+        for prov in list(self._instances.values()):
+            acloser = getattr(prov, "aclose", None)
+            if callable(acloser):
+                try:
+                    await acloser()
+                except Exception as e:
+                    logging.warning(f"Closing async client of {getattr(prov, 'name', prov)} failed: {e}")
+        self.close()
+
+    def stats(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for name, _key, _opts in list(self._instances):
+            counts[name] = counts.get(name, 0) + 1
+        return counts
@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, fields
+from typing import Any, Protocol
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, create_engine, delete, insert, select
+from ..config import settings
+from .base import LLMResult, Prompt, to_messages
+from .base_streaming import _provider_name, acomplete
+
+_RESULT_FIELDS = {f.name for f in fields(LLMResult)}
+
+
+class CacheTier(Protocol):
+    """One storage tier of the response cache; values are JSON-able dicts."""
+    def get(self, key: str) -> dict | None: ...
+    def set(self, key: str, value: dict, ttl: float) -> None: ...
+    def clear(self) -> None: ...
+
+
+class MemoryTier:
+    """In-process LRU with per-entry TTL, bounded by entry count and payload bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _pop(self, key: str) -> None:
+        _expires, size, _value = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._data), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class SQLTier:
+    """
+    Shared tier in a `response_cache` table (SQLite or Postgres), so several
+    workers or batch processes see each other's answers. Expired rows are
+    ignored on read and removed by purge().
+    """
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url, future=True, pool_pre_ping=True)
+        self.table = Table(
+            "response_cache", MetaData(),
+            Column("key", String(64), primary_key=True),
+            Column("value", Text, nullable=False),
+            Column("expires_at", Float, nullable=False, index=True),
+        )
+        self.table.create(self.engine, checkfirst=True)
+
+    def get(self, key: str) -> dict | None:
+        t = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(select(t.c.value, t.c.expires_at).where(t.c.key == key)).first()
+        if row is None or row.expires_at <= time.time():
+            return None
+        return json.loads(row.value)
+
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        t = self.table
+        with self.engine.begin() as conn:
+            conn.execute(delete(t).where(t.c.key == key))
+            conn.execute(insert(t).values(key=key, value=json.dumps(value), expires_at=time.time() + ttl))
+
+    def clear(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+    def purge(self) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at <= time.time())).rowcount
+
+
+class ResponseCache:
+    """
+    Exact-match cache for non-streaming completions, keyed by a hash of the
+    normalized request. Lookups go memory -> shared tier (promoting hits into
+    memory); stores write both. Sampling requests (temperature > 0 or the
+    provider default) bypass the cache unless the caller asks for it.
+    """
+
+    def __init__(self, memory: CacheTier, shared: CacheTier | None = None, ttl: float = 3600.0):
+        self.memory = memory
+        self.shared = shared
+        self.ttl = ttl
+        self.counters = {"hits": 0, "misses": 0, "memory_hits": 0, "shared_hits": 0, "bypassed": 0, "stores": 0, "errors": 0}
+        # the process-wide cache is shared by every thread (and event loop) that uses it
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider: str, model: str | None, prompt: Prompt, temperature: float | None,
+                 system: str | None = None, **params: Any) -> str:
+        request = {
+            "provider": (provider or "").lower(),
+            "model": model or "",
+            "temperature": None if temperature is None else float(temperature),
+            "messages": [
+                {"role": m["role"], "content": m["content"].strip()}
+                for m in to_messages(prompt, system)
+            ],
+            "params": {k: v for k, v in sorted(params.items()) if v is not None},
+        }
+        raw = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def cacheable(temperature: float | None, requested: bool | None) -> bool:
+        if requested is not None:
+            return requested
+        return temperature is not None and float(temperature) <= 0
+
+    async def get(self, key: str) -> LLMResult | None:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+        elif self.shared is not None:
+            value = await self._shared("get", key)
+            if value is not None:
+                self._count("shared_hits")
+                self.memory.set(key, value, self.ttl)
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return LLMResult(**{k: v for k, v in value.items() if k in _RESULT_FIELDS})
+
+    async def set(self, key: str, result: Any) -> None:
+        text = getattr(result, "text", None)
+        if not text:
+            return  # never cache empty / failed answers
+        if isinstance(result, LLMResult):
+            value = asdict(result)
+        else:
+            value = {k: getattr(result, k) for k in _RESULT_FIELDS if isinstance(getattr(result, k, None), (str, int))}
+        self.memory.set(key, value, self.ttl)
+        if self.shared is not None:
+            await self._shared("set", key, value, self.ttl)
+        self._count("stores")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    async def _shared(self, op: str, *args):
+        # the shared tier is best-effort: a DB hiccup degrades to memory-only
+        try:
+            return await asyncio.to_thread(getattr(self.shared, op), *args)
+        except Exception as e:
+            self._count("errors")
+            logging.warning(f"Response cache shared tier {op} failed: {e}")
+            return None
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            out: dict[str, Any] = dict(self.counters)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        out["shared_tier"] = self.shared is not None
+        if isinstance(self.memory, MemoryTier):
+            out.update(self.memory.stats())
+        return out
+
+
+_CACHE: ResponseCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                shared = None
+                if settings.response_cache_url:
+                    try:
+                        shared = SQLTier(settings.response_cache_url)
+                    except Exception as e:
+                        logging.warning(f"Response cache shared tier disabled: {e}")
+                _CACHE = ResponseCache(
+                    MemoryTier(settings.response_cache_max_entries, settings.response_cache_max_bytes),
+                    shared,
+                    ttl=settings.response_cache_ttl,
+                )
+    return _CACHE
+
+
+def set_response_cache(cache: ResponseCache | None) -> None:
+    """Swap in a custom cache (or None to rebuild the default from settings on next use)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
+
+
+async def acomplete_cached(prov, prompt: Prompt, model: str | None = None, *,
+                           cache: bool | None = None, **kwargs):
+    """
+    acomplete() behind the response cache. `cache=None` caches only
+    deterministic requests (temperature <= 0); True/False force it on/off.
+    """
+    rc = get_response_cache()
+    temperature = kwargs.get("temperature")
+    if not settings.response_cache_enabled or not rc.cacheable(temperature, cache):
+        rc._count("bypassed")
+        return await acomplete(prov, prompt, model=model, **kwargs)
+
+    params = {k: v for k, v in kwargs.items() if k not in ("temperature", "system")}
+    key = rc.make_key(_provider_name(prov), model, prompt, temperature, kwargs.get("system"), **params)
+    hit = await rc.get(key)
+    if hit is not None:
+        return hit
+    result = await acomplete(prov, prompt, model=model, **kwargs)
+    await rc.set(key, result)
+    return result
@@ -0,0 +1,286 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterator, TypeVar
+import httpx
+import requests
+from ..config import settings
+from .governor import _duration
+
+T = TypeVar("T")
+
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, requests.exceptions.ConnectionError)
+_READ_ERRORS = (
+    httpx.ReadError, httpx.ReadTimeout, httpx.WriteError, httpx.RemoteProtocolError,
+    requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+)
+
+
+def _chain(exc: BaseException) -> Iterator[BaseException]:
+    """The exception and its causes (SDKs wrap the transport error they hit)."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def _status(exc: BaseException) -> int | None:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter. Connection failures (nothing
+    reached the server) and read failures (timeouts, dropped connections,
+    retryable HTTP statuses such as 429/5xx) draw on separate budgets; a
+    server-sent Retry-After is honoured up to `max_retry_after` seconds.
+    """
+    connect_retries: int = 3
+    read_retries: int = 2
+    base_delay: float = 0.25
+    max_delay: float = 8.0
+    max_retry_after: float = 30.0
+    retry_statuses: frozenset[int] = field(default=frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529}))
+
+    def classify(self, exc: BaseException) -> str | None:
+        """'connect', 'read' or None (not worth retrying)."""
+        for e in _chain(exc):
+            status = _status(e)
+            if status is not None:
+                return "read" if status in self.retry_statuses else None
+            if isinstance(e, _CONNECT_ERRORS):
+                return "connect"
+            if isinstance(e, _READ_ERRORS):
+                return "read"
+            # SDK wrappers (APIConnectionError, APITimeoutError, ...) by name
+            name = type(e).__name__
+            if "Connect" in name:
+                return "connect"
+            if "Timeout" in name:
+                return "read"
+        return None
+
+    def retry_after(self, exc: BaseException) -> float | None:
+        for e in _chain(exc):
+            headers = getattr(getattr(e, "response", None), "headers", None)
+            if not headers:
+                continue
+            ms = headers.get("retry-after-ms")
+            if ms:
+                try:
+                    return float(ms) / 1000.0
+                except ValueError:
+                    pass
+            value = _duration(headers.get("retry-after"))
+            if value is not None:
+                return value
+        return None
+
+    def backoff(self, retry: int, exc: BaseException) -> float | None:
+        """Seconds to sleep before retry number `retry` (1-based), or None to give up."""
+        hinted = self.retry_after(exc)
+        if hinted is not None and hinted > self.max_retry_after:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+        return max(delay, hinted or 0.0)
+
+
+class RetryStats:
+    """Per-provider attempt counters and the extra latency retries added; keeps recent retried calls."""
+
+    def __init__(self, recent: int = 20):
+        self._providers: dict[str, dict] = {}
+        self._recent: dict[str, deque] = {}
+        self.recent = recent
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, attempts: list[dict], ok: bool) -> None:
+        with self._lock:
+            s = self._providers.setdefault(provider, {
+                "calls": 0, "retried": 0, "attempts": 0, "exhausted": 0,
+                "connect_failures": 0, "read_failures": 0, "retry_added_ms": 0.0,
+            })
+            s["calls"] += 1
+            s["attempts"] += len(attempts)
+            s["exhausted"] += not ok
+            for a in attempts:
+                if a.get("kind"):
+                    s[f"{a['kind']}_failures"] += 1
+            if len(attempts) > 1:
+                s["retried"] += 1
+                # everything before the final attempt is tail latency the retries added
+                s["retry_added_ms"] += sum(a["ms"] + a.get("backoff_ms", 0) for a in attempts[:-1])
+                self._recent.setdefault(provider, deque(maxlen=self.recent)).append(attempts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {p: dict(s) for p, s in self._providers.items()}
+            for p, s in out.items():
+                s["retry_added_ms"] = round(s["retry_added_ms"], 1)
+                s["recent"] = list(self._recent.get(p, ()))
+        return out
+
+
+class _Attempts:
+    """Bookkeeping for one logical call across its attempts."""
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.log: list[dict] = []
+        self.used = {"connect": 0, "read": 0}
+        self.t0 = time.perf_counter()
+
+    def start(self) -> None:
+        self.t0 = time.perf_counter()
+
+    def ok(self) -> None:
+        self.log.append({"attempt": len(self.log) + 1, "ms": round((time.perf_counter() - self.t0) * 1000, 1)})
+
+    def failed(self, exc: Exception) -> float | None:
+        """Record a failed attempt; returns the backoff before the next one, or None to give up."""
+        kind = self.policy.classify(exc)
+        entry = {
+            "attempt": len(self.log) + 1,
+            "ms": round((time.perf_counter() - self.t0) * 1000, 1),
+            "kind": kind,
+            "error": str(exc)[:200],
+        }
+        self.log.append(entry)
+        if kind is None:
+            return None
+        self.used[kind] += 1
+        budget = self.policy.connect_retries if kind == "connect" else self.policy.read_retries
+        if self.used[kind] > budget:
+            return None
+        delay = self.policy.backoff(self.used["connect"] + self.used["read"], exc)
+        if delay is not None:
+            entry["backoff_ms"] = round(delay * 1000, 1)
+        return delay
+
+
+def retry_call(provider: str, fn: Callable[[], T], policy: RetryPolicy | None = None) -> T:
+    """Blocking call with retries (CLI and worker-thread paths)."""
+    attempts = _Attempts(policy or get_retry_policy())
+    while True:
+        attempts.start()
+        try:
+            result = fn()
+        except Exception as e:
+            delay = attempts.failed(e)
+            if delay is None:
+                _STATS.record(provider, attempts.log, ok=False)
+                raise
+            time.sleep(delay)
+            continue
+        attempts.ok()
+        _STATS.record(provider, attempts.log, ok=True)
+        return result
+
+
+async def aretry_call(provider: str, fn: Callable[[], Awaitable[T]], policy: RetryPolicy | None = None) -> T:
+    """Async twin of retry_call(); `fn` returns a fresh awaitable per attempt."""
+    attempts = _Attempts(policy or get_retry_policy())
+    while True:
+        attempts.start()
+        try:
+            result = await fn()
+        except Exception as e:
+            delay = attempts.failed(e)
+            if delay is None:
+                _STATS.record(provider, attempts.log, ok=False)
+                raise
+            await asyncio.sleep(delay)
+            continue
+        attempts.ok()
+        _STATS.record(provider, attempts.log, ok=True)
+        return result
+
+
+def retry_stream(provider: str, make: Callable[[], Iterator], policy: RetryPolicy | None = None):
+    """
+    Iterate `make()`, re-issuing the request while it fails before its
+    first chunk. Once a chunk was produced the stream is committed: later
+    errors propagate, since replaying would duplicate output.
+    """
+    attempts = _Attempts(policy or get_retry_policy())
+    while True:
+        attempts.start()
+        gen = make()
+        try:
+            first = next(gen)
+        except StopIteration:
+            attempts.ok()
+            _STATS.record(provider, attempts.log, ok=True)
+            return
+        except Exception as e:
+            gen.close()
+            delay = attempts.failed(e)
+            if delay is None:
+                _STATS.record(provider, attempts.log, ok=False)
+                raise
+            time.sleep(delay)
+            continue
+        attempts.ok()
+        _STATS.record(provider, attempts.log, ok=True)
+        try:
+            yield first
+            yield from gen
+        finally:
+            gen.close()
+        return
+
+
+async def aretry_stream(provider: str, make: Callable, policy: RetryPolicy | None = None):
+    """Async twin of retry_stream() for async generators."""
+    attempts = _Attempts(policy or get_retry_policy())
+    while True:
+        attempts.start()
+        gen = make()
+        try:
+            first = await gen.__anext__()
+        except StopAsyncIteration:
+            attempts.ok()
+            _STATS.record(provider, attempts.log, ok=True)
+            return
+        except Exception as e:
+            await gen.aclose()
+            delay = attempts.failed(e)
+            if delay is None:
+                _STATS.record(provider, attempts.log, ok=False)
+                raise
+            await asyncio.sleep(delay)
+            continue
+        attempts.ok()
+        _STATS.record(provider, attempts.log, ok=True)
+        try:
+            yield first
+            async for item in gen:
+                yield item
+        finally:
+            await gen.aclose()
+        return
+
+
+_STATS = RetryStats()
+
+
+def get_retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        connect_retries=settings.retry_connect_attempts,
+        read_retries=settings.retry_read_attempts,
+        base_delay=settings.retry_base_delay,
+        max_delay=settings.retry_max_delay,
+        max_retry_after=settings.retry_max_retry_after,
+    )
+
+
+def get_retry_stats() -> dict:
+    return _STATS.stats()
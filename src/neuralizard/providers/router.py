@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Awaitable, Callable
+from .base import Prompt
+from .base_streaming import astream, is_error_token
+
+# (provider, model); model None = the provider's default
+Candidate = tuple[str, str | None]
+
+_RATE_LIMIT_MARKERS = ("429", "rate limit", "rate_limit", "too many requests", "quota")
+
+
+def parse_candidates(spec) -> list[Candidate]:
+    """
+    "openai:gpt-4o-mini,anthropic" or ["openai:gpt-4o-mini", "anthropic"] ->
+    [("openai", "gpt-4o-mini"), ("anthropic", None)], in priority order.
+    """
+    items = spec.split(",") if isinstance(spec, str) else list(spec or [])
+    out: list[Candidate] = []
+    for item in items:
+        provider, _, model = str(item).strip().partition(":")
+        if provider:
+            out.append((provider.lower(), model or None))
+    return out
+
+
+class CandidateHealth:
+    """Rolling latency / error / rate-limit state and circuit breaker for one provider/model."""
+
+    __slots__ = ("outcomes", "latency_ms", "failures", "open_until", "half_open", "rate_limited_until", "last_error")
+
+    def __init__(self, window: int):
+        self.outcomes: deque[bool] = deque(maxlen=window)  # True = success
+        self.latency_ms: float | None = None  # EWMA of first_token_ms
+        self.failures = 0  # consecutive
+        self.open_until = 0.0
+        self.half_open = False
+        self.rate_limited_until = 0.0
+        self.last_error: str | None = None
+
+    @property
+    def error_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def state(self, now: float) -> str:
+        if self.open_until > now:
+            return "open"
+        return "half_open" if self.half_open else "closed"
+
+
+class ProviderRouter:
+    """
+    Picks the healthiest of several provider/model candidates per request.
+
+    Each candidate keeps a rolling window of outcomes, an EWMA of its
+    first-token latency and a rate-limit back-off. `failure_threshold`
+    consecutive failures open its circuit for `cooldown` seconds; after that
+    requests are let through again as trials (half open) and the next outcome
+    closes or re-opens the circuit. Requests go to available candidates ordered by
+    error rate, then latency, then the caller's priority, and fail over to
+    the next one as long as no token has been emitted.
+    """
+
+    def __init__(self, get_provider: Callable, aliases: dict[str, list[str]] | None = None,
+                 failure_threshold: int = 3, cooldown: float = 30.0, window: int = 50):
+        self.get_provider = get_provider
+        self.aliases = {k.lower(): parse_candidates(v) for k, v in (aliases or {}).items()}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window
+        self._health: dict[Candidate, CandidateHealth] = {}
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "failovers": 0, "exhausted": 0, "circuit_opens": 0, "rate_limited": 0}
+
+    def is_alias(self, name: str | None) -> bool:
+        return (name or "").lower() in self.aliases
+
+    def candidates(self, target) -> list[Candidate]:
+        """Resolve an alias name or a priority list to candidates."""
+        if isinstance(target, str) and self.is_alias(target):
+            return list(self.aliases[target.lower()])
+        candidates = parse_candidates(target)
+        if not candidates:
+            raise ValueError(f"No route candidates in {target!r}")
+        return candidates
+
+    def _get(self, cand: Candidate) -> CandidateHealth:
+        with self._lock:
+            h = self._health.get(cand)
+            if h is None:
+                h = self._health[cand] = CandidateHealth(self.window)
+            return h
+
+    def rank(self, candidates: list[Candidate]) -> list[Candidate]:
+        """Available candidates, healthiest first; all of them (by soonest recovery) when none is."""
+        now = time.monotonic()
+        ranked = []
+        for priority, cand in enumerate(candidates):
+            h = self._get(cand)
+            if h.open_until > now or h.rate_limited_until > now:
+                continue
+            ranked.append((round(h.error_rate, 1), h.latency_ms or 0.0, priority, cand))
+        if ranked:
+            return [c for *_, c in sorted(ranked)]
+        # everything is tripped: try whatever recovers first rather than failing outright
+        return sorted(candidates, key=lambda c: max(self._get(c).open_until, self._get(c).rate_limited_until))
+
+    def record_success(self, cand: Candidate, first_token_ms: float) -> None:
+        h = self._get(cand)
+        with self._lock:
+            h.outcomes.append(True)
+            h.failures = 0
+            h.half_open = False
+            h.open_until = 0.0
+            h.latency_ms = first_token_ms if h.latency_ms is None else 0.8 * h.latency_ms + 0.2 * first_token_ms
+
+    def record_failure(self, cand: Candidate, error: str) -> None:
+        h = self._get(cand)
+        now = time.monotonic()
+        with self._lock:
+            h.outcomes.append(False)
+            h.failures += 1
+            h.last_error = error[:200]
+            if any(m in error.lower() for m in _RATE_LIMIT_MARKERS):
+                h.rate_limited_until = now + self.cooldown
+                self.counters["rate_limited"] += 1
+            if h.half_open or h.failures >= self.failure_threshold:
+                h.open_until = now + self.cooldown
+                h.half_open = True  # the next attempt after the cooldown is a trial
+                self.counters["circuit_opens"] += 1
+
+    async def astream(self, target, prompt: Prompt, *, decision: dict | None = None, **kwargs):
+        """
+        Stream from the best candidate for `target`, failing over while
+        nothing has been emitted yet. `decision` (when given) is filled with
+        the chosen provider/model and the attempts made before it.
+        """
+        self.counters["requests"] += 1
+        attempts: list[dict] = []
+        error = "no candidates"
+        for provider, model in self.rank(self.candidates(target)):
+            cand = (provider, model)
+            t0 = time.perf_counter()
+            tokens = None
+            try:
+                tokens = astream(self.get_provider(provider), prompt, model=model, **kwargs)
+                first = None
+                async for item in tokens:
+                    if isinstance(item, str) and item:
+                        first = item
+                        break
+                if first is None or is_error_token(first):
+                    raise RuntimeError(first.strip("[] \n") if first else "empty response")
+            except BaseException as e:
+                if tokens is not None:
+                    await tokens.aclose()
+                if not isinstance(e, Exception):
+                    raise
+                error = str(e)
+                self.record_failure(cand, error)
+                attempts.append({"provider": provider, "model": model, "error": error[:200]})
+                continue
+            self.record_success(cand, (time.perf_counter() - t0) * 1000)
+            if attempts:
+                self.counters["failovers"] += 1
+            if decision is not None:
+                decision.update({"provider": provider, "model": model, "attempts": attempts})
+            # from here on errors belong to the answer: it has started streaming
+            async with aclosing(tokens):
+                yield first
+                async for item in tokens:
+                    yield item
+            return
+        self.counters["exhausted"] += 1
+        if decision is not None:
+            decision.update({"provider": None, "model": None, "attempts": attempts})
+        raise RuntimeError(f"All route candidates failed: {error}")
+
+    async def acomplete(self, target, call: Callable[[object, str | None], Awaitable], *,
+                        decision: dict | None = None):
+        """Non-streaming counterpart: `call(provider, model)` is tried per candidate until one succeeds."""
+        self.counters["requests"] += 1
+        attempts: list[dict] = []
+        error = "no candidates"
+        for provider, model in self.rank(self.candidates(target)):
+            cand = (provider, model)
+            t0 = time.perf_counter()
+            try:
+                res = await call(self.get_provider(provider), model)
+            except Exception as e:
+                error = str(e)
+                self.record_failure(cand, error)
+                attempts.append({"provider": provider, "model": model, "error": error[:200]})
+                continue
+            self.record_success(cand, (time.perf_counter() - t0) * 1000)
+            if attempts:
+                self.counters["failovers"] += 1
+            if decision is not None:
+                decision.update({"provider": provider, "model": model, "attempts": attempts})
+            return res
+        self.counters["exhausted"] += 1
+        raise RuntimeError(f"All route candidates failed: {error}")
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            health = list(self._health.items())
+        out: dict = dict(self.counters)
+        out["aliases"] = {k: [f"{p}:{m}" if m else p for p, m in v] for k, v in self.aliases.items()}
+        out["candidates"] = {
+            f"{p}:{m}" if m else p: {
+                "state": h.state(now),
+                "error_rate": round(h.error_rate, 3),
+                "latency_ms": round(h.latency_ms) if h.latency_ms is not None else None,
+                "rate_limited": h.rate_limited_until > now,
+                "last_error": h.last_error,
+            }
+            for (p, m), h in health
+        }
+        return out
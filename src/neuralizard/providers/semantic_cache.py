@@ -0,0 +1,492 @@
+"""
+Opt-in semantic response cache.
+
+Single-question prompts are embedded on the CPU and matched against earlier
+answers in a NumPy vector index; when the cosine similarity clears the
+provider's threshold the stored answer is returned instead of calling
+upstream. Entries are partitioned by (provider, model, system prompt), so
+an answer is only ever reused for the same model and instructions.
+
+The default embedder is a dependency-free feature-hashing model (word
+unigrams/bigrams plus character trigrams). Any object with `dim` and
+`embed(texts)` can be plugged in instead, e.g. a sentence-transformers model
+via `semantic_cache_embedder`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import aclosing, closing
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import numpy as np
+
+from ..config import settings
+from .base import LLMResult, Prompt, split_system, to_messages
+from .base_streaming import _provider_name, acomplete_upstream, astream_upstream, is_error_token
+
+
+# ============================================================
+# Embedders
+# ============================================================
+
+class Embedder(Protocol):
+    """Maps texts to L2-normalized float32 vectors of length `dim`."""
+    dim: int
+    # True when embed() is heavy enough to run off the event loop
+    blocking: bool
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Feature-hashing bag of word unigrams, bigrams and character trigrams.
+    Deterministic across processes (crc32, not hash()), so persisted indexes
+    stay valid after a restart. Catches rephrasings that share most of their
+    wording; it does not know synonyms.
+    """
+    blocking = False
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = _WORD_RE.findall(text.lower())
+        feats = list(words)
+        feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"#{w}#"
+            feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return feats
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            feats = self._features(text)
+            if not feats:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode()) for f in feats), dtype=np.uint32, count=len(feats))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (optional dependency), run on the CPU."""
+    blocking = True
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = int(self._model.get_sentence_embedding_dimension())
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vecs = self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vecs, dtype=np.float32)
+
+
+def make_embedder(name: str | None = None, dim: int | None = None) -> Embedder:
+    name = name or settings.semantic_cache_embedder
+    if name and name != "hashing":
+        try:
+            return SentenceTransformerEmbedder(name)
+        except Exception as e:
+            logging.warning(f"Semantic cache embedder {name!r} unavailable, using hashing: {e}")
+    return HashingEmbedder(dim or settings.semantic_cache_dim)
+
+
+# ============================================================
+# Vector index
+# ============================================================
+
+class VectorIndex:
+    """
+    Fixed-capacity matrix of unit vectors with exact dot-product search.
+    Each slot carries a namespace id, an expiry time, an LRU tick and its
+    payload. With `path` set the matrix is a memory-mapped .npy file and
+    payloads are kept in a JSON sidecar written by save().
+    """
+
+    def __init__(self, dim: int, capacity: int, path: str | None = None):
+        self.dim = dim
+        self.capacity = capacity
+        self.path = path
+        self.size = 0
+        self.evictions = 0
+        self.expired = 0
+        self._tick = 0
+        self.namespaces = np.zeros(capacity, dtype=np.int64)
+        self.expires_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.payloads: list[dict | None] = [None] * capacity
+        self.vectors = self._open_vectors()
+
+    # -------- storage --------
+
+    def _open_vectors(self) -> np.ndarray:
+        if not self.path:
+            return np.zeros((self.capacity, self.dim), dtype=np.float32)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                vecs = np.lib.format.open_memmap(self.path, mode="r+")
+                if vecs.shape == (self.capacity, self.dim) and vecs.dtype == np.float32:
+                    self._load_meta()
+                    return vecs
+                logging.warning(f"Semantic cache index {self.path} has shape {vecs.shape}; rebuilding")
+                del vecs
+            except Exception as e:
+                logging.warning(f"Semantic cache index {self.path} unreadable, rebuilding: {e}")
+        return np.lib.format.open_memmap(self.path, mode="w+", dtype=np.float32, shape=(self.capacity, self.dim))
+
+    def _meta_path(self) -> str:
+        return f"{self.path}.json"
+
+    def _load_meta(self) -> None:
+        try:
+            with open(self._meta_path(), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        if meta.get("capacity") != self.capacity or meta.get("dim") != self.dim:
+            return
+        self.size = meta["size"]
+        self._tick = meta["tick"]
+        self.namespaces[:] = meta["namespaces"]
+        self.expires_at[:] = meta["expires_at"]
+        self.last_used[:] = meta["last_used"]
+        self.payloads = meta["payloads"]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self.vectors.flush()
+        meta = {
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "size": self.size,
+            "tick": self._tick,
+            "namespaces": self.namespaces.tolist(),
+            "expires_at": self.expires_at.tolist(),
+            "last_used": self.last_used.tolist(),
+            "payloads": self.payloads,
+        }
+        tmp = f"{self._meta_path()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path())
+
+    # -------- search / insert --------
+
+    def search(self, namespace: int, vec: np.ndarray) -> tuple[int, float]:
+        """Best live slot in `namespace` as (slot, similarity); (-1, 0.0) when there is none."""
+        n = self.size
+        if n == 0:
+            return -1, 0.0
+        live = (self.namespaces[:n] == namespace) & (self.expires_at[:n] > time.time())
+        if not live.any():
+            return -1, 0.0
+        sims = self.vectors[:n] @ vec
+        sims[~live] = -np.inf
+        slot = int(np.argmax(sims))
+        return slot, float(sims[slot])
+
+    def touch(self, slot: int) -> dict | None:
+        self._tick += 1
+        self.last_used[slot] = self._tick
+        return self.payloads[slot]
+
+    def add(self, namespace: int, vec: np.ndarray, payload: dict, ttl: float, slot: int = -1) -> int:
+        """Insert (or overwrite `slot`); a full index reuses an expired slot, else the least recently used."""
+        if slot < 0:
+            if self.size < self.capacity:
+                slot = self.size
+                self.size += 1
+            else:
+                expired = np.flatnonzero(self.expires_at <= time.time())
+                if expired.size:
+                    slot = int(expired[0])
+                    self.expired += 1
+                else:
+                    slot = int(np.argmin(self.last_used))
+                    self.evictions += 1
+        self.vectors[slot] = vec
+        self.namespaces[slot] = namespace
+        self.expires_at[slot] = time.time() + ttl
+        self.payloads[slot] = payload
+        self.touch(slot)
+        return slot
+
+    def clear(self) -> None:
+        self.size = 0
+        self.namespaces[:] = 0
+        self.expires_at[:] = 0
+        self.last_used[:] = 0
+        self.payloads = [None] * self.capacity
+
+
+# ============================================================
+# Semantic cache
+# ============================================================
+
+@dataclass
+class SemanticQuery:
+    """A prompt that can be looked up: its namespace id and the question text."""
+    provider: str
+    model: str
+    namespace: int
+    text: str
+
+
+def _namespace(provider: str, model: str, system: str | None) -> int:
+    raw = json.dumps([provider, model, (system or "").strip()], ensure_ascii=False)
+    return int.from_bytes(hashlib.sha256(raw.encode()).digest()[:8], "big", signed=True)
+
+
+class SemanticCache:
+    """
+    Embedding index of previous answers. Only prompts that are a single user
+    question (optionally with a system prompt) take part: multi-turn history
+    changes what a follow-up means, so those go upstream unconditionally.
+    """
+
+    # slot similarity at or above this counts as the same question and is overwritten
+    DUPLICATE_SIMILARITY = 0.995
+    # misses this close below the threshold are counted as near misses (threshold tuning aid)
+    NEAR_MISS_MARGIN = 0.05
+
+    def __init__(self, embedder: Embedder | None = None, capacity: int | None = None,
+                 ttl: float | None = None, threshold: float | None = None,
+                 thresholds: dict[str, float] | None = None, path: str | None = None):
+        self.embedder = embedder or make_embedder()
+        self.ttl = settings.semantic_cache_ttl if ttl is None else ttl
+        self.threshold = settings.semantic_cache_threshold if threshold is None else threshold
+        self.thresholds = {k.lower(): v for k, v in (
+            settings.semantic_cache_thresholds if thresholds is None else thresholds
+        ).items()}
+        self.index = VectorIndex(
+            self.embedder.dim,
+            capacity or settings.semantic_cache_capacity,
+            settings.semantic_cache_path if path is None else path,
+        )
+        self._lock = threading.Lock()
+        self._latency_ms: deque[float] = deque(maxlen=1024)
+        self._hit_similarity = 0.0
+        self.counters = {"lookups": 0, "hits": 0, "misses": 0, "near_misses": 0, "ineligible": 0, "stores": 0, "errors": 0}
+
+    def threshold_for(self, provider: str) -> float:
+        return self.thresholds.get((provider or "").lower(), self.threshold)
+
+    def query(self, provider: str, model: str | None, prompt: Prompt, system: str | None = None) -> SemanticQuery | None:
+        system_text, turns = split_system(to_messages(prompt, system))
+        if len(turns) != 1 or turns[0]["role"] != "user" or not turns[0]["content"].strip():
+            self.counters["ineligible"] += 1
+            return None
+        provider = (provider or "").lower()
+        model = model or ""
+        return SemanticQuery(provider, model, _namespace(provider, model, system_text), turns[0]["content"].strip())
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self.embedder.embed([text])[0]
+
+    def lookup(self, q: SemanticQuery) -> LLMResult | None:
+        t0 = time.perf_counter()
+        try:
+            vec = self._embed(q.text)
+            with self._lock:
+                slot, sim = self.index.search(q.namespace, vec)
+                threshold = self.threshold_for(q.provider)
+                payload = self.index.touch(slot) if slot >= 0 and sim >= threshold else None
+        except Exception as e:
+            self.counters["errors"] += 1
+            logging.warning(f"Semantic cache lookup failed: {e}")
+            return None
+        self._latency_ms.append((time.perf_counter() - t0) * 1000)
+        self.counters["lookups"] += 1
+        if payload is None:
+            self.counters["misses"] += 1
+            if slot >= 0 and sim >= threshold - self.NEAR_MISS_MARGIN:
+                self.counters["near_misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        self._hit_similarity += sim
+        return LLMResult(text=payload["text"], provider=q.provider, model=payload.get("model") or q.model)
+
+    def store(self, q: SemanticQuery, text: str, model: str | None = None) -> None:
+        if not text.strip():
+            return
+        try:
+            vec = self._embed(q.text)
+            with self._lock:
+                slot, sim = self.index.search(q.namespace, vec)
+                reuse = slot if slot >= 0 and sim >= self.DUPLICATE_SIMILARITY else -1
+                self.index.add(q.namespace, vec, {"text": text, "model": model or q.model}, self.ttl, slot=reuse)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logging.warning(f"Semantic cache store failed: {e}")
+            return
+        self.counters["stores"] += 1
+
+    async def alookup(self, q: SemanticQuery) -> LLMResult | None:
+        if self.embedder.blocking:
+            return await asyncio.to_thread(self.lookup, q)
+        return self.lookup(q)
+
+    async def astore(self, q: SemanticQuery, text: str, model: str | None = None) -> None:
+        if self.embedder.blocking:
+            await asyncio.to_thread(self.store, q, text, model)
+        else:
+            self.store(q, text, model)
+
+    def save(self) -> None:
+        with self._lock:
+            self.index.save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.index.clear()
+
+    def stats(self) -> dict[str, Any]:
+        c = self.counters
+        lat = sorted(self._latency_ms)
+        out: dict[str, Any] = dict(c)
+        out.update({
+            "size": self.index.size,
+            "capacity": self.index.capacity,
+            "evictions": self.index.evictions,
+            "expired_reused": self.index.expired,
+            "hit_rate": round(c["hits"] / c["lookups"], 4) if c["lookups"] else 0.0,
+            "avg_hit_similarity": round(self._hit_similarity / c["hits"], 4) if c["hits"] else 0.0,
+            "lookup_ms_avg": round(sum(lat) / len(lat), 3) if lat else 0.0,
+            "lookup_ms_p95": round(lat[min(len(lat) - 1, math.ceil(0.95 * len(lat)) - 1)], 3) if lat else 0.0,
+            "threshold": self.threshold,
+            "thresholds": dict(self.thresholds),
+            "embedder": type(self.embedder).__name__,
+            "persistent": bool(self.index.path),
+        })
+        return out
+
+
+# ============================================================
+# Provider wrapper
+# ============================================================
+
+class SemanticCachedProvider:
+    """
+    Wraps a provider so complete/acomplete/stream/astream consult the
+    semantic cache first. Everything else is delegated to the wrapped
+    instance. Pass `semantic_cache=False` to skip the cache for one call.
+    Only misses reach the wrapped provider, and only they are admitted by
+    the rate governor (and retried).
+    """
+
+    wraps_upstream = True
+
+    def __init__(self, inner, cache: SemanticCache):
+        self._inner = inner
+        self._cache = cache
+
+    def __getattr__(self, item):
+        return getattr(self._inner, item)
+
+    def _query(self, prompt: Prompt, model: str | None, kwargs: dict) -> SemanticQuery | None:
+        if not kwargs.pop("semantic_cache", True):
+            return None
+        return self._cache.query(_provider_name(self._inner), model, prompt, kwargs.get("system"))
+
+    def complete(self, prompt: Prompt, model: str | None = None, **kwargs):
+        q = self._query(prompt, model, kwargs)
+        hit = self._cache.lookup(q) if q else None
+        if hit is not None:
+            return hit
+        res = self._inner.complete(prompt, model=model, **kwargs)
+        if q:
+            self._cache.store(q, getattr(res, "text", "") or "", getattr(res, "model", None))
+        return res
+
+    async def acomplete(self, prompt: Prompt, model: str | None = None, **kwargs):
+        q = self._query(prompt, model, kwargs)
+        hit = await self._cache.alookup(q) if q else None
+        if hit is not None:
+            return hit
+        res = await acomplete_upstream(self._inner, prompt, model=model, **kwargs)
+        if q:
+            await self._cache.astore(q, getattr(res, "text", "") or "", getattr(res, "model", None))
+        return res
+
+    def stream(self, prompt: Prompt, model: str | None = None, **kwargs):
+        q = self._query(prompt, model, kwargs)
+        hit = self._cache.lookup(q) if q else None
+        if hit is not None:
+            yield hit.text
+            return
+        parts: list[str] = []
+        failed = False
+        with closing(self._inner.stream(prompt, model=model, **kwargs)) as tokens:
+            for token in tokens:
+                if isinstance(token, str):
+                    parts.append(token)
+                    failed = failed or is_error_token(token)
+                yield token
+        if q and not failed:
+            self._cache.store(q, "".join(parts), model)
+
+    async def astream(self, prompt: Prompt, model: str | None = None, **kwargs):
+        q = self._query(prompt, model, kwargs)
+        hit = await self._cache.alookup(q) if q else None
+        if hit is not None:
+            yield hit.text
+            return
+        parts: list[str] = []
+        failed = False
+        async with aclosing(astream_upstream(self._inner, prompt, model=model, **kwargs)) as tokens:
+            async for token in tokens:
+                if isinstance(token, str):
+                    parts.append(token)
+                    failed = failed or is_error_token(token)
+                yield token
+        # only reached when the stream ran to completion (not on cancel / disconnect)
+        if q and not failed:
+            await self._cache.astore(q, "".join(parts), model)
+
+
+_CACHE: SemanticCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = SemanticCache()
+    return _CACHE
+
+
+def set_semantic_cache(cache: SemanticCache | None) -> None:
+    """Swap in a custom cache, e.g. with another embedder (None rebuilds the default on next use)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
+
+
+def save_semantic_cache() -> None:
+    """Persist the memory-mapped index, if one was opened (called on shutdown)."""
+    if _CACHE is not None:
+        try:
+            _CACHE.save()
+        except Exception as e:
+            logging.warning(f"Saving semantic cache failed: {e}")
@@ -0,0 +1,96 @@
+import codecs
+import json
+from typing import NamedTuple
+
+try:  # optional fast path for JSON payloads (pip install neuralizard[fast])
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # pragma: no cover - depends on the environment
+    loads = json.loads
+
+
+class SSEEvent(NamedTuple):
+    data: str
+    event: str = "message"
+    id: str | None = None
+
+
+class SSEDecoder:
+    """
+    Incremental Server-Sent Events decoder.
+
+    `feed()` takes transport chunks (bytes or text) exactly as they arrive
+    and returns the events they complete. UTF-8 is decoded incrementally, so
+    a multi-byte character split across chunks survives, and only the
+    unfinished last line is carried over to the next call: every byte is
+    decoded and split once. Follows the SSE line rules: LF, CRLF or CR line
+    endings, `:` comments, `data:` lines joined with "\\n", `event:`, `id:`
+    (sticky across events) and `retry:`; an event is dispatched on a blank line.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""
+        self._data: list[str] = []
+        self._event = ""
+        self.last_id: str | None = None
+        self.retry: int | None = None
+
+    def feed(self, chunk: bytes | str) -> list[SSEEvent]:
+        text = self._decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        if not text:
+            return []
+        if self._tail:
+            text = self._tail + text
+        held = ""
+        if "\r" in text:
+            if text[-1] == "\r":
+                # might be the first half of a CRLF; decide once the next chunk arrives
+                text, held = text[:-1], "\r"
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        lines = text.split("\n")
+        self._tail = lines.pop() + held
+        events: list[SSEEvent] = []
+        for line in lines:
+            self._line(line, events)
+        return events
+
+    def flush(self) -> list[SSEEvent]:
+        """End of stream: process the unterminated last line and dispatch any pending event."""
+        text = self._tail + self._decoder.decode(b"", final=True)
+        self._tail = ""
+        events: list[SSEEvent] = []
+        for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            if line:
+                self._line(line, events)
+        # servers that close without the final blank line still meant to send the event
+        self._line("", events)
+        return events
+
+    def _line(self, line: str, events: list[SSEEvent]) -> None:
+        if not line:
+            if self._data:
+                events.append(SSEEvent("\n".join(self._data), self._event or "message", self.last_id))
+                self._data = []
+            self._event = ""
+            return
+        if line.startswith("data:"):
+            # the common case, kept off the generic field path
+            self._data.append(line[6:] if line.startswith("data: ") else line[5:])
+            return
+        if line[0] == ":":
+            return  # comment / keep-alive
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\0" not in value:
+                self.last_id = value
+        elif field == "retry":
+            if value.isdigit():
+                self.retry = int(value)
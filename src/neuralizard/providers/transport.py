@@ -0,0 +1,436 @@
+import asyncio
+import contextlib
+import socket
+import threading
+import time
+import weakref
+import httpcore
+import httpx
+from ..config import settings
+
+try:  # HTTP/2 needs the optional h2 package (pip install neuralizard[http2])
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class DNSCache:
+    """getaddrinfo() results per (host, port), kept for `ttl` seconds."""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._entries: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, host: str, port: int) -> list[str] | None:
+        """Addresses to try without a lookup, or None when host:port must be resolved."""
+        if self.ttl <= 0 or _is_ip(host):
+            return [host]
+        entry = self._entries.get((host, port))
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        """Addresses to try for host:port, in resolver order; the host itself when caching is off."""
+        addrs = self.cached(host, port)
+        if addrs is not None:
+            return addrs
+        self.misses += 1
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic() + self.ttl, addrs)
+        return addrs
+
+    def forget(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+def _is_ip(host: str) -> bool:
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except OSError:
+            pass
+    return False
+
+
+class TransportStats:
+    """Requests vs. newly opened connections per host; their ratio is the connection reuse."""
+
+    def __init__(self):
+        self._hosts: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _bump(self, host: str, key: str) -> None:
+        with self._lock:
+            h = self._hosts.setdefault(host, {"requests": 0, "connections": 0, "host_waits": 0})
+            h[key] += 1
+
+    def request(self, host: str) -> None:
+        self._bump(host, "requests")
+
+    def connection(self, host: str) -> None:
+        self._bump(host, "connections")
+
+    def host_wait(self, host: str) -> None:
+        self._bump(host, "host_waits")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = {h: dict(c) for h, c in self._hosts.items()}
+        for c in hosts.values():
+            c["reuse_ratio"] = _reuse(c["requests"], c["connections"])
+        total_req = sum(c["requests"] for c in hosts.values())
+        total_conn = sum(c["connections"] for c in hosts.values())
+        return {"requests": total_req, "connections": total_conn,
+                "reuse_ratio": _reuse(total_req, total_conn), "hosts": hosts}
+
+
+def _reuse(requests: int, connections: int) -> float:
+    """Share of requests that went out on an already open connection."""
+    return round(max(0.0, 1 - connections / requests), 3) if requests else 0.0
+
+
+class _Backend(httpcore.NetworkBackend):
+    """httpcore network backend that resolves through the DNS cache and counts new connections."""
+
+    def __init__(self, inner: httpcore.NetworkBackend, pool: "HTTPPool"):
+        self.inner = inner
+        self.pool = pool
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.pool._stats.connection(host)
+        error: Exception | None = None
+        for addr in self.pool.dns.resolve(host, port):
+            try:
+                return self.inner.connect_tcp(addr, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        self.pool.dns.forget(host, port)  # the cached addresses may be stale
+        raise error or httpcore.ConnectError(f"no address for {host}")
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return self.inner.connect_unix_socket(path, timeout, socket_options)
+
+    def sleep(self, seconds):
+        self.inner.sleep(seconds)
+
+
+class _AsyncBackend(httpcore.AsyncNetworkBackend):
+    """Async twin of _Backend."""
+
+    def __init__(self, inner: httpcore.AsyncNetworkBackend, pool: "HTTPPool"):
+        self.inner = inner
+        self.pool = pool
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.pool._stats.connection(host)
+        error: Exception | None = None
+        # a cache miss resolves on a worker thread, as the default backend would
+        addrs = self.pool.dns.cached(host, port) or await asyncio.to_thread(self.pool.dns.resolve, host, port)
+        for addr in addrs:
+            try:
+                return await self.inner.connect_tcp(addr, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        self.pool.dns.forget(host, port)
+        raise error or httpcore.ConnectError(f"no address for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.inner.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds):
+        await self.inner.sleep(seconds)
+
+
+# httpcore errors as the httpx ones callers (and the retry policy) expect; most specific first
+_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _httpx_errors():
+    try:
+        yield
+    except Exception as e:
+        for core, mapped in _ERRORS:
+            if isinstance(e, core):
+                raise mapped(str(e)) from e
+        raise
+
+
+def _core_request(request: httpx.Request) -> httpcore.Request:
+    url = request.url
+    return httpcore.Request(
+        method=request.method,
+        url=httpcore.URL(scheme=url.raw_scheme, host=url.raw_host, port=url.port, target=url.raw_path),
+        headers=request.headers.raw,
+        content=request.stream,
+        extensions=request.extensions,
+    )
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that frees its per-host slot once closed (streams hold it until then)."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        with _httpx_errors():
+            yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        with _httpx_errors():
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _once(fn):
+    done = []
+
+    def wrapper():
+        if not done:
+            done.append(True)
+            fn()
+    return wrapper
+
+
+def _pool_timeout(request: httpx.Request) -> float | None:
+    return (request.extensions.get("timeout") or {}).get("pool")
+
+
+class _Shared(httpx.BaseTransport):
+    """What each httpx.Client is given: closing the client leaves the shared pool open."""
+
+    def __init__(self, pool: "HTTPPool"):
+        self.pool = pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.pool.handle_request(request)
+
+    def close(self) -> None:
+        pass
+
+
+class _AsyncShared(httpx.AsyncBaseTransport):
+    def __init__(self, pool: "HTTPPool"):
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.pool.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HTTPPool:
+    """
+    One connection pool shared by every provider client in the process.
+
+    Clients made by `client()` / `async_client()` keep their own base URL,
+    headers and timeouts but send through this pool, so all providers reuse
+    the same keep-alive (and, with h2 installed, HTTP/2) connections.
+    Each host may have at most `max_per_host` requests in flight, so one
+    slow provider cannot take every connection. Host names are resolved
+    through a TTL'd DNS cache (installed as the httpcore network backend).
+    Async connections belong to the event loop that opened them, so each
+    running loop gets its own httpcore connection pool.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 40, keepalive_expiry: float = 30.0,
+                 max_per_host: int = 20, http2: bool = True, dns_ttl: float = 300.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_per_host = max_per_host
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.dns = DNSCache(dns_ttl)
+        self._stats = TransportStats()
+        self._lock = threading.Lock()
+        self._sync: httpcore.ConnectionPool | None = None
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        # event loop -> (connection pool, per-host semaphores)
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+    # -------- clients --------
+
+    def client(self, **kwargs) -> httpx.Client:
+        kwargs.setdefault("timeout", settings.http_timeout)
+        return httpx.Client(transport=_Shared(self), **kwargs)
+
+    def async_client(self, **kwargs) -> httpx.AsyncClient:
+        kwargs.setdefault("timeout", settings.http_timeout)
+        return httpx.AsyncClient(transport=_AsyncShared(self), **kwargs)
+
+    # -------- connections --------
+
+    def _pool_options(self) -> dict:
+        return {
+            "ssl_context": httpx.create_ssl_context(),
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "http2": self.http2,
+        }
+
+    def _connections(self) -> httpcore.ConnectionPool:
+        if self._sync is None:
+            with self._lock:
+                if self._sync is None:
+                    self._sync = httpcore.ConnectionPool(
+                        network_backend=_Backend(httpcore.SyncBackend(), self), **self._pool_options()
+                    )
+        return self._sync
+
+    def _loop_state(self) -> tuple:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            connections = httpcore.AsyncConnectionPool(
+                network_backend=_AsyncBackend(httpcore.AnyIOBackend(), self), **self._pool_options()
+            )
+            state = self._loops[loop] = (connections, {})
+        return state
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+        if not slot.acquire(blocking=False):
+            self._stats.host_wait(host)
+            timeout = _pool_timeout(request)
+            if not slot.acquire(timeout=timeout):
+                raise httpx.PoolTimeout(f"{host}: {self.max_per_host} requests already in flight", request=request)
+        release = _once(slot.release)
+        try:
+            self._stats.request(host)
+            with _httpx_errors():
+                response = self._connections().handle_request(_core_request(request))
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status, headers=response.headers,
+            stream=_ReleasingStream(response.stream, release), extensions=response.extensions,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        connections, slots = self._loop_state()
+        slot = slots.get(host)
+        if slot is None:
+            slot = slots[host] = asyncio.BoundedSemaphore(self.max_per_host)
+        if slot.locked():
+            self._stats.host_wait(host)
+        try:
+            await asyncio.wait_for(slot.acquire(), _pool_timeout(request))
+        except asyncio.TimeoutError:
+            raise httpx.PoolTimeout(f"{host}: {self.max_per_host} requests already in flight", request=request)
+        release = _once(slot.release)
+        try:
+            self._stats.request(host)
+            with _httpx_errors():
+                response = await connections.handle_async_request(_core_request(request))
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status, headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, release), extensions=response.extensions,
+        )
+
+    # -------- lifecycle / stats --------
+
+    def close(self) -> None:
+        """Close the sync connections (the next request opens new ones)."""
+        with self._lock:
+            sync, self._sync = self._sync, None
+        if sync is not None:
+            sync.close()
+
+    async def aclose(self) -> None:
+        """Close the running loop's async connections, then the sync ones."""
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+        self.close()
+
+    def stats(self) -> dict:
+        out = self._stats.stats()
+        out.update({
+            "http2": self.http2,
+            "max_per_host": self.max_per_host,
+            "dns_cache": {"hits": self.dns.hits, "misses": self.dns.misses},
+        })
+        return out
+
+
+_POOL: HTTPPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_http_pool() -> HTTPPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = HTTPPool(
+                    max_connections=settings.http_pool_size,
+                    max_keepalive=settings.http_max_keepalive,
+                    keepalive_expiry=settings.http_keepalive_expiry,
+                    max_per_host=settings.http_max_per_host,
+                    http2=settings.http2,
+                    dns_ttl=settings.http_dns_ttl,
+                )
+    return _POOL
+
+
+def set_http_pool(pool: HTTPPool | None) -> None:
+    global _POOL
+    _POOL = pool
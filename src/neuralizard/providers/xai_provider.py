@@ -1,37 +1,15 @@
-import os, requests
 import re
-from .base import LLMResult
-from .base_streaming import StreamingProviderMixin
+from .openai_compat import OpenAICompatProvider
 
-API_URL = "https://api.x.ai/v1/chat/completions"
 
-
-class XAIProvider(StreamingProviderMixin):
+class XAIProvider(OpenAICompatProvider):
+    """xAI Grok models on the OpenAI-compatible chat-completions API."""
     name = "xai"
-
-    def __init__(self, api_key: str | None):
-        self.api_key = api_key or os.getenv("XAI_API_KEY")
-        if not self.api_key:
-            raise RuntimeError("XAI_API_KEY missing. Add it to ~/.neuralizard/.env")
-        self.default_model = "grok-4-latest"
-
-    def complete(self, prompt: str, model: str | None = None, **kwargs) -> LLMResult:
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        payload = {
-            "model": model or self.default_model,
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            "stream": False,
-            "temperature": kwargs.get("temperature", 0.7),
-        }
-
-        r = requests.post(API_URL, json=payload, headers=headers, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-        text = data["choices"][0]["message"]["content"]
-        return LLMResult(text=text.strip(), provider=self.name, model=payload["model"])
+    base_url = "https://api.x.ai"
+    default_model = "grok-4-latest"
+    api_key_env = "XAI_API_KEY"
+    default_system = "You are a helpful assistant."
+    default_temperature = 0.7
 
     def list_models(self) -> list[str]:
         """
@@ -42,18 +20,7 @@ class XAIProvider(StreamingProviderMixin):
         - Exclude preview/experimental and snapshot variants (-YYYY[-MM[-DD]] or -NNNN)
         """
         try:
-            r = requests.get(
-                "https://api.x.ai/v1/models",
-                headers={"Authorization": f"Bearer {self.api_key}", "Accept": "application/json"},
-                timeout=30,
-            )
-            if r.status_code >= 400:
-                return [self.default_model]
-
-            payload = r.json() or {}
-            items = payload.get("data") or []
-            raw = [it.get("id") for it in items if isinstance(it, dict) and it.get("id")]
-            names = sorted({n for n in raw if isinstance(n, str) and n})
+            names = self._model_ids()
 
             def is_chat(mid: str) -> bool:
                 lid = mid.lower()
@@ -93,21 +60,3 @@ class XAIProvider(StreamingProviderMixin):
             return ordered[:10] if ordered else ([d] if d else [])
         except Exception:
             return [self.default_model] if getattr(self, "default_model", None) else []
-
-    # 👇 This one powers .stream() in the mixin
-    def _stream_request(self, prompt: str, model: str | None = None, **kwargs):
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        payload = {
-            "model": model or self.default_model,
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            "stream": True,
-            "temperature": kwargs.get("temperature", 0.7),
-        }
-        with requests.post(API_URL, json=payload, headers=headers, stream=True) as r:
-            r.raise_for_status()
-            for line in r.iter_lines():
-                if line:
-                    yield line
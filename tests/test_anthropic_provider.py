@@ -27,4 +27,36 @@ def test_list_models():
     provider = AnthropicProvider()
     provider.client = MockClient()
     models = provider.list_models()
-    assert any("claude" in m for m in models)
\ No newline at end of file
+    assert any("claude" in m for m in models)
+def test_message_args_use_native_system_and_turns():
+    turns = [
+        {"role": "assistant", "content": "dangling"},
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "how are you?"},
+    ]
+    args = AnthropicProvider._message_args(turns, "be brief")
+    assert args["system"][0]["text"] == "be brief"
+    assert [m["role"] for m in args["messages"]] == ["user", "assistant", "user"]
+    assert "system" not in AnthropicProvider._message_args("hi", None)
+
+def test_cache_breakpoints_on_stable_prefix(monkeypatch):
+    from neuralizard.config import settings
+    turns = [
+        {"role": "user", "content": "q1"},
+        {"role": "assistant", "content": "a1"},
+        {"role": "user", "content": "q2"},
+        {"role": "assistant", "content": "a2"},
+        {"role": "user", "content": "q3"},
+    ]
+    monkeypatch.setattr(settings, "anthropic_prompt_cache", True)
+    args = AnthropicProvider._message_args(turns, "sys")
+    marked = [i for i, m in enumerate(args["messages"]) if isinstance(m["content"], list)]
+    assert marked == [2, 4]
+    assert args["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert args["messages"][4]["content"][0]["text"] == "q3"
+
+    monkeypatch.setattr(settings, "anthropic_prompt_cache", False)
+    args = AnthropicProvider._message_args(turns, "sys")
+    assert args["system"] == "sys"
+    assert all(isinstance(m["content"], str) for m in args["messages"])
@@ -0,0 +1,164 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+from neuralizard.providers.base_streaming import (
+    StreamingProviderMixin,
+    AsyncStreamingProviderMixin,
+    astream,
+    acomplete,
+)
+
+SSE_CHUNKS = [
+    b'data: {"choices":[{"delta":{"content":"Hello"}}]}\n\ndata: {"choices":[{"delta":{"content":" world"}}]}\n\n',
+    b"data: [DONE]\n\n",
+    b"data: ignored\n\n",
+]
+
+class DualProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
+    def _stream_request(self, prompt, model=None, **kwargs):
+        yield from SSE_CHUNKS
+
+    async def _astream_request(self, prompt, model=None, **kwargs):
+        for chunk in SSE_CHUNKS:
+            yield chunk
+
+class SyncOnlyProvider:
+    def stream(self, prompt, model=None, **kwargs):
+        yield from ["a", "b"]
+
+    def complete(self, prompt, model=None, **kwargs):
+        return f"Echo: {prompt}"
+
+async def _collect(agen):
+    return [t async for t in agen]
+
+def test_sync_and_async_streams_match():
+    prov = DualProvider()
+    assert list(prov.stream("hi")) == ["Hello", " world"]
+    assert asyncio.run(_collect(prov.astream("hi"))) == ["Hello", " world"]
+
+def test_astream_falls_back_to_sync_stream():
+    assert asyncio.run(_collect(astream(SyncOnlyProvider(), "hi"))) == ["a", "b"]
+
+def test_acomplete_falls_back_to_sync_complete():
+    assert asyncio.run(acomplete(SyncOnlyProvider(), "hi")) == "Echo: hi"
+
+def test_offloaded_stream_respects_queue_backpressure():
+    from neuralizard.providers.offload import SyncStreamOffloader
+
+    off = SyncStreamOffloader(max_workers=2, queue_size=1, per_provider_limit=1)
+    produced = []
+
+    def gen():
+        for i in range(5):
+            produced.append(i)
+            yield i
+
+    async def run():
+        agen = off.stream("test", gen)
+        first = await agen.__anext__()
+        await asyncio.sleep(0.05)
+        # one item consumed, at most one queued, one blocked in put()
+        assert len(produced) <= 3
+        rest = [x async for x in agen]
+        return [first] + rest
+
+    try:
+        assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+        assert off.metrics()["active"] == {}
+    finally:
+        off.shutdown()
+
+def test_abandoned_offloaded_stream_holds_its_slot_until_the_worker_ends():
+    import threading
+    from neuralizard.providers.offload import SyncStreamOffloader
+
+    off = SyncStreamOffloader(max_workers=2, queue_size=1, per_provider_limit=1)
+    reading, upstream = threading.Event(), threading.Event()
+
+    def slow():
+        yield "a"
+        reading.set()
+        upstream.wait(5)  # still reading from the provider after the consumer left
+        yield "b"
+
+    async def run():
+        agen = off.stream("test", slow)
+        assert await agen.__anext__() == "a"
+        await asyncio.to_thread(reading.wait, 5)
+        await agen.aclose()
+        second = asyncio.create_task(_collect(off.stream("test", lambda: iter(["c"]))))
+        await asyncio.sleep(0.1)
+        held = (off.metrics()["active"], off.metrics()["waiting"], second.done())
+        upstream.set()
+        return held, await second
+
+    try:
+        held, second = asyncio.run(run())
+        assert held == ({"test": 1}, {"test": 1}, False)
+        assert second == ["c"] and off.metrics()["active"] == {}
+    finally:
+        off.shutdown()
+
+def test_to_messages_and_split_system():
+    from neuralizard.providers.base import to_messages, split_system
+    assert to_messages("hi") == [{"role": "user", "content": "hi"}]
+    turns = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+    msgs = to_messages(turns, system="be brief")
+    assert msgs[0] == {"role": "system", "content": "be brief"} and msgs[1:] == turns
+    system, rest = split_system(msgs)
+    assert system == "be brief" and rest == turns
+
+def test_usage_frames_and_cache_counters():
+    from neuralizard.providers.base import Usage
+    from neuralizard.providers.base_streaming import _ChunkParser
+    from neuralizard.providers._usage import parse_usage
+
+    frame = b'data: {"choices":[],"usage":{"prompt_tokens":30,"completion_tokens":5,"prompt_cache_hit_tokens":24}}\n\n'
+    tokens, done = _ChunkParser().feed(frame)
+    assert tokens == [Usage(prompt_tokens=30, response_tokens=5, cached_tokens=24)] and not done
+
+    openai = parse_usage({"prompt_tokens": 2000, "completion_tokens": 10, "prompt_tokens_details": {"cached_tokens": 1920}})
+    assert (openai.prompt_tokens, openai.cached_tokens) == (2000, 1920)
+    claude = parse_usage({"input_tokens": 50, "output_tokens": 7, "cache_read_input_tokens": 1800, "cache_creation_input_tokens": 200})
+    assert (claude.prompt_tokens, claude.cached_tokens, claude.cache_write_tokens) == (2050, 1800, 200)
+
+def test_stopping_early_closes_the_upstream_request():
+    closed = []
+
+    class Upstream(StreamingProviderMixin, AsyncStreamingProviderMixin):
+        def _stream_request(self, prompt, model=None, **kwargs):
+            try:
+                yield from ["a", "b", "c"]
+            finally:
+                closed.append("sync")
+
+        async def _astream_request(self, prompt, model=None, **kwargs):
+            try:
+                for t in ["a", "b", "c"]:
+                    yield t
+                    await asyncio.sleep(10)
+            finally:
+                closed.append("async")
+
+    prov = Upstream()
+    it = prov.stream("hi")
+    assert next(it) == "a"
+    it.close()
+
+    async def cancel_midway():
+        got = []
+
+        async def consume():
+            async for t in astream(prov, "hi"):
+                got.append(t)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return got
+
+    assert asyncio.run(cancel_midway()) == ["a"]
+    assert closed == ["sync", "async"]
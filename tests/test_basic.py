@@ -7,3 +7,65 @@ def test_init_db():
     init_db()
     with session() as s:
         assert s is not None
+
+def test_async_db_url_mapping():
+    from neuralizard.db import async_db_url
+    assert async_db_url("sqlite:///:memory:") == "sqlite+aiosqlite:///:memory:"
+    assert async_db_url("postgresql://u:p@h/db") == "postgresql+psycopg://u:p@h/db"
+    assert async_db_url("postgresql+psycopg://u:p@h/db") == "postgresql+psycopg://u:p@h/db"
+
+def test_history_aggregates_in_one_query():
+    from neuralizard.db import create_conversation, add_message, list_conversation_history
+    init_db()
+    conv = create_conversation(default_provider="openai")
+    add_message(conv.id, "user", "hi", "openai", None)
+    add_message(conv.id, "assistant", "x" * 200, "openai", None)
+    item = next(i for i in list_conversation_history(limit=50) if i["id"] == str(conv.id))
+    assert item["message_count"] == 2
+    assert item["last_message_preview"] == "x" * 160 + "…"
+
+def test_summary_columns_maintained_and_backfilled():
+    from neuralizard.db import (
+        Conversation, create_conversation, add_message, update_message_content,
+        backfill_conversation_summaries,
+    )
+    init_db()
+    conv = create_conversation(default_provider="openai")
+    add_message(conv.id, "user", "hello", "openai", None)
+    reply = add_message(conv.id, "assistant", "", "openai", None)
+    update_message_content(reply.id, content="world")
+    with session() as s:
+        c = s.get(Conversation, conv.id)
+        assert (c.message_count, c.last_message_preview) == (2, "world")
+        assert c.last_message_at is not None
+        c.message_count = 0
+        c.last_message_preview = None
+        s.commit()
+    backfill_conversation_summaries()
+    with session() as s:
+        c = s.get(Conversation, conv.id)
+        assert (c.message_count, c.last_message_preview) == (2, "world")
+
+def test_keyset_pagination_for_history_and_messages():
+    from neuralizard.db import (
+        create_conversation, add_message, list_conversation_history, list_conversation_messages,
+        history_cursor, messages_cursor,
+    )
+    init_db()
+    conv = create_conversation(default_provider="openai", user_id="pager")
+    other = create_conversation(default_provider="openai", user_id="pager")
+    for i in range(5):
+        add_message(conv.id, "user", f"m{i}", "openai", None)
+    add_message(other.id, "user", "newest", "openai", None)
+
+    first = list_conversation_history(limit=1, user_id="pager")
+    assert [i["id"] for i in first] == [str(other.id)]
+    second = list_conversation_history(limit=1, user_id="pager", before=history_cursor(first, 1))
+    assert [i["id"] for i in second] == [str(conv.id)]
+    assert list_conversation_history(limit=1, user_id="pager", before=history_cursor(second, 1)) == []
+
+    newest = list_conversation_messages(conv.id, limit=3)
+    assert [m.content for m in newest] == ["m2", "m3", "m4"]
+    older = list_conversation_messages(conv.id, limit=3, before=messages_cursor(newest, 3))
+    assert [m.content for m in older] == ["m0", "m1"]
+    assert messages_cursor(older, 3) is None
@@ -92,9 +92,33 @@ class DummySession:
 
 def dummy_session():
     return DummySession()
+
+async def dummy_acreate_conversation(default_provider=None):
+    return dummy_create_conversation(default_provider=default_provider)
+
+async def dummy_aadd_message_rating(*args, **kwargs):
+    return dummy_add_message_rating(*args, **kwargs)
+
+async def dummy_alist_conversation_history(limit=50, offset=0, user_id=None, before=None):
+    return []
+
+async def dummy_alist_conversation_messages(conversation_id, limit=None, before=None):
+    return []
+
+async def dummy_adelete_conversation(conversation_id):
+    cid = str(conversation_id)
+    if cid in deleted_conversations:
+        raise Exception("Conversation not found")
+    deleted_conversations.add(cid)
+
+async def dummy_arename_conversation(conversation_id, title):
+    return str(conversation_id) not in deleted_conversations
+
+async def dummy_aconversation_needs_title(conversation_id):
+    return False
 # Patch provider logic to always return a dummy result
 from neuralizard.providers import get_provider
-def dummy_get_provider(name: str):
+def dummy_get_provider(name: str, **options):
     if name != "test":
         raise ValueError(f"Unknown provider: {name}")
     class DummyProvider:
@@ -119,6 +143,13 @@ patch_targets = [
     ("neuralizard.db.update_message_content", dummy_update_message_content),
     ("neuralizard.db.add_message_rating", dummy_add_message_rating),
     ("neuralizard.db.session", dummy_session),
+    ("neuralizard.db.acreate_conversation", dummy_acreate_conversation),
+    ("neuralizard.db.aadd_message_rating", dummy_aadd_message_rating),
+    ("neuralizard.db.alist_conversation_history", dummy_alist_conversation_history),
+    ("neuralizard.db.alist_conversation_messages", dummy_alist_conversation_messages),
+    ("neuralizard.db.adelete_conversation", dummy_adelete_conversation),
+    ("neuralizard.db.arename_conversation", dummy_arename_conversation),
+    ("neuralizard.db.aconversation_needs_title", dummy_aconversation_needs_title),
 ]
 
 patchers = [patch(target, new=func) for target, func in patch_targets]
@@ -175,8 +206,8 @@ patch_targets = [
     ("neuralizard.db.add_message", dummy_add_message),
 ]
 
-patchers = [patch(target, new=func) for target, func in patch_targets]
-for p in patchers:
+patchers += [patch(target, new=func) for target, func in patch_targets]
+for p in patchers[-len(patch_targets):]:
     p.start()
 
 # Patch environment for tests
@@ -190,6 +221,12 @@ app = FastAPI()
 app.include_router(router)
 client = TestClient(app)
 
+# The router bound the dummies on import; undo the module-level patches so
+# they do not leak into test modules that run after collection.
+for p in reversed(patchers):
+    p.stop()
+patch_provider.stop()
+
 def test_ping():
     resp = client.get("/chat/ping")
     assert resp.status_code == 200
@@ -215,6 +252,12 @@ def test_stream_valid():
     assert resp.headers["content-type"].startswith("text/plain")
     assert "Echo: Hello" in resp.text
 
+def test_complete_accepts_messages():
+    req = {"messages": [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hey"}], "provider": "test"}
+    resp = client.post("/chat/complete", json=req)
+    assert resp.status_code == 200
+    assert "'role': 'assistant'" in resp.json()["text"]
+
 def test_stream_invalid_provider():
     req = {"prompt": "Hello", "provider": "not_a_provider"}
     resp = client.post("/chat/stream", json=req)
@@ -264,3 +307,241 @@ def test_websocket_delete_conversation():
         assert msg3["type"] in ("error", "conversation_deleted")
         if msg3["type"] == "error":
             assert "Conversation not found" in msg3["error"] or "Delete failed" in msg3["error"]
+
+def test_metrics():
+    resp = client.get("/chat/metrics")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert "offload" in body
+    assert body["offload"]["max_workers"] > 0
+
+class RecordingWriter:
+    def __init__(self):
+        self.updates = []
+
+    async def add_message(self, **fields):
+        class Ref:
+            async def wait(self):
+                return 1
+        return Ref()
+
+    async def update_message(self, ref, **fields):
+        self.updates.append(fields)
+
+def test_websocket_stop_cancels_stream_and_keeps_partial(monkeypatch):
+    import asyncio
+    import neuralizard.api.routes.chat as chat_module
+    closed = []
+
+    class SlowProvider:
+        async def astream(self, prompt, model=None, **kwargs):
+            try:
+                yield "partial"
+                await asyncio.sleep(30)
+                yield "never"
+            finally:
+                closed.append(True)
+
+    writer = RecordingWriter()
+    monkeypatch.setattr(chat_module, "get_provider", lambda name, **options: SlowProvider())
+    monkeypatch.setattr(chat_module, "get_message_writer", lambda: writer)
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"prompt": "Hello", "provider": "test", "conversation_id": str(uuid.uuid4())})
+        assert ws.receive_json()["type"] == "start"
+        assert ws.receive_json()["data"] == "partial"
+        ws.send_json({"type": "stop"})
+        done = ws.receive_json()
+    assert done["type"] == "done" and done["status"] == "cancelled"
+    assert closed == [True]
+    assert writer.updates[-1]["status"] == "cancelled"
+    assert writer.updates[-1]["content"] == "partial"
+
+def test_websocket_multiplexes_prompts_by_request_id(monkeypatch):
+    import asyncio
+    import neuralizard.api.routes.chat as chat_module
+
+    class Provider:
+        async def astream(self, prompt, model=None, **kwargs):
+            if model == "slow":
+                yield "slow start"
+                await asyncio.sleep(30)
+            yield f"answer from {model}"
+
+    monkeypatch.setattr(chat_module, "get_provider", lambda name, **options: Provider())
+    monkeypatch.setattr(chat_module, "get_message_writer", lambda: RecordingWriter())
+    monkeypatch.setattr(chat_module.settings, "ws_max_concurrent_prompts", 2)
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"prompt": "a", "model": "slow", "request_id": "r1", "conversation_id": str(uuid.uuid4())})
+        assert ws.receive_json()["type"] == "start"
+        assert ws.receive_json() == {"type": "delta", "data": "slow start", "request_id": "r1"}
+        # r1 is still streaming: a second prompt, a control frame and the limit are all served
+        ws.send_json({"prompt": "b", "model": "fast", "request_id": "r2", "conversation_id": str(uuid.uuid4())})
+        frames = [ws.receive_json() for _ in range(3)]
+        assert [f["type"] for f in frames] == ["start", "delta", "done"]
+        assert all(f["request_id"] == "r2" for f in frames)
+        ws.send_json({"type": "providers"})
+        ws.send_json({"prompt": "c", "model": "slow", "request_id": "r3", "conversation_id": str(uuid.uuid4())})
+        ws.send_json({"prompt": "d", "request_id": "r4", "conversation_id": str(uuid.uuid4())})
+        frames = [ws.receive_json() for _ in range(4)]
+        ws.send_json({"type": "stop", "request_id": "r1"})
+        frames.append(ws.receive_json())
+        ws.send_json({"type": "stop"})
+        frames.append(ws.receive_json())
+    by_rid = {}
+    for f in frames:
+        by_rid.setdefault(f.get("request_id"), []).append(f)
+    assert by_rid[None][0]["type"] == "providers"
+    assert [f["type"] for f in by_rid["r4"]] == ["error"]
+    assert "Too many concurrent prompts" in by_rid["r4"][0]["error"]
+    assert [f["type"] for f in by_rid["r3"]] == ["start", "delta", "done"]
+    assert by_rid["r1"] == [{"type": "done", "message_id": 1, "status": "cancelled", "request_id": "r1"}]
+    assert frames[4]["request_id"] == "r1" and frames[5]["request_id"] == "r3"
+
+
+def test_websocket_title_generation_does_not_hold_the_prompt_slot(monkeypatch):
+    import asyncio
+    import neuralizard.api.routes.chat as chat_module
+    second_prompt = asyncio.Event()
+
+    class Provider:
+        async def astream(self, prompt, model=None, **kwargs):
+            if prompt[-1]["content"] == "b":
+                second_prompt.set()
+            yield f"answer to {prompt[-1]['content']}"
+
+    async def needs_title(cid):
+        return True
+
+    async def slow_title(prov, prompt, **kwargs):
+        # the title comes back once the next prompt was admitted (or, if it was refused, a little later)
+        try:
+            await asyncio.wait_for(second_prompt.wait(), 2)
+        except asyncio.TimeoutError:
+            pass
+        return type("Result", (), {"text": "A title"})()
+
+    async def set_title(cid, title):
+        return True
+
+    monkeypatch.setattr(chat_module, "get_provider", lambda name, **options: Provider())
+    monkeypatch.setattr(chat_module, "get_message_writer", lambda: RecordingWriter())
+    monkeypatch.setattr(chat_module, "aconversation_needs_title", needs_title)
+    monkeypatch.setattr(chat_module, "acomplete_cached", slow_title)
+    monkeypatch.setattr(chat_module, "aset_title_if_missing", set_title)
+    monkeypatch.setattr(chat_module.settings, "ws_max_concurrent_prompts", 1)
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"prompt": "a", "request_id": "r1", "conversation_id": str(uuid.uuid4())})
+        assert [ws.receive_json()["type"] for _ in range(3)] == ["start", "delta", "done"]
+        ws.send_json({"prompt": "b", "request_id": "r2", "conversation_id": str(uuid.uuid4())})
+        frames = []
+        while not frames or not ({"done", "error"} & {f["type"] for f in frames if f.get("request_id") == "r2"}
+                                 and any(f["type"] == "conversation_title" for f in frames)):
+            frames.append(ws.receive_json())
+    assert [f["type"] for f in frames if f.get("request_id") == "r2"] == ["start", "delta", "done"]
+    assert [f["title"] for f in frames if f["type"] == "conversation_title"] == ["A title"]
+
+
+def test_websocket_compare_streams_targets_concurrently(monkeypatch):
+    import asyncio
+    import neuralizard.api.routes.chat as chat_module
+
+    class Provider:
+        def __init__(self, name):
+            self.name = name
+
+        async def astream(self, prompt, model=None, **kwargs):
+            await asyncio.sleep(0.3)
+            yield f"{self.name}/{model}"
+
+    writer = RecordingWriter()
+    monkeypatch.setattr(chat_module, "get_provider", lambda name, **options: Provider(name))
+    monkeypatch.setattr(chat_module, "get_message_writer", lambda: writer)
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.receive_json()
+        ws.send_json({
+            "type": "compare", "prompt": "hi", "request_id": "c1", "conversation_id": str(uuid.uuid4()),
+            "targets": [{"provider": "A", "model": "m1"}, {"provider": "b", "model": "m2"}],
+        })
+        frames = [ws.receive_json() for _ in range(6)]
+    assert frames[0]["type"] == "start" and [t["provider"] for t in frames[0]["targets"]] == ["a", "b"]
+    deltas = {f["index"]: f["data"] for f in frames if f["type"] == "delta"}
+    assert deltas == {0: "a/m1", 1: "b/m2"}
+    done = [f for f in frames if f["type"] == "done"]
+    assert sorted(f["provider"] for f in done) == ["a", "b"]
+    assert all(f["status"] == "complete" and "first_token_ms" in f for f in done)
+    # both streams slept in parallel: wall time is one sleep, not two (with room for a GC pause)
+    assert frames[-1]["type"] == "compare_done" and frames[-1]["latency_ms"] < 600
+    assert sorted(u["content"] for u in writer.updates) == ["a/m1", "b/m2"]
+
+
+def test_websocket_compare_reports_a_failing_target_as_error(monkeypatch):
+    import neuralizard.api.routes.chat as chat_module
+
+    class Provider:
+        def __init__(self, name):
+            self.name = name
+
+        async def astream(self, prompt, model=None, **kwargs):
+            yield f"{self.name} partial"
+            if self.name == "b":
+                raise RuntimeError("upstream 503")
+
+    writer = RecordingWriter()
+    monkeypatch.setattr(chat_module, "get_provider", lambda name, **options: Provider(name))
+    monkeypatch.setattr(chat_module, "get_message_writer", lambda: writer)
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.receive_json()
+        ws.send_json({
+            "type": "compare", "prompt": "hi", "request_id": "c1", "conversation_id": str(uuid.uuid4()),
+            "targets": [{"provider": "a"}, {"provider": "b"}],
+        })
+        frames = [ws.receive_json() for _ in range(6)]
+    done = {f["provider"]: f for f in frames if f["type"] == "done"}
+    assert done["a"]["status"] == "complete" and "error" not in done["a"]
+    assert done["b"]["status"] == "error" and done["b"]["error"] == "upstream 503"
+    assert frames[-1]["type"] == "compare_done"
+    saved = {u["content"]: u for u in writer.updates}
+    assert saved["a partial"]["status"] == "complete" and saved["a partial"].get("error") is None
+    assert saved["b partial"]["status"] == "error" and saved["b partial"]["error"] == "upstream 503"
+
+
+def test_compare_endpoint_rejects_bad_targets():
+    resp = client.post("/chat/compare", json={"prompt": "hi", "targets": []})
+    assert resp.status_code == 400
+    resp = client.post("/chat/compare", json={"prompt": "hi", "targets": [{"provider": "nope"}]})
+    assert resp.status_code == 400
+
+
+def test_websocket_page_limits_are_clamped(monkeypatch):
+    import neuralizard.api.routes.chat as chat_module
+    asked = []
+
+    async def history(limit=50, offset=0, user_id=None, before=None):
+        asked.append(limit)
+        return []
+
+    async def messages(conversation_id, limit=None, before=None):
+        asked.append(limit)
+        return []
+
+    monkeypatch.setattr(chat_module, "alist_conversation_history", history)
+    monkeypatch.setattr(chat_module, "alist_conversation_messages", messages)
+    monkeypatch.setattr(chat_module.settings, "max_page_size", 200)
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"type": "history", "limit": 1000000})
+        assert ws.receive_json()["limit"] == 200
+        ws.send_json({"type": "history", "limit": -5, "offset": -3})
+        frame = ws.receive_json()
+        assert frame["limit"] == 1 and frame["offset"] == 0
+        # a bad offset is an error frame; the socket stays open
+        ws.send_json({"type": "history", "offset": "x"})
+        assert ws.receive_json() == {"type": "error", "error": "Invalid offset: 'x'"}
+        ws.send_json({"type": "conversation", "id": str(uuid.uuid4()), "limit": 5000})
+        assert ws.receive_json()["type"] == "conversation"
+        ws.send_json({"type": "conversation", "id": str(uuid.uuid4()), "limit": "all"})
+        assert ws.receive_json() == {"type": "error", "error": "Invalid limit: 'all'"}
+    assert asked == [200, 1, 200]
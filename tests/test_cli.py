@@ -0,0 +1,38 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+from typer.testing import CliRunner
+
+from neuralizard import cli
+from neuralizard.db import init_db
+from neuralizard.providers.base import LLMResult
+
+class FakeProvider:
+    name = "openai"
+    default_model = "fake-1"
+
+    def complete(self, prompt, model=None, **_):
+        return LLMResult(text=f"echo: {prompt}", provider=self.name, model=model or self.default_model,
+                         prompt_tokens=3, response_tokens=4, latency_ms=5)
+
+def test_ask_rate_log_use_messages(monkeypatch):
+    init_db()
+    monkeypatch.setattr(cli, "get_provider", lambda name: FakeProvider())
+    monkeypatch.setattr(cli, "retry_call", lambda name, fn: fn())
+    runner = CliRunner()
+
+    res = runner.invoke(cli.app, ["ask", "ping question", "-p", "openai"])
+    assert res.exit_code == 0, res.output
+    assert "echo: ping question" in res.output
+    msg_id = res.output.split("#", 1)[1].split()[0]
+
+    res = runner.invoke(cli.app, ["rate", msg_id, "good"])
+    assert res.exit_code == 0, res.output
+
+    res = runner.invoke(cli.app, ["log", "-n", "1"])
+    assert res.exit_code == 0, res.output
+    assert f"#{msg_id}" in res.output
+    assert "[good]" in res.output
+    assert "ping question" in res.output
+
+    assert runner.invoke(cli.app, ["rate", "999999", "bad"]).exit_code != 0
@@ -0,0 +1,67 @@
+import os
+os.environ.setdefault("DB_URL", "sqlite:///:memory:")
+
+from neuralizard.context import (
+    ConversationContext, context_window, context_budget, count_tokens, get_encoder,
+)
+
+
+def test_context_window_prefix_and_provider_fallback():
+    assert context_window("gpt-4o-mini") == 128_000
+    assert context_window("gpt-4") == 8_192
+    assert context_window("claude-3-5-sonnet-latest") == 200_000
+    assert context_window("unknown-model", "deepseek") == 64_000
+    assert context_window(None) > 0
+
+
+def test_budget_respects_reserve_and_cap(monkeypatch):
+    from neuralizard.config import settings
+    monkeypatch.setattr(settings, "context_max_tokens", 0)
+    monkeypatch.setattr(settings, "context_reserve_tokens", 192)
+    assert context_budget("gpt-4") == 8_000
+    monkeypatch.setattr(settings, "context_max_tokens", 500)
+    assert context_budget("gpt-4") == 500
+
+
+def test_window_fills_newest_first_within_budget():
+    ctx = ConversationContext()
+    for i in range(10):
+        ctx.append("user" if i % 2 == 0 else "assistant", f"turn {i} " + "word " * 50)
+    enc = get_encoder("gpt-4o")
+    per_turn = ctx.messages[-1].tokens(enc)
+
+    win = ctx.window("gpt-4o", budget=per_turn * 3 + 10)
+    assert win.tokens <= win.budget
+    assert [m.content.split()[1] for m in win.messages] == ["7", "8", "9"]
+    assert win.dropped == 7 and not win.truncated
+    assert win.render().endswith("Assistant:")
+
+
+def test_token_counts_are_cached_per_message():
+    ctx = ConversationContext()
+    ctx.append("user", "hello there")
+    calls = []
+    enc = get_encoder("gpt-4o")
+
+    class Counting:
+        name = enc.name
+        def count(self, text):
+            calls.append(text)
+            return enc.count(text)
+
+    first = ctx.messages[0]
+    n = first.tokens(Counting())
+    assert first.tokens(Counting()) == n
+    assert len(calls) == 1
+
+
+def test_oversized_latest_message_is_truncated():
+    ctx = ConversationContext()
+    ctx.append("user", "old question")
+    ctx.append("user", "x " * 5000)
+    win = ctx.window("gpt-4o", budget=100)
+    assert win.truncated and len(win.messages) == 1
+    assert win.tokens <= 100
+    assert count_tokens(win.messages[0].content, "gpt-4o") < 100
+    # the stored history keeps the full message
+    assert len(ctx.messages[-1].content) == 10000
@@ -0,0 +1,127 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import pytest
+from neuralizard.providers.governor import (
+    MemoryBucketStore, RateGovernor, RateLimitExceeded, SQLiteBucketStore, parse_rate_headers,
+)
+
+
+def test_unknown_providers_pass_through():
+    gov = RateGovernor(MemoryBucketStore())
+    assert all(gov.try_acquire("openai", "k", 10_000) == 0.0 for _ in range(100))
+
+
+def test_request_and_token_buckets():
+    gov = RateGovernor(MemoryBucketStore(), limits={"openai": {"rpm": 2, "tpm": 1000}})
+    assert gov.try_acquire("openai", "k", 100) == 0.0
+    assert gov.try_acquire("openai", "k", 100) == 0.0
+    assert gov.try_acquire("openai", "k", 100) == pytest.approx(30.0, abs=0.5)
+    # another key has its own budget
+    assert gov.try_acquire("openai", "other", 900) == 0.0
+    assert gov.try_acquire("openai", "other", 900) > 0
+
+
+def test_queues_short_waits_and_sheds_long_ones():
+    gov = RateGovernor(MemoryBucketStore(), limits={"xai": {"rpm": 600}}, max_wait=1.0)
+    for _ in range(600):
+        gov.try_acquire("xai", "k", 1)
+    waited = asyncio.run(gov.acquire("xai", "k", 1))
+    assert 0.05 < waited < 1.0
+
+    gov = RateGovernor(MemoryBucketStore(), limits={"xai": {"rpm": 1}}, max_wait=1.0)
+    asyncio.run(gov.acquire("xai", "k", 1))
+    with pytest.raises(RateLimitExceeded) as exc:
+        asyncio.run(gov.acquire("xai", "k", 1))
+    assert exc.value.retry_after > 50
+    stats = gov.stats()["xai"]
+    assert (stats["admitted"], stats["shed"]) == (1, 1)
+
+
+def test_headers_calibrate_the_buckets():
+    assert parse_rate_headers({"X-RateLimit-Limit-Requests": "60", "x-ratelimit-remaining-tokens": "5"}, 200) == {
+        "rpm": 60.0, "tok": 5.0,
+    }
+    assert parse_rate_headers({"x-ratelimit-reset-requests": "6m0s"}, 429)["retry_after"] == 360.0
+
+    gov = RateGovernor(MemoryBucketStore())
+    gov.observe_response("https://api.openai.com/v1/chat/completions", {"Authorization": "Bearer k"},
+                         {"x-ratelimit-limit-requests": "60", "x-ratelimit-remaining-requests": "0"}, 200)
+    assert gov.try_acquire("openai", "k", 1) == pytest.approx(1.0, abs=0.1)
+    gov.observe("openai", "k", {"retry-after": "20"}, 429)
+    assert gov.try_acquire("openai", "k", 1) == pytest.approx(20.0, abs=0.5)
+
+
+def test_admission_skips_providers_without_a_bucket(monkeypatch, tmp_path):
+    from neuralizard.providers import base_streaming, governor
+
+    class Store(MemoryBucketStore):
+        updates = 0
+
+        def update(self, key, fn, default):
+            Store.updates += 1
+            return super().update(key, fn, default)
+
+    counted = []
+    monkeypatch.setattr(governor, "count_tokens", lambda text, model=None: counted.append(text) or 7)
+    monkeypatch.setattr(governor.settings, "rate_limit_enabled", True)
+    gov = RateGovernor(Store(), limits={"xai": {"tpm": 1000}}, output_tokens=10)
+    monkeypatch.setattr(governor, "_GOVERNOR", gov)
+
+    class Provider:
+        def __init__(self, name, api_key="k"):
+            self.name, self.api_key = name, api_key
+
+    admit = base_streaming._admit
+    asyncio.run(admit(Provider("openai"), "hello", None, {}))
+    assert Store.updates == 0 and counted == []  # no limit configured, no headers seen
+    gov.observe("openai", "k", {"x-ratelimit-remaining-requests": "5"}, 200)
+    assert gov.limited("openai", "k") and not gov.limited("openai", "other")
+    asyncio.run(admit(Provider("openai"), "hello", None, {}))
+    assert counted == ["hello"]
+    kwargs = {"prompt_tokens": 40, "temperature": 0}
+    asyncio.run(admit(Provider("xai"), "hello", None, kwargs))
+    # the caller's count is used (and not passed on to the provider)
+    assert counted == ["hello"] and kwargs == {"temperature": 0}
+    assert gov.store.update(governor.key_id("xai", "k"), lambda st: st["tok"], None) == 950
+    # a new worker knows the buckets earlier ones stored
+    path = str(tmp_path / "rate.db")
+    RateGovernor(SQLiteBucketStore(path)).observe("openai", "k", {"x-ratelimit-remaining-requests": "5"}, 200)
+    assert RateGovernor(SQLiteBucketStore(path)).limited("openai", "k")
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "rate.db")
+    limits = {"cohere": {"rpm": 3}}
+    worker_a = RateGovernor(SQLiteBucketStore(path), limits=limits)
+    worker_b = RateGovernor(SQLiteBucketStore(path), limits=limits)
+    results = [w.try_acquire("cohere", "k", 1) for w in (worker_a, worker_b, worker_a, worker_b)]
+    assert results[:3] == [0.0, 0.0, 0.0] and results[3] > 0
+
+
+def test_async_response_hook_observes_off_the_event_loop(monkeypatch):
+    import threading
+    import httpx
+    from neuralizard.providers import _http, governor
+
+    seen = []
+
+    class Recorder:
+        def observe_response(self, url, request_headers, headers, status):
+            seen.append(threading.get_ident())
+
+    monkeypatch.setattr(governor.settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(governor, "_GOVERNOR", Recorder())
+    request = httpx.Request("GET", "https://api.openai.com/v1/models")
+    plain = httpx.Response(200, request=request)
+    limited = httpx.Response(200, headers={"x-ratelimit-remaining-requests": "10"}, request=request)
+
+    async def run():
+        await _http._aobserve(plain)  # nothing to record: not even a thread hop
+        assert seen == []
+        await _http._aobserve(limited)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert seen and seen[0] != loop_thread
@@ -0,0 +1,110 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+from neuralizard.providers.base import StreamError
+from neuralizard.providers.hedging import FirstTokenTracker, HedgePolicy, HedgeStats, hedged_astream
+
+
+class Provider:
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.closed = False
+
+    async def astream(self, prompt, model=None, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+            yield f"{self.name} "
+            yield "answer"
+        finally:
+            self.closed = True
+
+
+def _run(primary, backup, policy, tracker=None):
+    tracker = tracker or FirstTokenTracker()
+    stats = HedgeStats()
+    outcome: dict = {}
+
+    async def collect():
+        gen = hedged_astream(
+            primary, backup, "hi", route="ws", policy=policy, primary_name="Primary", model="m",
+            tracker=tracker, stats=stats, outcome=outcome,
+        )
+        return "".join([t async for t in gen])
+
+    return asyncio.run(collect()), outcome, stats.stats()["ws"]
+
+
+def test_fast_primary_is_not_hedged():
+    policy = HedgePolicy(backup_provider="backup", default_delay_ms=200, min_delay_ms=0)
+    text, outcome, stats = _run(Provider("primary", 0.0), Provider("backup", 0.0), policy)
+    assert text == "primary answer"
+    assert outcome["hedged"] is False and outcome["winner"] == "primary"
+    assert (stats["hedged"], stats["wasted_tokens"]) == (0, 0)
+
+
+def test_slow_primary_loses_to_backup_and_is_cancelled():
+    primary, backup = Provider("primary", 5.0), Provider("backup", 0.0)
+    policy = HedgePolicy(backup_provider="backup", backup_model="b", default_delay_ms=20, min_delay_ms=0)
+    text, outcome, stats = _run(primary, backup, policy)
+    assert text == "backup answer"
+    assert outcome == {"provider": "backup", "model": "b", "hedged": True, "winner": "backup",
+                       "first_token_ms": outcome["first_token_ms"]}
+    assert primary.closed
+    assert stats["hedge_rate"] == 1.0 and stats["backup_win_rate"] == 1.0 and stats["wasted_tokens"] > 0
+
+
+def test_delay_follows_observed_percentile():
+    tracker = FirstTokenTracker()
+    tracker.seed(("primary", "m", ms) for ms in range(10, 110, 10))
+    policy = HedgePolicy(backup_provider="backup", percentile=0.9, min_samples=5, min_delay_ms=0)
+    assert policy.delay_ms(tracker, "Primary", "m") == 100
+    assert policy.delay_ms(tracker, "primary", "other") == policy.default_delay_ms
+    assert HedgePolicy(backup_provider="b", min_delay_ms=500, min_samples=5).delay_ms(tracker, "primary", "m") == 500
+
+
+class Failing:
+    def __init__(self, mode):
+        self.mode = mode
+
+    async def astream(self, prompt, model=None, **kwargs):
+        if self.mode == "raise":
+            raise RuntimeError("shed")
+        if self.mode == "error_text":
+            yield StreamError("[stream error: overloaded]")
+
+
+def test_primary_that_errors_early_falls_through_to_backup():
+    # the hedge delay is long: the backup must start because the primary failed, not because it was slow
+    policy = HedgePolicy(backup_provider="backup", default_delay_ms=5000, min_delay_ms=5000)
+    for mode in ("error_text", "raise"):
+        text, outcome, stats = _run(Failing(mode), Provider("backup", 0.0), policy)
+        assert text == "backup answer" and outcome["winner"] == "backup"
+
+
+def test_answer_that_looks_like_an_error_still_wins():
+    class Bracketed(Provider):
+        async def astream(self, prompt, model=None, **kwargs):
+            yield "[Error handling] "
+            yield "use try/except"
+
+    policy = HedgePolicy(backup_provider="backup", default_delay_ms=5000, min_delay_ms=5000)
+    text, outcome, _ = _run(Bracketed("primary", 0.0), Provider("backup", 0.0), policy)
+    assert text == "[Error handling] use try/except" and outcome["winner"] == "primary"
+
+
+def test_primary_that_ends_empty_falls_through_to_backup():
+    policy = HedgePolicy(backup_provider="backup", default_delay_ms=5000, min_delay_ms=5000)
+    text, outcome, _ = _run(Failing("empty"), Provider("backup", 0.0), policy)
+    assert text == "backup answer" and outcome["winner"] == "backup"
+
+
+def test_both_lanes_failing_surfaces_the_primary_error():
+    import pytest
+
+    policy = HedgePolicy(backup_provider="backup", default_delay_ms=5000, min_delay_ms=5000)
+    with pytest.raises(RuntimeError, match="shed"):
+        _run(Failing("raise"), Failing("empty"), policy)
+    text, outcome, _ = _run(Failing("error_text"), Failing("empty"), policy)
+    assert text == "[stream error: overloaded]" and outcome == {}
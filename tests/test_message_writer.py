@@ -0,0 +1,63 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+from neuralizard import db
+
+def test_writer_batches_and_resolves_ids(monkeypatch):
+    batches = []
+
+    def fake_apply(ops):
+        batches.append([op[0] for op in ops])
+        return [(ref, 100 + i) for i, (kind, ref, _f) in enumerate(ops) if kind == "insert"]
+
+    monkeypatch.setattr(db, "_apply_message_ops", fake_apply)
+
+    async def run():
+        writer = db.MessageWriter(batch_size=10, flush_interval=0.01, max_pending=100)
+        user = await writer.add_message(role="user", content="hi")
+        assistant = await writer.add_message(role="assistant", content="")
+        await writer.update_message(assistant, content="hello", latency_ms=None)
+        ids = (await user.wait(), await assistant.wait())
+        await writer.stop()
+        return ids
+
+    assert asyncio.run(run()) == (100, 101)
+    # all three operations were grouped into a single transaction
+    assert batches == [["insert", "insert", "update"]]
+
+def test_writer_drains_on_stop(monkeypatch):
+    seen = []
+    monkeypatch.setattr(db, "_apply_message_ops", lambda ops: seen.extend(ops) or [])
+
+    async def run():
+        writer = db.MessageWriter(batch_size=2, flush_interval=0.5, max_pending=100)
+        for i in range(5):
+            await writer.update_message(i, content=str(i))
+        await writer.stop()
+
+    asyncio.run(run())
+    assert [op[1] for op in seen] == [0, 1, 2, 3, 4]
+
+def test_writer_retries_ops_individually(monkeypatch):
+    calls = []
+
+    def flaky_apply(ops):
+        calls.append(len(ops))
+        if len(ops) > 1:
+            raise RuntimeError("batch failed")
+        kind, ref, _f = ops[0]
+        return [(ref, 7)] if kind == "insert" else []
+
+    monkeypatch.setattr(db, "_apply_message_ops", flaky_apply)
+
+    async def run():
+        writer = db.MessageWriter(batch_size=10, flush_interval=0.01, max_pending=100)
+        ref = await writer.add_message(role="user", content="hi")
+        await writer.update_message(ref, content="edited")
+        msg_id = await ref.wait()
+        await writer.stop()
+        return msg_id
+
+    assert asyncio.run(run()) == 7
+    assert calls == [2, 1, 1]
@@ -0,0 +1,90 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import threading
+import time
+from neuralizard.providers.model_catalog import ModelCatalog
+
+
+class SlowFetcher:
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [f"{name}-model-{n}"]
+
+
+def test_fresh_entries_are_served_from_cache():
+    fetch = SlowFetcher()
+    catalog = ModelCatalog(fetch, ttl=60)
+    assert catalog.get("openai") == ["openai-model-1"]
+    assert catalog.get("openai") == ["openai-model-1"]
+    assert asyncio.run(catalog.aget("openai")) == ["openai-model-1"]
+    assert fetch.calls == 1
+    assert catalog.get("openai", use_cache=False) == ["openai-model-2"]
+
+
+def test_stale_entry_is_served_while_refreshing_in_background():
+    fetch = SlowFetcher(delay=0.05)
+    catalog = ModelCatalog(fetch, ttl=0.01)
+    catalog.get("openai")
+    time.sleep(0.02)
+
+    async def run():
+        stale = await catalog.aget("openai")
+        assert catalog.stats()["refreshing"] == ["openai"]
+        fresh = await catalog.refresh("openai")
+        return stale, fresh
+
+    stale, fresh = asyncio.run(run())
+    assert stale == ["openai-model-1"] and fresh == ["openai-model-2"]
+    assert fetch.calls == 2
+
+
+def test_concurrent_refreshes_share_one_fetch():
+    fetch = SlowFetcher(delay=0.05)
+    catalog = ModelCatalog(fetch, ttl=60)
+
+    async def run():
+        return await asyncio.gather(*(catalog.aget("anthropic") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert all(r == ["anthropic-model-1"] for r in results)
+    assert fetch.calls == 1
+    assert catalog.stats()["coalesced"] == 4
+
+
+def test_failures_keep_previous_list_or_fallback():
+    fetch = SlowFetcher(fail=True)
+    catalog = ModelCatalog(fetch, ttl=60, error_ttl=60, fallback={"xai": ["grok-2"]})
+    assert catalog.get("xai") == ["grok-2"]
+    assert catalog.get("xai") == ["grok-2"]
+    assert fetch.calls == 1  # errors are cached for error_ttl
+    assert catalog.stats()["errors"] == 1
+
+
+def test_persisted_catalog_serves_cold_start(tmp_path):
+    path = str(tmp_path / "models.json")
+    ModelCatalog(SlowFetcher(), ttl=60, path=path).get("mistral")
+
+    fetch = SlowFetcher(delay=0.05)
+    cold = ModelCatalog(fetch, ttl=60, path=path)
+
+    async def run():
+        first = await cold.aget("mistral")
+        await cold.refresh("mistral")
+        return first
+
+    assert asyncio.run(run()) == ["mistral-model-1"]
+    assert cold.get("mistral") == ["mistral-model-1"]
+    assert fetch.calls == 1
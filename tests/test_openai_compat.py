@@ -0,0 +1,108 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import json
+import httpx
+import pytest
+from neuralizard.providers.base import ChatDelta, Usage
+from neuralizard.providers.openai_compat import OpenAICompatProvider, iter_chat_deltas
+
+FRAMES = [
+    {"choices": [{"delta": {"role": "assistant", "content": ""}, "finish_reason": None}]},
+    {"choices": [{"delta": {"content": "Hel"}, "finish_reason": None}]},
+    {"choices": [{"delta": {"content": "lo"}, "finish_reason": "stop"}]},
+    {"choices": [], "usage": {"prompt_tokens": 9, "completion_tokens": 2}},
+]
+BODY = "".join(f"data: {json.dumps(f)}\n\n" for f in FRAMES).encode() + b"data: [DONE]\n\n"
+
+
+def _chunks(size=7):
+    return [BODY[i:i + size] for i in range(0, len(BODY), size)]
+
+
+class _Body(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Response body delivered in small network-sized chunks."""
+
+    def __iter__(self):
+        yield from _chunks()
+
+    async def __aiter__(self):
+        for chunk in _chunks():
+            yield chunk
+
+
+def _local(requests: list) -> OpenAICompatProvider:
+    prov = OpenAICompatProvider(name="local", base_url="http://llm.local:8000", default_model="llama",
+                                api_key_required=False)
+
+    def handler(request):
+        requests.append(json.loads(request.content) if request.content else {})
+        if request.url.path == "/v1/models":
+            return httpx.Response(200, json={"data": [{"id": "llama"}, {"id": "qwen"}]})
+        if not requests[-1].get("stream"):
+            return httpx.Response(200, json={"choices": [{"message": {"content": " hi "}}],
+                                             "usage": {"prompt_tokens": 3, "completion_tokens": 1}})
+        return httpx.Response(200, stream=_Body(), headers={"content-type": "text/event-stream"})
+
+    prov._client = httpx.Client(base_url=prov.base_url, transport=httpx.MockTransport(handler))
+    prov._aclient = httpx.AsyncClient(base_url=prov.base_url, transport=httpx.MockTransport(handler))
+    return prov
+
+
+def test_raw_bytes_decode_into_typed_deltas():
+    deltas = list(iter_chat_deltas(_chunks()))
+    assert [d.content for d in deltas] == ["", "Hel", "lo", ""]
+    assert deltas[2].finish_reason == "stop"
+    assert deltas[3].usage == Usage(prompt_tokens=9, response_tokens=2)
+
+
+def test_stream_yields_text_then_usage_with_finish_reason():
+    sent: list = []
+    prov = _local(sent)
+    want = ["Hel", "lo", Usage(prompt_tokens=9, response_tokens=2, finish_reason="stop")]
+    assert list(prov.stream("hi", temperature=0.2)) == want
+
+    async def collect():
+        return [t async for t in prov.astream("hi")]
+
+    assert asyncio.run(collect()) == want
+    assert sent[0]["stream"] and sent[0]["stream_options"] == {"include_usage": True}
+    assert sent[0]["model"] == "llama" and sent[0]["temperature"] == 0.2
+
+
+def test_complete_and_models():
+    prov = _local([])
+    res = prov.complete("hi")
+    assert (res.text, res.provider, res.prompt_tokens, res.response_tokens) == ("hi", "local", 3, 1)
+    assert prov.list_models() == ["llama", "qwen"]
+
+
+def test_mixin_accepts_chat_deltas():
+    class Prov(OpenAICompatProvider):
+        base_url = "http://x"
+        api_key_required = False
+
+        def _stream_request(self, prompt, model=None, **kwargs):
+            yield ChatDelta(content="a")
+            yield ChatDelta(content="data: b", finish_reason="length")
+            yield ChatDelta(usage=Usage(response_tokens=2))
+
+    assert list(Prov().stream("hi")) == ["a", "data: b", Usage(response_tokens=2, finish_reason="length")]
+
+
+def test_configuration_errors():
+    with pytest.raises(ValueError):
+        OpenAICompatProvider(base_url="http://x", api_key_required=False, bogus=1)
+    with pytest.raises(RuntimeError):
+        OpenAICompatProvider(base_url="http://x", api_key_env="NO_SUCH_KEY_FOR_TESTS")
+
+
+def test_configured_endpoint_is_a_provider(monkeypatch):
+    import neuralizard.providers as providers
+
+    monkeypatch.setitem(providers._COMPAT_ENDPOINTS, "vllm", {"base_url": "http://vllm:8000", "default_model": "qwen"})
+    prov = providers.get_provider("vllm", semantic_cache=False)
+    assert isinstance(prov, OpenAICompatProvider) and prov.name == "vllm" and prov.default_model == "qwen"
+    assert prov is providers.get_provider("VLLM", semantic_cache=False)
+    assert "vllm" in providers.get_available_providers()
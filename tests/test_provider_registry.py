@@ -0,0 +1,35 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+import pytest
+from neuralizard import providers
+from neuralizard.config import settings
+
+def test_get_provider_reuses_instance(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "key-1")
+    a = providers.get_provider("openai")
+    b = providers.get_provider("OpenAI")
+    assert a is b
+    assert providers.get_provider_pool_stats().get("openai", 0) >= 1
+
+def test_get_provider_keyed_by_api_key_and_options(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "key-1")
+    a = providers.get_provider("openai")
+    b = providers.get_provider("openai", default_model="gpt-4o-mini")
+    monkeypatch.setattr(settings, "openai_api_key", "key-2")
+    c = providers.get_provider("openai")
+    assert a is not b
+    assert a is not c
+    assert b.default_model == "gpt-4o-mini"
+
+def test_close_providers_drops_instances(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "key-1")
+    a = providers.get_provider("openai")
+    providers.close_providers()
+    assert providers.get_provider_pool_stats() == {}
+    assert providers.get_provider("openai") is not a
+
+def test_unknown_provider():
+    with pytest.raises(ValueError):
+        providers.get_provider("nope")
@@ -0,0 +1,105 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import time
+from neuralizard.providers.base import LLMResult
+from neuralizard.providers.response_cache import (
+    MemoryTier, ResponseCache, SQLTier, acomplete_cached, set_response_cache,
+)
+
+
+class CountingProvider:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def acomplete(self, prompt, model=None, temperature=None, **kwargs):
+        self.calls += 1
+        return LLMResult(text=f"answer {self.calls}", provider=self.name, model=model or "m")
+
+
+def _fresh_cache(shared=None, **memory):
+    cache = ResponseCache(MemoryTier(memory.get("max_entries", 100), memory.get("max_bytes", 1 << 20)), shared, ttl=60)
+    set_response_cache(cache)
+    return cache
+
+
+def test_key_normalizes_equivalent_requests():
+    k1 = ResponseCache.make_key("OpenAI", "gpt-4o", "  hi ", 0)
+    k2 = ResponseCache.make_key("openai", "gpt-4o", [{"role": "user", "content": "hi"}], 0.0)
+    assert k1 == k2
+    assert k1 != ResponseCache.make_key("openai", "gpt-4o", "hi", 0, system="be brief")
+    assert k1 != ResponseCache.make_key("openai", "gpt-4o-mini", "hi", 0)
+
+
+def test_deterministic_requests_hit_and_sampling_bypasses():
+    cache = _fresh_cache()
+    prov = CountingProvider()
+
+    async def run():
+        a = await acomplete_cached(prov, "hi", model="m", temperature=0)
+        b = await acomplete_cached(prov, "hi", model="m", temperature=0)
+        c = await acomplete_cached(prov, "hi", model="m", temperature=0.7)
+        d = await acomplete_cached(prov, "hi", model="m", temperature=0.7, cache=True)
+        e = await acomplete_cached(prov, "hi", model="m", temperature=0.7, cache=True)
+        return a, b, c, d, e
+
+    a, b, c, d, e = asyncio.run(run())
+    assert a.text == b.text == "answer 1"
+    assert c.text == "answer 2" and d.text == e.text == "answer 3"
+    assert prov.calls == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bypassed"]) == (2, 2, 1)
+
+
+def test_memory_tier_ttl_and_size_eviction():
+    tier = MemoryTier(max_entries=2, max_bytes=1 << 20)
+    tier.set("a", {"text": "1"}, ttl=60)
+    tier.set("b", {"text": "2"}, ttl=60)
+    tier.get("a")  # a is now most recently used
+    tier.set("c", {"text": "3"}, ttl=60)
+    assert tier.get("b") is None and tier.get("a") and tier.get("c")
+
+    small = MemoryTier(max_entries=100, max_bytes=40)
+    small.set("x", {"text": "x" * 10}, ttl=60)
+    small.set("y", {"text": "y" * 10}, ttl=60)
+    assert small.get("x") is None and small.get("y")
+    assert small.stats()["bytes"] <= 40
+
+    tier.set("old", {"text": "gone"}, ttl=0.01)
+    time.sleep(0.02)
+    assert tier.get("old") is None
+
+
+def test_shared_tier_serves_other_processes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'cache.db'}"
+    prov = CountingProvider()
+
+    _fresh_cache(SQLTier(url))
+    asyncio.run(acomplete_cached(prov, "hi", model="m", temperature=0))
+    # A second worker: empty memory tier, same table
+    other = _fresh_cache(SQLTier(url))
+    res = asyncio.run(acomplete_cached(prov, "hi", model="m", temperature=0))
+    assert res.text == "answer 1" and prov.calls == 1
+    assert other.stats()["shared_hits"] == 1
+
+
+def test_counters_are_exact_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = _fresh_cache()
+    asyncio.run(cache.set("k", LLMResult(text="a", provider="p", model="m")))
+
+    def lookups(_):
+        async def run():
+            for key in ("k", "missing") * 200:
+                await cache.get(key)
+        asyncio.run(run())
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lookups, range(8)))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["memory_hits"]) == (1600, 1600, 1600)
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,104 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import httpx
+import pytest
+from neuralizard.config import settings
+from neuralizard.providers.base_streaming import AsyncStreamingProviderMixin, StreamingProviderMixin
+from neuralizard.providers.retry import RetryPolicy, get_retry_stats, retry_call
+
+REQUEST = httpx.Request("POST", "https://api.x.ai/v1/chat/completions")
+
+
+def _status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    return httpx.HTTPStatusError(f"{status}", request=REQUEST, response=response)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "retry_base_delay", 0.0)
+
+
+def test_classifies_transient_failures():
+    policy = RetryPolicy()
+    assert policy.classify(httpx.ConnectError("refused", request=REQUEST)) == "connect"
+    assert policy.classify(httpx.ReadTimeout("slow", request=REQUEST)) == "read"
+    assert policy.classify(_status_error(503)) == "read"
+    assert policy.classify(_status_error(400)) is None
+    assert policy.classify(ValueError("bad input")) is None
+    try:
+        try:
+            raise httpx.ConnectError("refused", request=REQUEST)
+        except httpx.ConnectError as e:
+            raise RuntimeError("network error") from e
+    except RuntimeError as wrapped:
+        assert policy.classify(wrapped) == "connect"
+
+
+def test_retry_after_is_honoured_and_capped():
+    policy = RetryPolicy(base_delay=0.0, max_retry_after=5)
+    assert policy.backoff(1, _status_error(429, {"retry-after": "2"})) == 2.0
+    assert policy.backoff(1, _status_error(429, {"retry-after": "60"})) is None
+
+
+def test_budgets_are_separate_per_failure_kind():
+    failures = [httpx.ConnectError("x", request=REQUEST)] * 3 + [_status_error(502)] * 2
+
+    def call():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert retry_call("budget-test", call) == "ok"
+    stats = get_retry_stats()["budget-test"]
+    assert (stats["attempts"], stats["connect_failures"], stats["read_failures"]) == (6, 3, 2)
+    assert stats["recent"][-1][-1] == {"attempt": 6, "ms": stats["recent"][-1][-1]["ms"]}
+
+    with pytest.raises(httpx.HTTPStatusError):
+        retry_call("budget-test", lambda: (_ for _ in ()).throw(_status_error(500)))
+    assert get_retry_stats()["budget-test"]["exhausted"] == 1
+
+
+class Flaky(StreamingProviderMixin, AsyncStreamingProviderMixin):
+    name = "flaky"
+
+    def __init__(self, fail_before: int, fail_after: bool = False):
+        self.fail_before = fail_before
+        self.fail_after = fail_after
+        self.requests = 0
+
+    def _chunks(self):
+        self.requests += 1
+        if self.requests <= self.fail_before:
+            raise httpx.RemoteProtocolError("peer closed connection", request=REQUEST)
+        yield "Hello"
+        if self.fail_after:
+            raise httpx.ReadError("connection reset", request=REQUEST)
+        yield " world"
+
+    def _stream_request(self, prompt, model=None, **kwargs):
+        yield from self._chunks()
+
+    async def _astream_request(self, prompt, model=None, **kwargs):
+        for chunk in self._chunks():
+            yield chunk
+
+
+def test_streams_retry_before_the_first_chunk_only():
+    prov = Flaky(fail_before=2)
+    assert "".join(prov.stream("hi")) == "Hello world" and prov.requests == 3
+
+    prov = Flaky(fail_before=0, fail_after=True)
+    out = list(prov.stream("hi"))
+    assert out[0] == "Hello" and out[-1].startswith("[stream error:") and prov.requests == 1
+
+
+def test_async_streams_retry_before_the_first_chunk():
+    prov = Flaky(fail_before=1)
+
+    async def collect():
+        return "".join([t async for t in prov.astream("hi")])
+
+    assert asyncio.run(collect()) == "Hello world" and prov.requests == 2
@@ -0,0 +1,84 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import pytest
+from neuralizard.providers.base import LLMResult, StreamError
+from neuralizard.providers.router import ProviderRouter, parse_candidates
+
+
+class Provider:
+    def __init__(self, name, fail=None):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    async def astream(self, prompt, model=None, **kwargs):
+        self.calls += 1
+        if self.fail:
+            yield StreamError(f"[stream error: {self.fail}]")
+            return
+        yield f"{self.name}:{model}"
+
+    async def acomplete(self, prompt, model=None, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(self.fail)
+        return LLMResult(text=self.name, provider=self.name, model=model or "m")
+
+
+def _router(providers, **kw):
+    return ProviderRouter(lambda name: providers[name], **kw)
+
+
+def _collect(router, target, decision=None):
+    async def run():
+        return [t async for t in router.astream(target, "hi", decision=decision)]
+    return asyncio.run(run())
+
+
+def test_parse_candidates():
+    assert parse_candidates("OpenAI:gpt-4o-mini, anthropic") == [("openai", "gpt-4o-mini"), ("anthropic", None)]
+
+
+def test_fails_over_before_the_first_token_and_records_the_decision():
+    providers = {"a": Provider("a", fail="boom"), "b": Provider("b")}
+    router = _router(providers, aliases={"fast": ["a:x", "b:y"]})
+    decision: dict = {}
+    assert _collect(router, "fast", decision) == ["b:y"]
+    assert decision["provider"] == "b" and decision["attempts"][0]["provider"] == "a"
+    stats = router.stats()
+    assert stats["failovers"] == 1 and stats["candidates"]["a:x"]["error_rate"] == 1.0
+
+
+def test_circuit_opens_after_repeated_failures_and_rate_limits_skip():
+    providers = {"a": Provider("a", fail="boom"), "b": Provider("b"), "c": Provider("c", fail="429 Too Many Requests")}
+    router = _router(providers, failure_threshold=2, cooldown=60)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            _collect(router, ["a"])
+    assert router.stats()["candidates"]["a"]["state"] == "open"
+    assert _collect(router, ["a", "b"]) == ["b:None"]
+    assert providers["a"].calls == 2
+    _collect(router, ["c", "b"])
+    _collect(router, ["c", "b"])
+    assert providers["c"].calls == 1 and router.stats()["rate_limited"] == 1
+
+
+def test_prefers_the_faster_healthy_candidate():
+    router = _router({"a": Provider("a"), "b": Provider("b")})
+    router.record_success(("a", None), 900)
+    router.record_success(("b", None), 100)
+    assert router.rank([("a", None), ("b", None)]) == [("b", None), ("a", None)]
+
+
+def test_exhausted_candidates_raise():
+    router = _router({"a": Provider("a", fail="down")})
+    with pytest.raises(RuntimeError, match="All route candidates failed"):
+        _collect(router, ["a"])
+
+    async def call(prov, model):
+        return await prov.acomplete("hi", model=model)
+
+    router = _router({"a": Provider("a", fail="down"), "b": Provider("b")})
+    assert asyncio.run(router.acomplete(["a", "b"], call)).text == "b"
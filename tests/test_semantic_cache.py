@@ -0,0 +1,201 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import numpy as np
+from neuralizard.providers.base import LLMResult, StreamError
+from neuralizard.providers.semantic_cache import (
+    HashingEmbedder, SemanticCache, SemanticCachedProvider, VectorIndex,
+)
+
+
+class CountingProvider:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt, model=None, **kwargs):
+        self.calls += 1
+        return LLMResult(text=f"answer {self.calls}", provider=self.name, model=model or "m")
+
+    async def astream(self, prompt, model=None, **kwargs):
+        self.calls += 1
+        for tok in ("streamed ", f"answer {self.calls}"):
+            yield tok
+
+
+def _cache(**kw):
+    kw.setdefault("threshold", 0.8)
+    return SemanticCache(HashingEmbedder(256), capacity=kw.pop("capacity", 16), ttl=60, path=kw.pop("path", ""), **kw)
+
+
+def test_hashing_embedder_is_normalized_and_similar_for_rephrasings():
+    emb = HashingEmbedder(256)
+    a, b, c = emb.embed([
+        "How do I reverse a list in Python?",
+        "how do I reverse a list in python",
+        "What is the capital of France?",
+    ])
+    assert abs(float(np.linalg.norm(a)) - 1.0) < 1e-5
+    assert float(a @ b) > 0.99
+    assert float(a @ c) < 0.5
+
+
+def test_near_duplicate_prompts_hit_and_others_miss():
+    cache = _cache()
+    prov = SemanticCachedProvider(CountingProvider(), cache)
+    a = prov.complete("How do I reverse a list in Python?", model="m")
+    b = prov.complete("how do I reverse a list in python??", model="m")
+    c = prov.complete("What is the capital of France?", model="m")
+    d = prov.complete("how do I reverse a list in python", model="other")
+    assert a.text == b.text == "answer 1"
+    assert c.text == "answer 2" and d.text == "answer 3"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 3, 3)
+
+
+def test_system_prompt_and_history_partition_the_cache():
+    cache = _cache()
+    prov = SemanticCachedProvider(CountingProvider(), cache)
+    prov.complete("Explain TCP", model="m")
+    assert prov.complete("Explain TCP", model="m", system="Answer in French").text == "answer 2"
+    history = [
+        {"role": "user", "content": "Explain TCP"},
+        {"role": "assistant", "content": "answer 1"},
+        {"role": "user", "content": "Explain TCP"},
+    ]
+    assert prov.complete(history, model="m").text == "answer 3"
+    assert prov.complete("Explain TCP", model="m", semantic_cache=False).text == "answer 4"
+    assert cache.stats()["ineligible"] == 1
+
+
+def test_per_provider_threshold():
+    cache = _cache(threshold=0.8, thresholds={"Counting": 0.9999})
+    prov = SemanticCachedProvider(CountingProvider(), cache)
+    prov.complete("How do I reverse a list in Python?", model="m")
+    assert prov.complete("How can I reverse a Python list?", model="m").text == "answer 2"
+    assert cache.threshold_for("counting") == 0.9999
+
+
+def test_async_stream_is_cached_after_completion():
+    cache = _cache()
+    inner = CountingProvider()
+    prov = SemanticCachedProvider(inner, cache)
+
+    async def collect():
+        return "".join([t async for t in prov.astream("Tell me a joke", model="m")])
+
+    first = asyncio.run(collect())
+    second = asyncio.run(collect())
+    assert first == second == "streamed answer 1"
+    assert inner.calls == 1
+
+
+class ScriptedProvider(CountingProvider):
+    def __init__(self, tokens):
+        super().__init__()
+        self.tokens = tokens
+
+    async def astream(self, prompt, model=None, **kwargs):
+        self.calls += 1
+        for tok in self.tokens:
+            yield tok
+
+
+def test_only_stream_errors_are_kept_out_of_the_cache():
+    async def collect(prov):
+        return "".join([t async for t in prov.astream("Explain HTTP error codes", model="m")])
+
+    # an answer that merely starts like an error message is still an answer
+    inner = ScriptedProvider(["[Error codes] ", "4xx are client errors"])
+    prov = SemanticCachedProvider(inner, _cache())
+    assert asyncio.run(collect(prov)) == asyncio.run(collect(prov))
+    assert inner.calls == 1
+
+    inner = ScriptedProvider(["partial ", StreamError("[stream error: reset]")])
+    prov = SemanticCachedProvider(inner, _cache())
+    asyncio.run(collect(prov))
+    asyncio.run(collect(prov))
+    assert inner.calls == 2
+
+
+def test_index_evicts_least_recently_used():
+    index = VectorIndex(dim=4, capacity=2)
+    eye = np.eye(4, dtype=np.float32)
+    index.add(1, eye[0], {"text": "a"}, ttl=60)
+    index.add(1, eye[1], {"text": "b"}, ttl=60)
+    index.touch(0)
+    index.add(1, eye[2], {"text": "c"}, ttl=60)
+    assert index.evictions == 1
+    assert sorted(p["text"] for p in index.payloads) == ["a", "c"]
+    slot, sim = index.search(1, eye[0])
+    assert index.payloads[slot]["text"] == "a" and sim > 0.99
+
+
+def test_memory_mapped_index_survives_restart(tmp_path):
+    path = str(tmp_path / "semantic.npy")
+    cache = _cache(path=path)
+    SemanticCachedProvider(CountingProvider(), cache).complete("What is a monad?", model="m")
+    cache.save()
+
+    reopened = _cache(path=path)
+    inner = CountingProvider()
+    res = SemanticCachedProvider(inner, reopened).complete("what is a monad", model="m")
+    assert res.text == "answer 1" and inner.calls == 0
+    assert reopened.stats()["persistent"] is True
+
+
+class _CountingGovernor:
+    def __init__(self):
+        self.acquired = 0
+
+    def limited(self, provider, api_key):
+        return True
+
+    def estimate_tokens(self, prompt, model, system=None, prompt_tokens=None):
+        return 1
+
+    async def acquire(self, provider, api_key, tokens):
+        self.acquired += 1
+
+
+def test_only_misses_are_admitted_once(monkeypatch):
+    from neuralizard.providers import governor as gov
+    from neuralizard.providers.base_streaming import acomplete, astream
+
+    counter = _CountingGovernor()
+    monkeypatch.setattr(gov, "_GOVERNOR", counter)
+    monkeypatch.setattr(gov.settings, "rate_limit_enabled", True)
+    prov = SemanticCachedProvider(CountingProvider(), _cache())
+
+    async def run():
+        await acomplete(prov, "What is a monad?", model="m")  # miss
+        await acomplete(prov, "what is a monad", model="m")  # hit
+        [t async for t in astream(prov, "Tell me a joke", model="m")]  # miss
+        [t async for t in astream(prov, "tell me a joke", model="m")]  # hit
+
+    asyncio.run(run())
+    assert counter.acquired == 2
+
+
+
+def test_cache_miss_is_retried_only_at_the_upstream_call(monkeypatch):
+    import httpx
+    import pytest
+    from neuralizard.providers import retry
+    from neuralizard.providers.base_streaming import acomplete
+
+    monkeypatch.setattr(retry.settings, "retry_base_delay", 0.0)
+    monkeypatch.setattr(retry.settings, "retry_connect_attempts", 2)
+    calls = []
+
+    class Failing(CountingProvider):
+        async def acomplete(self, prompt, model=None, **kwargs):
+            calls.append(1)
+            raise httpx.ConnectError("down")
+
+    prov = SemanticCachedProvider(Failing(), _cache())
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(acomplete(prov, "What is a monad?", model="m"))
+    assert len(calls) == 3  # one attempt plus two retries, not squared
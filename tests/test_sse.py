@@ -0,0 +1,82 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+from neuralizard.providers.base import Usage
+from neuralizard.providers.base_streaming import StreamingProviderMixin, AsyncStreamingProviderMixin
+from neuralizard.providers.sse import SSEDecoder, SSEEvent
+
+BODY = (
+    b'data: {"choices":[{"delta":{"content":"Gr\xc3\xbc\xc3\x9fe"}}]}\r\n\r\n'
+    b': keep-alive\r\n\r\n'
+    b'data: {"choices":[{"delta":{"content":" data: x"}}]}\r\n\r\n'
+    b'data: {"choices":[],"usage":{"prompt_tokens":3,"completion_tokens":2}}\r\n\r\n'
+    b"data: [DONE]\r\n\r\n"
+)
+
+
+def _split(body: bytes, size: int) -> list[bytes]:
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def test_frames_split_at_any_byte_boundary_decode_identically():
+    expected = None
+    for size in (1, 2, 3, 7, 64, len(BODY)):
+        dec = SSEDecoder()
+        events = [ev for chunk in _split(BODY, size) for ev in dec.feed(chunk)] + dec.flush()
+        if expected is None:
+            expected = events
+        assert events == expected
+    assert [e.data for e in expected][-1] == "[DONE]" and len(expected) == 4
+    assert "Grüße" in expected[0].data
+
+
+def test_multiline_data_event_id_and_retry():
+    dec = SSEDecoder()
+    events = dec.feed("event: update\nid: 7\nretry: 1500\ndata: line one\ndata:line two\n\n")
+    events += dec.feed("data: next\r\rdata")
+    assert events == [SSEEvent("line one\nline two", "update", "7"), SSEEvent("next", "message", "7")]
+    assert dec.retry == 1500
+    # unterminated last event is still delivered at end of stream
+    assert dec.flush() == [SSEEvent("", "message", "7")]
+
+
+class RawProvider(StreamingProviderMixin, AsyncStreamingProviderMixin):
+    chunks: list = []
+
+    def _stream_request(self, prompt, model=None, **kwargs):
+        yield from self.chunks
+
+    async def _astream_request(self, prompt, model=None, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+
+
+async def _collect(agen):
+    return [t async for t in agen]
+
+
+def test_mixin_reassembles_frames_split_across_chunks():
+    prov = RawProvider()
+    prov.chunks = _split(BODY, 5)
+    want = ["Grüße", " data: x", Usage(prompt_tokens=3, response_tokens=2)]
+    assert list(prov.stream("hi")) == want
+    assert asyncio.run(_collect(prov.astream("hi"))) == want
+
+
+def test_plain_tokens_containing_sse_markers_are_left_alone():
+    prov = RawProvider()
+    prov.chunks = ["Use ", "data: frames ", "like this"]
+    assert list(prov.stream("hi")) == ["Use ", "data: frames ", "like this"]
+    # even as the first chunk of the answer
+    for chunks in (["data: is the first line", " of the answer"], ["id: 42\nname: foo"]):
+        prov.chunks = chunks
+        assert list(prov.stream("hi")) == chunks
+        assert asyncio.run(_collect(prov.astream("hi"))) == chunks
+
+
+def test_error_event_ends_stream_with_error_text():
+    prov = RawProvider()
+    prov.chunks = [b'data: {"choices":[{"delta":{"content":"a"}}]}\n\n', b'data: {"error":{"message":"overloaded"}}\n\n']
+    tokens = list(prov.stream("hi"))
+    assert tokens[0] == "a" and tokens[1] == "[stream error: overloaded]"
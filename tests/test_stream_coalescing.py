@@ -0,0 +1,58 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+from neuralizard.api.streaming import FlushPolicy, coalesce
+
+async def _run(pieces, policy, delay=0.0):
+    q: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        for p in pieces:
+            await q.put(p)
+            if delay:
+                await asyncio.sleep(delay)
+        await q.put(None)
+
+    task = asyncio.create_task(produce())
+    out = [chunk async for chunk in coalesce(q, policy)]
+    await task
+    return out
+
+def test_first_delta_is_flushed_alone():
+    out = asyncio.run(_run(["Hel", "lo", " ", "world"], FlushPolicy(interval_ms=50, max_bytes=1024)))
+    assert out[0] == "Hel"
+    assert "".join(out) == "Hello world"
+    assert len(out) == 2
+
+def test_byte_threshold_flushes():
+    out = asyncio.run(_run(["a", "bb", "cc", "dd", "e"], FlushPolicy(interval_ms=1000, max_bytes=4)))
+    assert out == ["a", "bbcc", "dde"]
+
+def test_time_window_flushes():
+    out = asyncio.run(_run(["a", "b", "c", "d"], FlushPolicy(interval_ms=5, max_bytes=1024), delay=0.02))
+    assert "".join(out) == "abcd"
+    assert len(out) >= 3
+
+def test_disabled_policy_passes_through():
+    out = asyncio.run(_run(["a", "b", "c"], FlushPolicy(interval_ms=0, max_bytes=512)))
+    assert out == ["a", "b", "c"]
+
+def test_negotiate_clamps_and_defaults():
+    p = FlushPolicy.negotiate({"flush_ms": "9999", "flush_bytes": "oops"})
+    assert p.interval_ms == 250
+    assert p.max_bytes > 0
+
+def test_fan_in_interleaves_sources_and_marks_each_end():
+    from neuralizard.api.streaming import STREAM_END, fan_in
+
+    async def source(name, delays):
+        for i, d in enumerate(delays):
+            await asyncio.sleep(d)
+            yield f"{name}{i}"
+
+    async def run():
+        return [item async for item in fan_in([source("a", [0.0, 0.03]), source("b", [0.01, 0.0])])]
+
+    out = asyncio.run(run())
+    assert out == [(0, "a0"), (1, "b0"), (1, "b1"), (1, STREAM_END), (0, "a1"), (0, STREAM_END)]
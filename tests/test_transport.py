@@ -0,0 +1,101 @@
+import os
+os.environ["DB_URL"] = "sqlite:///:memory:"
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from neuralizard.providers.transport import HTTPPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_clients_share_keepalive_connections(server):
+    pool = HTTPPool(http2=False)
+    a, b = pool.client(base_url=server), pool.client(base_url=server)
+    for _ in range(3):
+        assert a.get("/").text == "ok"
+        assert b.get("/").text == "ok"
+    a.close()  # closing one client leaves the shared pool usable
+    assert b.get("/").status_code == 200
+
+    stats = pool.stats()
+    assert stats["requests"] == 7 and stats["connections"] == 1
+    assert stats["reuse_ratio"] == round(1 - 1 / 7, 3)
+    assert stats["dns_cache"] == {"hits": 0, "misses": 1}
+    pool.close()
+
+
+def test_async_requests_reuse_connections_per_loop(server):
+    pool = HTTPPool(http2=False)
+
+    async def run():
+        client = pool.async_client(base_url=server)
+        for _ in range(4):
+            assert (await client.get("/")).text == "ok"
+        await pool.aclose()
+
+    asyncio.run(run())
+    asyncio.run(run())  # a new loop gets its own connections, DNS comes from the cache
+    stats = pool.stats()
+    assert stats["requests"] == 8 and stats["connections"] == 2
+    assert stats["dns_cache"] == {"hits": 1, "misses": 1}
+
+
+def test_per_host_limit_holds_slot_until_stream_closes(server):
+    pool = HTTPPool(http2=False, max_per_host=1)
+    client = pool.client(base_url=server, timeout=httpx.Timeout(5.0, pool=0.1))
+    with client.stream("GET", "/") as resp:
+        assert resp.status_code == 200
+        with pytest.raises(httpx.PoolTimeout):
+            client.get("/")
+    assert client.get("/").text == "ok"
+    assert pool.stats()["hosts"]["localhost"]["host_waits"] == 1
+    pool.close()
+
+
+def test_connect_errors_surface_as_httpx_errors_and_free_the_slot():
+    import socket
+
+    with socket.socket() as s:  # a port nothing listens on
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    pool = HTTPPool(http2=False, max_per_host=1)
+    client = pool.client(base_url=f"http://127.0.0.1:{port}", timeout=httpx.Timeout(5.0, pool=0.1))
+    for _ in range(2):  # the second attempt would time out on the host slot if the first kept it
+        with pytest.raises(httpx.ConnectError):
+            client.get("/")
+
+    async def run():
+        aclient = pool.async_client(base_url=f"http://127.0.0.1:{port}")
+        with pytest.raises(httpx.ConnectError):
+            await aclient.get("/")
+        await pool.aclose()
+
+    asyncio.run(run())
+    assert pool.stats()["hosts"]["127.0.0.1"] == {
+        "requests": 3, "connections": 3, "host_waits": 0, "reuse_ratio": 0.0,
+    }
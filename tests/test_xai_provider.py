@@ -2,6 +2,7 @@ import os
 os.environ["XAI_API_KEY"] = "dummy"
 os.environ["DB_URL"] = "sqlite:///:memory:"
 
+import httpx
 from neuralizard.providers.xai_provider import XAIProvider
 
 def test_xai_provider_init():
@@ -9,9 +10,13 @@ def test_xai_provider_init():
     assert provider.api_key == "dummy"
     assert provider.default_model
 
-def test_list_models(monkeypatch, requests_mock):
+def test_list_models():
     provider = XAIProvider(api_key=None)
-    url = "https://api.x.ai/v1/models"
-    requests_mock.get(url, json={"data": [{"id": "grok-4-latest"}, {"id": "grok-1-mini"}]})
+
+    def handler(request):
+        assert request.url == "https://api.x.ai/v1/models"
+        return httpx.Response(200, json={"data": [{"id": "grok-4-latest"}, {"id": "grok-1-mini"}]})
+
+    provider._client = httpx.Client(base_url=provider.base_url, transport=httpx.MockTransport(handler))
     models = provider.list_models()
-    assert "grok-4-latest" in models
\ No newline at end of file
+    assert "grok-4-latest" in models